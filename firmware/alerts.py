@@ -0,0 +1,240 @@
+import os, json, time, heapq, queue, random, threading
+
+from instrumentation import INSTRUMENTS
+
+_WAKE = object()    # queued by close() so an idle worker notices at once
+
+
+# === ALERT DISPATCHER ===
+class AlertDispatcher:
+    """Deliver alerts from a background worker so the GUI never waits on the network.
+
+    ``submit`` only enqueues. The worker posts with a pooled session and a
+    timeout, retries failures with exponential backoff, and appends alerts it
+    could not deliver (retries exhausted or shutdown) to ``spool_path`` as
+    JSON lines; those are re-queued the next time a dispatcher starts.
+    ``requests`` is only imported, on the worker, when the first alert is sent.
+    """
+
+    def __init__(self, url, maxsize=100, timeout=(3.05, 5.0), max_attempts=6,
+                 backoff_base=1.0, backoff_max=60.0, dedup_window=60.0,
+                 spool_path="undelivered_alerts.jsonl", pool_size=4):
+        self.url = url
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dedup_window = dedup_window
+        self.spool_path = spool_path
+        self.pool_size = pool_size
+        self.session = None         # created on first delivery
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._retries = []          # heap of (due, seq, alert)
+        self._seq = 0
+        self._inflight = None       # alert the worker is posting right now
+        self._abandoned = False     # close() stopped waiting and spooled the leftovers itself
+        self._done = False          # the worker has spooled the leftovers and exited
+        self._last_sent = {}        # kind -> monotonic time of last accepted alert
+        self._lock = threading.Lock()   # retry heap, counters and shutdown, between the worker and callers
+        self._stop_event = threading.Event()
+
+        # Metrics
+        self.sent = 0
+        self.failed_attempts = 0
+        self.dropped = 0
+        self.deduplicated = 0
+        self.spooled = 0
+        self.latencies = []         # seconds from submit to delivery, newest last
+        self.last_error = None
+
+        INSTRUMENTS.register_attrs(self, [
+            ("alerts_pending", "pending", "gauge"),
+            ("alerts_sent_total", "sent", "counter"),
+            ("alerts_failed_attempts_total", "failed_attempts", "counter"),
+            ("alerts_dropped_total", "dropped", "counter"),
+            ("alerts_spooled_total", "spooled", "counter"),
+        ])
+
+        self._load_spool()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # --- producer side ---
+    def submit(self, kind, payload):
+        """Queue an alert; returns False if it was deduplicated or the queue is full"""
+        now = time.monotonic()
+        alert = {"kind": kind, "payload": payload, "created": time.time(),
+                 "attempts": 0, "submitted": now}
+        with self._lock:
+            last = self._last_sent.get(kind)
+            if last is not None and now - last < self.dedup_window:
+                self.deduplicated += 1
+                return False
+            try:
+                self._queue.put_nowait(alert)
+            except queue.Full:
+                # Not accepted, so it must not suppress the next alert of this kind
+                self.dropped += 1
+                return False
+            self._last_sent[kind] = now
+        return True
+
+    @property
+    def pending(self):
+        return self._queue.qsize() + len(self._retries)
+
+    def metrics(self):
+        lat = self.latencies
+        return {
+            "sent": self.sent,
+            "pending": self.pending,
+            "failed_attempts": self.failed_attempts,
+            "dropped": self.dropped,
+            "deduplicated": self.deduplicated,
+            "spooled": self.spooled,
+            "last_latency_s": lat[-1] if lat else None,
+            "mean_latency_s": sum(lat) / len(lat) if lat else None,
+            "max_latency_s": max(lat) if lat else None,
+        }
+
+    # --- worker side ---
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                due = self._retries[0][0] if self._retries else None
+            wait = 0.5 if due is None else min(0.5, max(due - time.monotonic(), 0.0))
+            try:
+                alert = self._queue.get(timeout=wait)
+            except queue.Empty:
+                alert = None
+            if alert is _WAKE:
+                continue
+            if alert is None:
+                with self._lock:
+                    if self._retries and self._retries[0][0] <= time.monotonic():
+                        alert = heapq.heappop(self._retries)[2]
+            if alert is None:
+                continue
+            if self._stop_event.is_set():
+                self._shutdown([alert])
+                return
+            self._deliver(alert)
+        self._shutdown()
+
+    def _shutdown(self, extra=()):
+        """Spool what is left on the way out, unless close() gave up waiting and did"""
+        with self._lock:
+            if not self._abandoned:
+                self._spool(list(extra) + self._take_pending())
+            self._done = True
+        if self.session is not None:
+            self.session.close()
+
+    def _take_pending(self):
+        """Empty the retry heap and the queue; call with the lock held"""
+        pending = [entry[2] for entry in self._retries]
+        self._retries = []
+        while True:
+            try:
+                alert = self._queue.get_nowait()
+            except queue.Empty:
+                return pending
+            if alert is not _WAKE:
+                pending.append(alert)
+
+    def _open_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _deliver(self, alert):
+        alert["attempts"] += 1
+        self._inflight = alert
+        try:
+            if self.session is None:
+                self.session = self._open_session()
+            response = self.session.post(self.url, json=alert["payload"], timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            with self._lock:
+                self._inflight = None
+                self.failed_attempts += 1
+                self.last_error = str(e)
+                if self._abandoned:
+                    return      # close() already spooled it
+                if alert["attempts"] >= self.max_attempts:
+                    self._spool([alert])
+                    return
+                delay = min(self.backoff_base * 2 ** (alert["attempts"] - 1), self.backoff_max)
+                delay *= random.uniform(0.5, 1.0)   # jitter so retries don't line up
+                self._seq += 1
+                heapq.heappush(self._retries, (time.monotonic() + delay, self._seq, alert))
+            return
+        with self._lock:
+            self._inflight = None
+            self.sent += 1
+            self.latencies.append(time.monotonic() - alert["submitted"])
+            del self.latencies[:-100]
+        INSTRUMENTS.observe("alert_delivery", self.latencies[-1])
+
+    # --- persistence ---
+    def _spool(self, alerts):
+        if not alerts or not self.spool_path:
+            return
+        try:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                for a in alerts:
+                    f.write(json.dumps({k: a[k] for k in ("kind", "payload", "created", "attempts")}) + "\n")
+            self.spooled += len(alerts)
+        except OSError as e:
+            self.last_error = str(e)
+            print("⚠ Could not spool alerts:", e)
+
+    def _load_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return
+        try:
+            with open(self.spool_path, encoding="utf-8") as f:
+                saved = [json.loads(line) for line in f if line.strip()]
+            os.remove(self.spool_path)
+        except (OSError, ValueError) as e:
+            print("⚠ Could not read alert spool:", e)
+            return
+        now = time.monotonic()
+        for a in saved:
+            a["attempts"] = 0
+            a["submitted"] = now
+            try:
+                self._queue.put_nowait(a)
+            except queue.Full:
+                self._spool([a])
+
+    def close(self, timeout=0.5):
+        """Stop the worker without waiting on the network.
+
+        The worker spools whatever is undelivered on its way out. If it is
+        still in a POST after ``timeout``, the alert it holds is spooled here
+        with the rest, and is delivered twice should that POST still succeed.
+        """
+        if self._stop_event.is_set():
+            return
+        INSTRUMENTS.unregister(self)
+        self._stop_event.set()
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass            # the worker is not idle then
+        self._thread.join(timeout)
+        with self._lock:
+            if self._done:
+                return
+            self._abandoned = True
+            inflight = [self._inflight] if self._inflight is not None else []
+            if inflight:
+                print(f"⚠ Alert '{inflight[0]['kind']}' still being posted at shutdown; spooling it")
+            self._spool(inflight + self._take_pending())
@@ -0,0 +1,9 @@
+# === ANALYTICAL FUNCTIONS ===
+def calculate_trend(stats):
+    """Direction of the last step, from a channel's LastStep"""
+    if stats.count < 2:
+        return "stable"
+    trend = stats.delta
+    if abs(trend) < 0.1:
+        return "stable"
+    return "rising" if trend > 0 else "falling"
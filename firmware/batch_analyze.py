@@ -0,0 +1,318 @@
+"""Offline analytics over many recorded sessions and CSV logs, in parallel.
+
+Each file is streamed in chunks through the same IngestPipeline the
+dashboard runs (range validation, fall detection, QRS/HRV, alert, risk
+and mood rules, spectra, forecasts), so memory stays bounded whatever the
+file size, and files are spread over a process pool. The output directory gets:
+
+    summary.csv    one row per file: frames, duration, rejected readings,
+                   falls, alerts raised, ECG beats/HR/HRV, final mood, risk,
+                   forecasts, and dominant frequency and band powers of the
+                   final Welch spectra
+    channels.csv   count, mean, std, min and max of the valid samples of
+                   every channel a file recorded (like bmp_summary.csv)
+    falls.csv      every fall the detector confirmed
+    <file>.png     min/max envelope of each mostly-valid channel (--no-figures to skip)
+
+Examples:
+    python batch_analyze.py ../test_logs/Csv --out report
+    python batch_analyze.py sessions health_log*.csv --jobs 8
+"""
+import os, sys, csv, glob, time, argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from config import CHANNELS, FORECAST_CHANNELS, THEME_COLORS, SPECTRAL_SIGNALS, SPECTRAL_BANDS
+from serial_reader import FrameBlock
+from session_format import iter_records
+from pipeline import IngestPipeline
+
+CHUNK_ROWS = 65536          # records per chunk read from a file
+OVERVIEW_POINTS = 1000      # envelope bins per channel kept for the figures
+
+SUMMARY_FIELDS = (
+    ["file", "format", "frames", "duration_s", "channels", "rejected", "falls", "alerts",
+     "ecg_beats", "ecg_mean_hr", "ecg_hr", "ecg_sdnn_ms", "ecg_rmssd_ms", "ecg_pnn50",
+     "mood", "risk"]
+    + [f"forecast_{ch}" for ch in FORECAST_CHANNELS]
+    + [f"{s.lower()}_{f}" for s in SPECTRAL_SIGNALS for f in ["dominant_hz"] + list(SPECTRAL_BANDS.get(s, {}))]
+    + ["process_s", "frames_per_s", "error"]
+)
+CHANNEL_FIELDS = ["file", "channel", "samples", "valid", "rejected", "mean", "std", "min", "max"]
+FALL_FIELDS = ["file", "index", "t_impact", "t_detect", "latency_s", "peak_g"]
+
+
+# === INPUTS ===
+def is_session(path):
+    return os.path.isdir(path) and bool(glob.glob(os.path.join(path, "chunk_*.hwb")))
+
+
+def find_inputs(paths):
+    """Session directories and CSV logs named by paths (files, directories or wildcards)"""
+    found = []
+    for pattern in paths:
+        # Windows shells leave wildcards to the program
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            if not os.path.isdir(path) or is_session(path):
+                found.append(path)
+                continue
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                sessions = [d for d in dirs if is_session(os.path.join(root, d))]
+                found += [os.path.join(root, d) for d in sessions]
+                dirs[:] = [d for d in dirs if d not in sessions]
+                found += [os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".csv")]
+    return list(dict.fromkeys(found))
+
+
+# === PER-FILE ANALYSIS ===
+class ChannelTotals:
+    """Sample counts and running moments of every channel, added chunk by chunk.
+
+    Sums are taken about each channel's first valid value so the variance
+    stays accurate for large offsets such as pressure in hPa.
+    """
+
+    def __init__(self, n):
+        self.samples = np.zeros(n, dtype=np.int64)     # readings present in the file
+        self.valid = np.zeros(n, dtype=np.int64)       # ...that passed validation
+        self.shift = np.full(n, np.nan)
+        self.s1 = np.zeros(n)
+        self.s2 = np.zeros(n)
+        self.lo = np.full(n, np.inf)
+        self.hi = np.full(n, -np.inf)
+
+    def add(self, raw, valid):
+        self.samples += (~np.isnan(raw)).sum(0)
+        self.valid += valid.sum(0)
+        new = np.isnan(self.shift) & valid.any(0)
+        if new.any():
+            cols = np.flatnonzero(new)
+            self.shift[cols] = raw[valid[:, cols].argmax(0), cols]
+        d = np.where(valid, raw - np.nan_to_num(self.shift), 0.0)
+        self.s1 += d.sum(0)
+        self.s2 += (d * d).sum(0)
+        self.lo = np.minimum(self.lo, np.where(valid, raw, np.inf).min(0))
+        self.hi = np.maximum(self.hi, np.where(valid, raw, -np.inf).max(0))
+
+    def row(self, i):
+        n = self.valid[i]
+        row = {"samples": int(self.samples[i]), "valid": int(n),
+               "rejected": int(self.samples[i] - n)}
+        if n:
+            mean = self.s1[i] / n
+            var = (self.s2[i] - n * mean * mean) / (n - 1) if n > 1 else 0.0
+            row.update(mean=self.shift[i] + mean, std=float(np.sqrt(max(var, 0.0))),
+                       min=self.lo[i], max=self.hi[i])
+        return row
+
+
+class _EventLog:
+    """Stands in for the StreamServer to collect the pipeline's fall and alert events"""
+
+    def __init__(self):
+        self.falls = []
+        self.alerts = []
+
+    def publish_frames(self, device, t_ns, values, flags):
+        pass
+
+    def publish_event(self, device, kind, payload):
+        if kind == "fall":
+            self.falls.append(payload)
+        elif kind == "alert" and payload["state"] == "active":
+            self.alerts.append(payload)
+
+
+def analyze_file(path, chunk_rows=CHUNK_ROWS, overview_points=OVERVIEW_POINTS):
+    """Stream one session or CSV log through an IngestPipeline.
+
+    Returns a dict with the file's summary row, per-channel rows, falls and
+    the envelope overview used for its figure. Runs in a worker process.
+    """
+    start = time.perf_counter()
+    summary = {"file": path, "format": "session" if os.path.isdir(path) else "csv"}
+    try:
+        events = _EventLog()
+        # Already in a worker process, so the spectra are computed inline; the
+        # overview comes from the file, so no session history is kept
+        pipeline = IngestPipeline(name=os.path.basename(path.rstrip("/\\")), stream=events, verbose=False,
+                                  spectral_worker=False, history_mb=0)
+        totals = ChannelTotals(len(CHANNELS))
+        bits = 1 << np.arange(len(CHANNELS))
+        frames = 0
+        first = last = None
+        try:
+            for t_ns, values, flags in iter_records(path, CHANNELS, chunk_rows):
+                raw = values.astype(float)
+                # Valid: in range now and not rejected when the file was recorded
+                valid = (raw >= pipeline.lower) & (raw <= pipeline.upper) & ((flags[:, None] & bits) != 0)
+                totals.add(raw, valid)
+                pipeline.process(FrameBlock(t_ns, raw))
+                frames += len(t_ns)
+                first = t_ns[0] if first is None else first
+                last = t_ns[-1]
+            if not frames:
+                raise ValueError("no records")
+            result = pipeline.analyze()
+        finally:
+            pipeline.close()
+    except (OSError, ValueError, csv.Error) as e:
+        summary["error"] = str(e)
+        return {"summary": summary, "channels": [], "falls": [], "overview": {}}
+
+    present = [i for i, ch in enumerate(CHANNELS) if totals.samples[i]]
+    channel_rows = [dict(file=path, channel=CHANNELS[i], **totals.row(i)) for i in present]
+    names = [CHANNELS[i] for i in present]
+    summary.update(
+        frames=frames,
+        duration_s=(last - first) / 1e9,
+        channels=" ".join(names),
+        rejected=int(sum(r["rejected"] for r in channel_rows)),
+        falls=len(events.falls),
+        alerts=len(events.alerts),
+        mood=result["mood"],
+        risk=result["risk"],
+    )
+    for ch, value in result["forecast"].items():
+        if ch in names:
+            summary[f"forecast_{ch}"] = value
+    for s, features in result["spectral"].items():
+        summary[f"{s.lower()}_dominant_hz"] = features["dominant_hz"]
+        summary.update({f"{s.lower()}_{band}": power for band, power in features["bands"].items()})
+    ecg = result["ecg"]
+    # None when the ECG channel was not trustworthy enough to count beats on
+    if "ECG" in names and ecg is not None:
+        minutes = totals.samples[CHANNELS.index("ECG")] / pipeline.rate / 60.0
+        summary.update(ecg_beats=ecg["beats"], ecg_mean_hr=ecg["beats"] / minutes, ecg_hr=ecg["hr"],
+                       ecg_sdnn_ms=ecg["sdnn"], ecg_rmssd_ms=ecg["rmssd"], ecg_pnn50=ecg["pnn50"])
+    falls = [{"file": path, **{k: e[k] for k in FALL_FIELDS[1:]}} for e in events.falls]
+
+    overview = {}
+    span = pipeline.pyramid.span()
+    for i in present:
+        # The envelope is of validated values, which say little when most readings were replaced
+        if totals.valid[i] * 2 >= totals.samples[i]:
+            _, _, lo, hi, xc = pipeline.pyramid.envelope(CHANNELS[i], *span, overview_points)
+            overview[CHANNELS[i]] = (xc, lo, hi)
+
+    elapsed = time.perf_counter() - start
+    summary.update(process_s=elapsed, frames_per_s=frames / elapsed if elapsed else 0.0)
+    return {"summary": summary, "channels": channel_rows, "falls": falls, "overview": overview}
+
+
+# === BATCH ===
+def run_batch(paths, jobs=None, chunk_rows=CHUNK_ROWS, overview_points=OVERVIEW_POINTS, on_result=None):
+    """Analyse every file, jobs at a time (1 = in this process); results in input order"""
+    results = {}
+    if jobs == 1 or len(paths) == 1:
+        for path in paths:
+            results[path] = analyze_file(path, chunk_rows, overview_points)
+            if on_result:
+                on_result(results[path])
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(analyze_file, path, chunk_rows, overview_points): path for path in paths}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                if on_result:
+                    on_result(results[futures[future]])
+    return [results[path] for path in paths]
+
+
+def _write_csv(path, fields, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, restval="", extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_tables(results, out_dir):
+    _write_csv(os.path.join(out_dir, "summary.csv"), SUMMARY_FIELDS, [r["summary"] for r in results])
+    _write_csv(os.path.join(out_dir, "channels.csv"), CHANNEL_FIELDS,
+               [row for r in results for row in r["channels"]])
+    _write_csv(os.path.join(out_dir, "falls.csv"), FALL_FIELDS, [row for r in results for row in r["falls"]])
+
+
+def write_figures(results, out_dir):
+    """One PNG per file with the min/max envelope of its channels, falls marked on the accelerometer"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")     # nothing is ever shown
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QColor
+    import pyqtgraph as pg
+    import pyqtgraph.exporters
+
+    app = QApplication.instance() or QApplication([])
+    pen = pg.mkPen(THEME_COLORS['accent'], width=1)
+    brush = pg.mkBrush(QColor(94, 154, 224, 80))
+    written, stems = [], set()
+    for r in results:
+        overview = r["overview"]
+        if not overview:
+            continue
+        path = r["summary"]["file"]
+        stem = os.path.splitext(os.path.basename(path.rstrip("/\\")))[0]
+        while stem in stems:
+            stem += "_"
+        stems.add(stem)
+
+        win = pg.GraphicsLayoutWidget()
+        win.setBackground(THEME_COLORS['dark_bg'])
+        win.resize(1000, 60 + 160 * len(overview))
+        win.addLabel(os.path.basename(path.rstrip("/\\")), row=0, col=0, color=THEME_COLORS['text'])
+        for row, (ch, (x, lo, hi)) in enumerate(overview.items(), start=1):
+            plot = win.addPlot(row=row, col=0)
+            plot.setLabel("left", ch)
+            plot.getAxis("left").setWidth(90)
+            plot.showGrid(x=True, y=True, alpha=0.2)
+            plot.addItem(pg.FillBetweenItem(plot.plot(x, lo, pen=pen), plot.plot(x, hi, pen=pen), brush=brush))
+            if ch.startswith("Acc"):
+                for fall in r["falls"]:
+                    plot.addItem(pg.InfiniteLine(pos=fall["index"], pen=pg.mkPen(THEME_COLORS['critical'])))
+            if row == len(overview):
+                plot.setLabel("bottom", "Sample")
+        # The widget is never shown, so lay the plots out at the figure size by hand
+        win.ci.setGeometry(0, 0, win.width(), win.height())
+        app.processEvents()
+        out = os.path.join(out_dir, stem + ".png")
+        pg.exporters.ImageExporter(win.ci).export(out)
+        win.close()
+        written.append(out)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch analytics over recorded sessions and CSV logs")
+    parser.add_argument("paths", nargs="+", help="session directories, CSV logs, or directories to search")
+    parser.add_argument("--out", default="batch_report", help="directory for the tables and figures")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per CPU, 1 = no pool)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="records read per chunk")
+    parser.add_argument("--no-figures", action="store_true", help="write the tables only")
+    args = parser.parse_args(argv)
+
+    paths = find_inputs(args.paths)
+    if not paths:
+        parser.error("no sessions or CSV logs found")
+    os.makedirs(args.out, exist_ok=True)
+
+    def report(r):
+        s = r["summary"]
+        if "error" in s:
+            print(f"⚠ Skipped {s['file']}: {s['error']}")
+        else:
+            print(f"✅ {s['file']}: {s['frames']} frames, {s['falls']} falls, "
+                  f"{s['rejected']} rejected ({s['frames_per_s']:.0f} frames/s)")
+
+    start = time.perf_counter()
+    results = run_batch(paths, args.jobs, args.chunk_rows, on_result=report)
+    write_tables(results, args.out)
+    figures = [] if args.no_figures else write_figures(results, args.out)
+    done = sum("error" not in r["summary"] for r in results)
+    frames = sum(r["summary"].get("frames", 0) for r in results)
+    print(f"✅ {done}/{len(results)} files, {frames} frames in {time.perf_counter() - start:.1f}s; "
+          f"tables and {len(figures)} figures in {args.out}")
+    return 0 if done else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Long-session benchmark for the tiered history.
+
+Feeds simulated hours of frames into a TieredHistory as fast as it will
+take them and records, every simulated hour, the process RSS, the bytes
+held in RAM and spilled to disk, and the time to query each dashboard
+history range. Pages are committed as the history fills, but never past
+the budget: the exit status is 1 when RSS grows by more than the budget
+plus --tolerance-mb.
+
+    python benchmarks/bench_history.py --hours 24 --out history.json
+    python benchmarks/bench_history.py --hours 72 --budget-mb 8
+"""
+import os, sys, json, time, argparse, resource
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import numpy as np
+
+from config import CHANNELS, HISTORY_MEMORY_MB, HISTORY_TIERS, HISTORY_RANGES
+from history import TieredHistory
+from bench_pipeline import environment
+
+
+def rss_mb():
+    """Current resident set size; peak RSS where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def signal_block(rate, seconds, seed=0):
+    """A minute of plausible vitals to tile across the session"""
+    rng = np.random.default_rng(seed)
+    n = int(rate * seconds)
+    base = np.array([75, 98, 36.6, 1013, 0, 0, 0, 9.8, 400, 0], dtype=float)[:len(CHANNELS)]
+    values = base + rng.normal(scale=0.5, size=(n, len(CHANNELS)))
+    return values, rng.random(values.shape) > 0.001
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory and query cost of a long session's history")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--rate", type=float, default=250, help="frames per second")
+    parser.add_argument("--batch-s", type=float, default=1.0, help="seconds of frames per extend call")
+    parser.add_argument("--budget-mb", type=float, default=HISTORY_MEMORY_MB)
+    parser.add_argument("--pixels", type=int, default=1200, help="points requested per query")
+    parser.add_argument("--tolerance-mb", type=float, default=4.0, help="RSS growth allowed beyond the budget")
+    parser.add_argument("--out", default="history_results.json")
+    args = parser.parse_args(argv)
+
+    values, valid = signal_block(args.rate, 60)
+    baseline = rss_mb()
+    history = TieredHistory(CHANNELS, args.budget_mb * 2 ** 20, HISTORY_TIERS)
+    batch = max(int(args.rate * args.batch_s), 1)
+    step = np.arange(batch) / args.rate
+    t = time.time() - args.hours * 3600
+    end = t + args.hours * 3600
+    hourly = []
+    busy = 0.0
+    frames = 0
+    next_hour = t + 3600
+    print(f"History budget {history.nbytes / 2 ** 20:.1f} MB: "
+          f"{history.hot.capacity / args.rate / 60:.1f} min at full resolution, tiers "
+          + ", ".join(f"{tier.period}s × {tier.capacity}" for tier in history.tiers))
+    try:
+        while t < end:
+            i = frames % (len(values) - batch)
+            t0 = time.perf_counter()
+            history.extend(t + step, values[i:i + batch], valid[i:i + batch])
+            busy += time.perf_counter() - t0
+            frames += batch
+            t += batch / args.rate
+            if t >= next_hour or t >= end:
+                queries = {}
+                for label, span in HISTORY_RANGES:
+                    span = span or 60
+                    q0 = time.perf_counter()
+                    points = len(history.series(CHANNELS[0], t - span, t, args.pixels)[0])
+                    queries[label] = {"ms": (time.perf_counter() - q0) * 1e3, "points": points}
+                hourly.append({
+                    "hour": round((t - end) / 3600 + args.hours, 2),
+                    "rss_mb": rss_mb(),
+                    "history_mb": history.nbytes / 2 ** 20,
+                    "spilled_mb": history.spilled * history.tiers[0].dtype.itemsize / 2 ** 20,
+                    "queries": queries,
+                })
+                h = hourly[-1]
+                print(f"✅ hour {h['hour']:>5.1f}: RSS {h['rss_mb']:.1f} MB, spilled {h['spilled_mb']:.1f} MB, "
+                      + ", ".join(f"{k} {q['ms']:.1f} ms" for k, q in queries.items()))
+                next_hour += 3600
+    finally:
+        history.close()
+
+    growth = max(h["rss_mb"] for h in hourly) - baseline
+    print(f"\n{frames} frames, {busy / frames * 1e6:.2f} µs/frame to extend")
+    with open(args.out, "w") as f:
+        json.dump({"environment": environment(), "args": vars(args), "frames": frames,
+                   "us_per_frame": busy / frames * 1e6, "hourly": hourly}, f, indent=1)
+    print(f"Results written to {args.out}")
+    summary = f"RSS grew by at most {growth:.1f} MB, for a {args.budget_mb:g} MB budget"
+    if growth > args.budget_mb + args.tolerance_mb:
+        print(f"❌ {summary}")
+        return 1
+    print(f"✅ {summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""Benchmarks for the ingest-to-display pipeline.
+
+Each case is timed for every (buffer size, frame rate) combination. A
+frame rate is turned into the batch the 100 ms serial timer would see.
+Results are written as JSON so two runs can be compared:
+
+    python benchmarks/bench_pipeline.py --out before.json
+    python benchmarks/bench_pipeline.py --out after.json --compare before.json
+"""
+import os, sys, time, json, platform, argparse, tempfile, statistics, subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import numpy as np
+
+from config import CHANNELS
+from serial_reader import parse_block
+from sources import SyntheticSource, FrameSource, encode_frames
+from ringbuffer import RingBuffer
+from pipeline import IngestPipeline
+from csv_logger import CsvLogger
+
+TICK_S = 0.1    # serial timer interval in the dashboard
+
+
+class IdleSource(FrameSource):
+    """Never produces data; keeps the dashboard's reader thread quiet"""
+
+    name = "idle"
+
+    def read(self, size=1):
+        time.sleep(0.05)
+        return b""
+
+
+def timeit(fn, min_time=0.2, min_reps=5, max_reps=100000):
+    """Call fn repeatedly; return per-call durations in microseconds"""
+    times = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < max_reps and (len(times) < min_reps or time.perf_counter() < deadline):
+        t0 = time.perf_counter_ns()
+        fn()
+        times.append((time.perf_counter_ns() - t0) / 1000)
+    return times
+
+
+def summarize(name, params, times, frames_per_call=None):
+    times = sorted(times)
+    result = {
+        "name": name,
+        "params": params,
+        "reps": len(times),
+        "mean_us": statistics.fmean(times),
+        "median_us": times[len(times) // 2],
+        "p95_us": times[min(int(len(times) * 0.95), len(times) - 1)],
+    }
+    if frames_per_call:
+        result["per_frame_us"] = result["median_us"] / frames_per_call
+        result["max_fps"] = 1e6 / result["per_frame_us"] if result["per_frame_us"] else None
+    return result
+
+
+def make_frames(rows, t_ns=0):
+    block, _, _ = parse_block(encode_frames(rows), t_ns)
+    return block
+
+
+def filled_pipeline(buffer_size, rows):
+    pipeline = IngestPipeline(max_points=buffer_size)
+    for start in range(0, buffer_size, 4096):
+        pipeline.process(make_frames(rows[start:start + 4096]))
+    return pipeline
+
+
+# === CASES ===
+def bench_core(buffer_size, rate, min_time):
+    batch = max(int(rate * TICK_S), 1)
+    params = {"buffer": buffer_size, "rate": rate, "batch": batch}
+    source = SyntheticSource(rate=max(rate, 1), mode="fast", seed=0)
+    rows = source._rows(0, buffer_size + batch)
+    block = encode_frames(rows[-batch:])
+    frames = make_frames(rows[-batch:])
+    results = []
+
+    results.append(summarize("parse_frames", params,
+                             timeit(lambda: parse_block(block, 0), min_time), batch))
+
+    ring = RingBuffer(CHANNELS, buffer_size)
+    ring.extend(rows[:buffer_size])
+    arr = rows[-batch:]
+    results.append(summarize("buffer_extend", params,
+                             timeit(lambda: ring.extend(arr), min_time), batch))
+
+    pipeline = filled_pipeline(buffer_size, rows)
+    raw = frames.values.copy()
+    raw[::7, 0] = np.nan        # some unparsable and out-of-range cells to fill forward
+    raw[::11, 2] = 99.0
+    results.append(summarize("validate", params,
+                             timeit(lambda: pipeline.validate(raw), min_time), batch))
+    results.append(summarize("pipeline_process", params,
+                             timeit(lambda: pipeline.process(frames), min_time), batch))
+    results.append(summarize("analyze", params, timeit(pipeline.analyze, min_time)))
+
+    view = pipeline.buffer.view("Temp")
+    # What each forecast used to cost: a least-squares fit over the whole buffer
+    x = np.arange(len(view))
+    results.append(summarize("forecast_polyfit", params, timeit(lambda: np.polyfit(x, view, 1), min_time)))
+    trend = pipeline.trends["Temp"]
+    results.append(summarize("forecast_streaming", params,
+                             timeit(lambda: trend.forecast_seconds(600), min_time)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = CsvLogger(os.path.join(tmp, "bench.csv"), flush_rows=batch * 10)
+        log_rows = [[time.time()] + [str(v) for v in r] + list(r) for r in rows[-batch:].tolist()]
+        results.append(summarize("csv_log_enqueue", params,
+                                 timeit(lambda: logger.log_many(log_rows), min_time), batch))
+        logger.close()
+        # Writer-thread cost, measured on an idle logger so the flusher isn't competing
+        logger = CsvLogger(os.path.join(tmp, "bench_write.csv"), flush_interval=3600)
+        results.append(summarize("csv_log_write", params,
+                                 timeit(lambda: logger._write(log_rows), min_time), batch))
+        logger.close()
+    return results
+
+
+def bench_qt(buffer_size, rate, min_time, app):
+    import plots
+    batch = max(int(rate * TICK_S), 1)
+    params = {"buffer": buffer_size, "rate": rate, "batch": batch}
+    rows = SyntheticSource(rate=max(rate, 1), mode="fast", seed=0)._rows(0, buffer_size + batch)
+    pipeline = filled_pipeline(buffer_size, rows)
+    dashboard = plots.HealthDashboard(IdleSource(), pipeline=pipeline)
+    dashboard.serial_timer.stop()
+    dashboard.update_timer.stop()
+    dashboard.resize(1400, 800)
+    dashboard.show()
+    app.processEvents()
+
+    results = []
+    indicator = dashboard.indicators["HR"]
+    stats = pipeline.stats["HR"]
+    value = pipeline.stats["HR"].last
+    results.append(summarize("indicator_update", params,
+                             timeit(lambda: indicator.update_value(value, stats), min_time)))
+
+    def plot_update():
+        dashboard.update_plot()
+        app.processEvents()
+    results.append(summarize("plot_update", params, timeit(plot_update, min_time)))
+
+    def dashboard_update():
+        dashboard.update_dashboard()
+        app.processEvents()
+    results.append(summarize("dashboard_update", params, timeit(dashboard_update, min_time)))
+
+    frames = make_frames(rows[-batch:])
+
+    def dashboard_tick():
+        # One serial tick's frames followed by a refresh, as in the running app
+        pipeline.process(frames)
+        dashboard.update_dashboard()
+        app.processEvents()
+    results.append(summarize("dashboard_tick", params, timeit(dashboard_tick, min_time), batch))
+
+    dashboard.close()
+    app.processEvents()
+    return results
+
+
+def environment():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                             capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in baseline["results"]}
+    print(f"\n{'case':<22}{'params':<38}{'old µs':>12}{'new µs':>12}{'ratio':>8}")
+    for r in results:
+        key = (r["name"], json.dumps(r["params"], sort_keys=True))
+        if key in old:
+            ratio = r["median_us"] / old[key]["median_us"] if old[key]["median_us"] else float("inf")
+            flag = "  ⚠" if ratio > 1.2 else ""
+            print(f"{r['name']:<22}{key[1]:<38}{old[key]['median_us']:>12.1f}"
+                  f"{r['median_us']:>12.1f}{ratio:>8.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ingest-to-display pipeline")
+    parser.add_argument("--buffers", type=int, nargs="+", default=[500, 10_000, 100_000])
+    parser.add_argument("--rates", type=int, nargs="+", default=[50, 250, 1000])
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per case")
+    parser.add_argument("--no-qt", action="store_true", help="skip widget and plot cases")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    app = None
+    if not args.no_qt:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        try:
+            from PyQt5.QtWidgets import QApplication
+            app = QApplication.instance() or QApplication([])
+        except ImportError as e:
+            print(f"⚠ Skipping Qt cases: {e}")
+
+    # Run from a scratch directory so the dashboard's log files don't litter the tree
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    out_path = os.path.abspath(args.out)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = []
+    try:
+        for buffer_size in args.buffers:
+            for rate in args.rates:
+                results.extend(bench_core(buffer_size, rate, args.min_time))
+                if app is not None:
+                    results.extend(bench_qt(buffer_size, rate, args.min_time, app))
+                print(f"✅ buffer={buffer_size} rate={rate}")
+    finally:
+        os.chdir(cwd)
+
+    print(f"\n{'case':<22}{'buffer':>8}{'rate':>6}{'median µs':>12}{'p95 µs':>10}{'µs/frame':>10}")
+    for r in results:
+        per_frame = f"{r['per_frame_us']:.2f}" if "per_frame_us" in r else "-"
+        print(f"{r['name']:<22}{r['params']['buffer']:>8}{r['params']['rate']:>6}"
+              f"{r['median_us']:>12.1f}{r['p95_us']:>10.1f}{per_frame:>10}")
+
+    with open(out_path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=1)
+    print(f"\nResults written to {out_path}")
+    if compare_path:
+        compare(results, compare_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Rule-engine benchmark: many rules across many devices.
+
+Pads the rules file with generated alert and risk rules (thresholds,
+durations, hysteresis and combinations over random channels) up to
+--rules, then feeds --devices independent RuleEngines the batches the
+100 ms serial timer would see and records the cost per batch, per frame
+and per rule. Results are written as JSON:
+
+    python benchmarks/bench_rules.py --rules 500 --devices 20 --out rules.json
+"""
+import os, sys, json, time, argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import numpy as np
+
+from config import CHANNELS, FRAME_RATE, RULES_FILE
+from rules import HERE as RULES_DIR, RuleSet, RuleEngine
+from bench_history import signal_block
+from bench_pipeline import environment
+
+VITALS = {"HR": (75, 20), "SpO2": (96, 3), "Temp": (36.8, 0.8), "MQ": (400, 300), "Pressure": (1000, 20)}
+
+
+def generated_rules(count, seed=0):
+    """Alert and risk rules of every shape the engine supports"""
+    rng = np.random.default_rng(seed)
+    names = list(VITALS)
+    rules = []
+    for i in range(count):
+        a, b = rng.choice(names, 2, replace=False)
+        (ma, sa), (mb, sb) = VITALS[a], VITALS[b]
+        ta, tb = ma + sa * rng.uniform(-2, 2), mb + sb * rng.uniform(-2, 2)
+        shape = i % 4
+        if shape == 0:
+            when = f"{a} > {ta:.2f}"
+        elif shape == 1:
+            when = f"{a} > {ta:.2f} and {b} < {tb:.2f}"
+        elif shape == 2:
+            when = f"mean({a}, 0.1) > {ta:.2f} or {b} < {tb:.2f}"
+        else:
+            when = f"abs(delta({a}, 0.04)) > {sa:.2f}"
+        rule = {"name": f"generated_{i}", "when": when, "for_s": float(rng.choice([0, 5, 10]))}
+        if i % 2:
+            rule["score"] = 1
+            rules.append(("risk", rule))
+        else:
+            if shape == 0:
+                rule.update(clear=f"{a} <= {ta - sa / 4:.2f}", clear_s=5)
+            rules.append(("alerts", rule))
+    return rules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cost of evaluating many rules across many devices")
+    parser.add_argument("--rules", type=int, default=500, help="rules per device, the rules file included")
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=60, help="simulated seconds per device")
+    parser.add_argument("--rate", type=float, default=FRAME_RATE, help="frames per second")
+    parser.add_argument("--tick", type=float, default=0.1, help="seconds of frames per batch")
+    parser.add_argument("--out", default="rules_results.json")
+    args = parser.parse_args(argv)
+
+    with open(os.path.join(RULES_DIR, RULES_FILE), encoding="utf-8") as f:
+        spec = json.load(f)
+    existing = sum(len(spec.get(s, [])) for s in ("alerts", "risk", "mood"))
+    for section, rule in generated_rules(max(args.rules - existing, 0)):
+        spec.setdefault(section, []).append(rule)
+    t0 = time.perf_counter()
+    ruleset = RuleSet(spec, CHANNELS, args.rate, "benchmark")
+    compile_ms = (time.perf_counter() - t0) * 1e3
+    engines = [RuleEngine(ruleset) for _ in range(args.devices)]
+
+    values, valid = signal_block(args.rate, 60)
+    values = np.where(valid, values, np.nan)
+    batch = max(int(args.rate * args.tick), 1)
+    batches = int(args.seconds / args.tick)
+    step = np.arange(batch) / args.rate
+    per_batch = []
+    events = 0
+    for k in range(batches):
+        i = k * batch % (len(values) - batch)
+        t = k * args.tick + step
+        for engine in engines:
+            b0 = time.perf_counter_ns()
+            events += len(engine.process(t, values[i:i + batch]))
+            per_batch.append((time.perf_counter_ns() - b0) / 1e3)
+
+    per_batch = np.array(per_batch)
+    rule_us = np.mean([list(e.timings().values()) for e in engines], axis=0)
+    slowest = sorted(zip(ruleset.names, rule_us), key=lambda r: -r[1])[:5]
+    busy = per_batch.sum() / 1e6 / (args.seconds * args.devices)
+    summary = {
+        "rules": len(ruleset.rules), "devices": args.devices, "batch_frames": batch,
+        "compile_ms": compile_ms, "events": events,
+        "us_per_batch": {"median": float(np.median(per_batch)), "p99": float(np.percentile(per_batch, 99))},
+        "us_per_frame": float(per_batch.mean() / batch),
+        "us_per_rule_batch": float(per_batch.mean() / len(ruleset.rules)),
+        "cpu_share_per_device": busy,
+    }
+    print(f"{summary['rules']} rules compiled in {compile_ms:.0f} ms, {args.devices} devices, {batch} frames per batch")
+    print(f"✅ {summary['us_per_batch']['median']:.0f} µs per batch (p99 {summary['us_per_batch']['p99']:.0f}), "
+          f"{summary['us_per_rule_batch']:.2f} µs per rule, {summary['us_per_frame']:.1f} µs per frame")
+    print(f"   {busy * 100:.2f}% of a core per device in real time, {events} alert events")
+    print("   slowest rules: " + ", ".join(f"{name} {us:.1f} µs" for name, us in slowest))
+    with open(args.out, "w") as f:
+        json.dump({"environment": environment(), "args": vars(args), "summary": summary,
+                   "rule_us": dict(zip(ruleset.names, rule_us.tolist()))}, f, indent=1)
+    print(f"Results written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Spectral-engine benchmark: incremental periodograms against recomputing.
+
+Feeds --seconds of ECG and accelerometer frames, --tick seconds at a
+time, to a SpectralEngine (inline, so the cost is measured on this
+thread) and compares it with what the dashboard would otherwise do on
+every refresh: window and transform every overlapping segment of the
+spectrogram's history again from the ring buffer. Both must produce the
+same spectrogram. Results are written as JSON:
+
+    python benchmarks/bench_spectral.py --seconds 300 --out spectral.json
+"""
+import os, sys, json, time, argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import (
+    CHANNELS, FRAME_RATE, SPECTRAL_SIGNALS, SPECTRAL_BANDS, SPECTRAL_SEGMENT,
+    SPECTRAL_OVERLAP, SPECTRAL_AVERAGE, SPECTRAL_HISTORY_S
+)
+from ringbuffer import RingBuffer
+from spectral import SpectralEngine
+from bench_pipeline import environment
+
+
+def recompute(engine, buffer):
+    """Every segment of the buffered history from scratch, like engine.spectrogram() for each signal"""
+    # Segments start on the same hop grid as the engine's, counted from the first sample
+    x = buffer.view()[:, -(buffer.total - buffer.count) % engine.hop:]     # (columns, samples)
+    m = (x.shape[1] - engine.segment) // engine.hop + 1
+    seg = sliding_window_view(x, engine.segment, axis=1)[:, :m * engine.hop:engine.hop]
+    seg = seg - seg.mean(axis=2, keepdims=True)
+    spectrum = np.fft.rfft(seg * engine.window, axis=2)
+    power = (spectrum.real ** 2 + spectrum.imag ** 2) * engine._scale
+    return np.add.reduceat(power, engine._starts, axis=0)      # (signals, segments, freqs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cost of incremental spectra against recomputing them")
+    parser.add_argument("--seconds", type=float, default=300, help="simulated seconds of frames")
+    parser.add_argument("--rate", type=float, default=FRAME_RATE, help="frames per second")
+    parser.add_argument("--tick", type=float, default=0.1, help="seconds of frames per batch")
+    parser.add_argument("--refresh", type=float, default=0.5, help="seconds between dashboard refreshes")
+    parser.add_argument("--out", default="spectral_results.json")
+    args = parser.parse_args(argv)
+
+    engine = SpectralEngine(CHANNELS, args.rate, SPECTRAL_SIGNALS, SPECTRAL_BANDS, SPECTRAL_SEGMENT,
+                            SPECTRAL_OVERLAP, SPECTRAL_AVERAGE, SPECTRAL_HISTORY_S, worker=False)
+    columns = engine._columns
+    # The samples the spectrogram covers, as a plain ring buffer would hold them
+    held = (engine._power.capacity - 1) * engine.hop + engine.segment
+    buffer = RingBuffer(columns, held)
+
+    rng = np.random.default_rng(0)
+    n = int(args.seconds * args.rate)
+    t = np.arange(n) / args.rate
+    values = rng.normal(size=(n, len(CHANNELS)))
+    values[:, columns] += np.sin(2 * np.pi * 5 * t)[:, None]
+    batch = max(int(args.rate * args.tick), 1)
+    every = max(int(round(args.refresh / args.tick)), 1)
+
+    incremental_ns = recompute_ns = 0
+    refreshes = 0
+    for k, i in enumerate(range(0, n, batch)):
+        chunk = values[i:i + batch]
+        t0 = time.perf_counter_ns()
+        engine.extend(t[i:i + batch], chunk)
+        incremental_ns += time.perf_counter_ns() - t0
+        buffer.extend(chunk[:, columns])
+        if k % every == 0 and buffer.count >= engine.segment:
+            t0 = time.perf_counter_ns()
+            power = recompute(engine, buffer)
+            recompute_ns += time.perf_counter_ns() - t0
+            refreshes += 1
+
+    # Same segments, same spectra (the engine stores float32)
+    count = min(power.shape[1], engine._power.count)
+    for i, signal in enumerate(engine.signals):
+        ours = engine.spectrogram(signal)[2][:, -count:]
+        if not np.allclose(ours, power[i, -count:].T, rtol=1e-4, atol=1e-12):
+            print(f"❌ {signal}: incremental spectrogram differs from the recomputed one")
+            return 1
+
+    summary = {
+        "segments": engine.segments, "refreshes": refreshes, "batch_frames": batch,
+        "incremental_us_per_s": incremental_ns / 1e3 / args.seconds,
+        "recompute_us_per_s": recompute_ns / 1e3 / args.seconds,
+        "recompute_us_per_refresh": recompute_ns / 1e3 / max(refreshes, 1),
+    }
+    summary["speedup"] = summary["recompute_us_per_s"] / summary["incremental_us_per_s"]
+    print(f"{engine.segments} segments of {engine.segment} samples over {len(engine.signals)} signals "
+          f"({len(columns)} channels), {refreshes} refreshes")
+    print(f"✅ incremental: {summary['incremental_us_per_s']:.0f} µs per second of data; "
+          f"recomputing: {summary['recompute_us_per_s']:.0f} µs "
+          f"({summary['recompute_us_per_refresh']:.0f} µs per refresh), {summary['speedup']:.0f}x")
+    with open(args.out, "w") as f:
+        json.dump({"environment": environment(), "args": vars(args), "summary": summary}, f, indent=1)
+    print(f"Results written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
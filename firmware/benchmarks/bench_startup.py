@@ -0,0 +1,121 @@
+"""Cold-start benchmark for the dashboard.
+
+Every run launches the dashboard in a fresh interpreter (offscreen) and
+records, in seconds since the process was spawned:
+
+    python    the interpreter is up and running the launch script
+    imports   plots.py and everything it imports are loaded
+    window    the dashboard has been shown and painted
+    data      the first frame has been processed
+
+The median "window" time is checked against STARTUP_BUDGET_S from
+config.py; the exit status is 1 when it is over budget. Results are
+written as JSON so two runs can be compared:
+
+    python benchmarks/bench_startup.py --out before.json
+    python benchmarks/bench_startup.py --device COM4 --out after.json --compare before.json
+"""
+import os, sys, json, argparse, tempfile, statistics, subprocess, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from config import STARTUP_BUDGET_S
+from bench_pipeline import environment
+
+PHASES = ["python", "imports", "window", "data"]
+
+# Runs in the child; stamps are wall-clock so the parent can subtract its spawn time
+CHILD = """
+import os, sys, json, time
+stamps = {{"python": time.time()}}
+sys.path.insert(0, {root!r})
+import plots
+stamps["imports"] = time.time()
+app, window = plots.launch(plots.parse_args({argv!r}))
+app.processEvents()
+stamps["window"] = time.time()
+pipeline = getattr(window, "pipeline", None)
+deadline = time.time() + {timeout!r}
+while pipeline is not None and not pipeline.frames_processed and time.time() < deadline:
+    app.processEvents()
+    time.sleep(0.002)
+if pipeline is not None and pipeline.frames_processed:
+    stamps["data"] = time.time()
+stamps["modules"] = len(sys.modules)
+print("STARTUP " + json.dumps(stamps), flush=True)
+window.close()
+app.processEvents()
+os._exit(0)     # interpreter teardown is not part of startup
+"""
+
+
+def run_once(device, timeout, workdir):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    code = CHILD.format(root=ROOT, argv=["--device", device], timeout=timeout)
+    spawned = time.time()
+    proc = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env,
+                          capture_output=True, text=True, timeout=timeout + 60)
+    for line in proc.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            stamps = json.loads(line[8:])
+            modules = stamps.pop("modules")
+            result = {phase: t - spawned for phase, t in stamps.items()}
+            result["modules"] = modules
+            return result
+    raise RuntimeError(f"launch failed:\n{proc.stdout}{proc.stderr}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how long the dashboard takes to come up")
+    parser.add_argument("--device", default="synthetic", help="device spec to launch against")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for the first frame")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_S, help="seconds allowed until the window shows")
+    parser.add_argument("--out", default="startup_results.json")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    # Run from a scratch directory so the dashboard's log files don't litter the tree
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    runs = []
+    for i in range(args.runs):
+        runs.append(run_once(args.device, args.timeout, workdir))
+        print(f"✅ run {i + 1}: window {runs[-1]['window']:.3f}s")
+
+    summary = {}
+    for phase in PHASES:
+        times = sorted(r[phase] for r in runs if phase in r)
+        if times:
+            summary[phase] = {"median_s": statistics.median(times), "max_s": times[-1]}
+    modules = statistics.median(r["modules"] for r in runs)
+
+    print(f"\n{'phase':<10}{'median s':>10}{'max s':>10}")
+    for phase, s in summary.items():
+        print(f"{phase:<10}{s['median_s']:>10.3f}{s['max_s']:>10.3f}")
+    print(f"modules loaded: {modules:.0f}")
+
+    with open(args.out, "w") as f:
+        json.dump({"environment": environment(), "device": args.device, "runs": runs,
+                   "summary": summary, "modules": modules, "budget_s": args.budget}, f, indent=1)
+    print(f"\nResults written to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)["summary"]
+        print(f"\n{'phase':<10}{'old s':>10}{'new s':>10}{'ratio':>8}")
+        for phase, s in summary.items():
+            if phase in old:
+                ratio = s["median_s"] / old[phase]["median_s"]
+                print(f"{phase:<10}{old[phase]['median_s']:>10.3f}{s['median_s']:>10.3f}{ratio:>8.2f}")
+
+    window = summary["window"]["median_s"]
+    if window > args.budget:
+        print(f"❌ Window took {window:.2f}s, over the {args.budget:.2f}s budget")
+        return 1
+    print(f"✅ Window in {window:.2f}s, within the {args.budget:.2f}s budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+from serial_reader import FRAME_CHANNELS
+
+# === CONFIG ===
+PORT = "auto"       # first CP210x/CH340/FTDI/ESP32 USB port found, or e.g. "COM4"
+BAUD = 115200
+CSV_FILE = "health_log.csv"
+LOG_FLUSH_ROWS = 500        # flush once this many rows are pending...
+LOG_FLUSH_INTERVAL = 1.0    # ...or after this many seconds
+LOG_ROTATE_BYTES = 50 * 1024 * 1024
+LOG_ROTATE_HOURLY = False
+LOG_FSYNC = "never"         # "flush" for clinical sessions, see csv_logger.py
+LOG_FORMAT = "both"         # "csv", "binary", "both" or "none"; binary sessions feed the history view
+SESSION_DIR = "sessions"    # binary sessions go to SESSION_DIR/session_<start time>
+MAX_POINTS = 500
+FORECAST_CHANNELS = ["Temp", "Pressure", "MQ"]
+FORECAST_WINDOW_S = 300        # seconds of samples in the fit; None to use forgetting only
+FORECAST_FORGETTING = None     # e.g. 0.995 to weight recent samples more
+FORECAST_HORIZON_S = 600       # forecast horizon in seconds
+FORECAST_MAX_EXTRAPOLATION = 2 # never forecast further ahead than this many times the fitted span
+FRAME_RATE = 250              # frames per second assumed until the stream's own rate is measured (Hz)
+RATE_WINDOW_S = 10             # seconds of frame arrivals the rate is measured over
+RATE_TOLERANCE = 0.1           # retune rate-dependent analytics when the measured rate is off by more
+RATE_RETUNE_MIN_S = 600        # ...for a whole RATE_WINDOW_S, and at most once per this many seconds
+ECG_HRV_BEATS = 120            # RR intervals in the rolling SDNN/RMSSD/pNN50
+FALL_HOLD_S = 10               # a detected fall stays active this long (seconds of data)
+PLOT_WINDOW = MAX_POINTS       # samples shown while following live data
+RENDER_INTERVAL_MS = 500       # dashboard refresh while data is flowing
+RENDER_IDLE_MS = 2000          # slowest refresh, for slow sources or no data
+RENDER_HIDDEN_MS = 1000        # minimised: analytics and alerts keep running, nothing is repainted
+DISPLAY_STEP = {               # indicator precision; smaller changes are not repainted
+    "HR": 1, "SpO2": 1, "Temp": 0.1, "Pressure": 0.1, "Altitude": 0.5, "MQ": 1
+}
+PLOT_LOD_FACTOR = 8            # each pyramid level merges this many bins
+PLOT_LOD_LEVELS = 6
+PLOT_LOD_CAPACITY = 4096       # bins kept per level (coarse levels reach further back)
+HISTORY_MEMORY_MB = 32         # per device: full-resolution window plus compacted tiers (history.py)
+HISTORY_TIERS = (1, 10, 60)    # bucket seconds of the compacted tiers, each a multiple of the last
+HISTORY_SPILL_DIR = None       # buckets that no longer fit in memory spill here; None for the temp dir
+HISTORY_RANGES = [             # plot range choices; None follows the live buffer
+    ("Live", None), ("Last hour", 3600), ("Last 24 hours", 86400), ("Last 7 days", 7 * 86400)
+]
+ALERT_URL = "https://api.emergency.com/alert"
+ALERT_SPOOL = "undelivered_alerts.jsonl"   # alerts that could not be delivered
+ALERT_DEDUP_S = 60             # suppress repeats of the same alert type within this window
+STREAM_ENABLED = False         # publish live frames and events for remote viewers
+STREAM_HOST = "127.0.0.1"      # "0.0.0.0" to accept nurse stations on the network
+STREAM_PORT = 8765
+STREAM_QUEUE = 64              # batches buffered per subscriber before it gets decimated
+INSTRUMENTATION = False        # stage timing histograms (instrumentation.py); --metrics flags also enable it
+METRICS_FILE = None            # write a snapshot here every METRICS_INTERVAL_S (.json, else Prometheus text)
+METRICS_PORT = None            # serve /metrics and /metrics.json on this local port
+METRICS_INTERVAL_S = 10
+STARTUP_BUDGET_S = 1.5         # launch to dashboard on screen (benchmarks/bench_startup.py)
+THEME_COLORS = {
+    'dark_bg': '#1e1e2e',
+    'light_bg': '#2a2a3a',
+    'text': '#e0e0f0',
+    'accent': '#5e9ae0',
+    'critical': '#ff5555',
+    'warning': '#ffb86c',
+    'normal': '#50fa7b'
+}
+
+# Define practical ranges for sensor validation
+SENSOR_RANGES = {
+    "HR": (30, 250),          # Heart Rate (bpm)
+    "SpO2": (70, 100),        # Blood Oxygen (%)
+    "Temp": (30, 42),         # Body Temperature (°C)
+    "Pressure": (900, 1100),  # Atmospheric Pressure (hPa)
+    "Altitude": (-100, 9000), # Altitude (meters)
+    "AccX": (-160, 160),      # Acceleration (m/s², ADXL345 at ±16 g)
+    "AccY": (-160, 160),
+    "AccZ": (-160, 160),
+    "MQ": (0, 5000),          # Air Quality (ppm)
+    "ECG": (0, 4095)          # ECG (raw 12-bit ADC counts from the AD8232)
+}
+
+# Signal-quality checks per channel (signal_quality.py); a missing key skips that check
+#   flat_s  identical readings for this long: stuck sensor, finger off, leads off
+#   step    largest plausible change within one second
+#   spike   smallest jump from the recent median counted as a spike
+#   rails   ADC limits; readings pinned at either one are saturated
+#   range   False to leave the SENSOR_RANGES check out of the quality mask
+SIGNAL_QUALITY = {
+    "HR":       {"flat_s": 3, "step": 40, "spike": 20},
+    "SpO2":     {"flat_s": 3, "step": 8, "spike": 4},
+    "Temp":     {"step": 1, "spike": 1},           # a DS18B20 reading can hold for minutes
+    "Pressure": {"flat_s": 60, "step": 5, "spike": 2},
+    "Altitude": {"flat_s": 60, "step": 40, "spike": 15},
+    "AccX":     {"flat_s": 2},                     # impacts saturate and spike; the fall detector needs them
+    "AccY":     {"flat_s": 2},
+    "AccZ":     {"flat_s": 2},
+    "MQ":       {"flat_s": 30, "step": 1000, "spike": 500, "rails": (0, 4095)},
+    "ECG":      {"flat_s": 0.5, "rails": (0, 4095)},   # raw ADC counts off the board
+}
+QUALITY_GAP_S = 0.5            # frames missing for this long mark a dropout
+QUALITY_WINDOW_S = 2           # recent window for each channel's share of good samples
+QUALITY_MIN_GOOD = 0.8         # below this share, analytics leave the channel out
+
+# Alert, risk and mood rules, evaluated on every batch (rules.py); relative to this folder
+RULES_FILE = "rules.json"
+
+# Short-time spectra of the fast channels (spectral.py), computed off the GUI thread
+SPECTRAL_SIGNALS = {           # signal -> channels whose power spectra are summed
+    "ECG": ["ECG"], "Acc": ["AccX", "AccY", "AccZ"]
+}
+SPECTRAL_BANDS = {             # band powers reported to the analytics, [low, high) in Hz
+    "ECG": {"baseline": (0, 0.5), "qrs": (5, 15), "mains_50": (49, 51), "mains_60": (59, 61)},
+    "Acc": {"gait": (0.5, 3), "tremor": (3, 12)},
+}
+SPECTRAL_SEGMENT = 512         # samples per FFT: 2 s at 250 Hz, 0.49 Hz bins
+SPECTRAL_OVERLAP = 0.5         # share of each segment reused by the next
+SPECTRAL_AVERAGE = 8           # periodograms in the Welch PSD (about 9 s)
+SPECTRAL_HISTORY_S = 120       # spectrogram length
+
+# === CHANNELS ===
+CHANNELS = list(FRAME_CHANNELS)
+LOG_HEADER = ["Timestamp"] + [f"{ch}_raw" for ch in CHANNELS] + CHANNELS
+
+# Readings used until each sensor produces its first valid value
+DEFAULT_LAST_VALID = {
+    "HR": 75, "SpO2": 98, "Temp": 36.6, "Pressure": 1013,
+    "Altitude": 0, "AccX": 0, "AccY": 0, "AccZ": 0,
+    "MQ": 0, "ECG": 2048       # the AD8232 output idles at mid-scale
+}
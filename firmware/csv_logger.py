@@ -0,0 +1,162 @@
+import os, csv, time, atexit, threading
+
+from instrumentation import INSTRUMENTS
+
+FSYNC_POLICIES = ("never", "flush", "rotate")
+
+
+# === BUFFERED CSV LOGGER ===
+class CsvLogger:
+    """Batched CSV writer with a persistent file handle and a background flusher.
+
+    ``log``/``log_many`` only append to an in-memory list; a writer thread
+    flushes it when ``flush_rows`` rows are pending or ``flush_interval``
+    seconds have passed. ``fsync`` picks when data is forced to disk:
+    ``"never"`` (leave it to the OS), ``"flush"`` (after every batch, for
+    clinical sessions) or ``"rotate"`` (only when a file is closed).
+    NaN values are written as ``missing`` (an empty field by default).
+    """
+
+    def __init__(self, path, header=None, flush_rows=500, flush_interval=1.0,
+                 rotate_bytes=None, rotate_hourly=False, fsync="never",
+                 time_format="%Y-%m-%d %H:%M:%S", max_pending=100000, missing=""):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = path
+        self.header = header
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_hourly = rotate_hourly
+        self.fsync = fsync
+        self.time_format = time_format
+        self.max_pending = max_pending
+        self.missing = missing
+
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        self.last_error = None
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._file = None
+        self._writer = None
+        self._opened_hour = None
+        self._open()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        self.label = os.path.basename(path)
+        INSTRUMENTS.register_attrs(self, [
+            ("log_pending_rows", "pending", "gauge"),
+            ("log_rows_written_total", "rows_written", "counter"),
+            ("log_rows_dropped_total", "rows_dropped", "counter"),
+        ], file=self.label)
+
+    # --- producer side (GUI thread) ---
+    def log(self, row):
+        self.log_many([row])
+
+    def log_many(self, rows):
+        with self._cond:
+            if self._closed:
+                return
+            self._pending.extend(rows)
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                # Disk has stalled for a long time; keep the newest rows
+                del self._pending[:overflow]
+                self.rows_dropped += overflow
+            if len(self._pending) >= self.flush_rows:
+                self._cond.notify()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    # --- writer side ---
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.flush_rows:
+                    self._cond.wait(self.flush_interval)
+                rows, self._pending = self._pending, []
+                closed = self._closed
+            if rows:
+                self._write(rows)
+            if closed:
+                return
+
+    def _write(self, rows):
+        t0 = time.perf_counter_ns()
+        try:
+            if self._should_rotate():
+                self._rotate()
+            rows = [self._format(r) for r in rows]
+            self._writer.writerows(rows)
+            self._file.flush()
+            if self.fsync == "flush":
+                os.fsync(self._file.fileno())
+            self.rows_written += len(rows)
+            self.flushes += 1
+            INSTRUMENTS.record("log_write", t0, self.label)
+        except Exception as e:
+            self.last_error = str(e)
+            print("⚠ Log write error:", e)
+
+    def _format(self, row):
+        """Text timestamp and blank NaNs for rows that start with epoch seconds"""
+        if not isinstance(row[0], float):
+            return row
+        t = time.strftime(self.time_format, time.localtime(row[0])) if self.time_format else row[0]
+        missing = self.missing
+        return [t] + [v if v == v else missing for v in row[1:]]
+
+    def _open(self):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._opened_hour = time.localtime().tm_hour
+        if new_file and self.header:
+            self._writer.writerow(self.header)
+
+    def _should_rotate(self):
+        if self.rotate_bytes and self._file.tell() >= self.rotate_bytes:
+            return True
+        return self.rotate_hourly and time.localtime().tm_hour != self._opened_hour
+
+    def _rotate(self):
+        """Close the active file under a timestamped name and start a fresh one"""
+        self._close_file()
+        root, ext = os.path.splitext(self.path)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        target = f"{root}_{stamp}{ext}"
+        n = 1
+        while os.path.exists(target):
+            target = f"{root}_{stamp}_{n}{ext}"
+            n += 1
+        os.replace(self.path, target)
+        self._open()
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        if self.fsync != "never":
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+    def close(self):
+        """Flush every pending row and close the file (safe to call twice)"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        INSTRUMENTS.unregister(self)
+        self._thread.join()
+        self._close_file()
@@ -0,0 +1,241 @@
+"""Monitor several ESP32 streams from one process.
+
+Each device owns its source, reader thread, IngestPipeline (buffers,
+validation, analytics, loggers) and latest analysis result. A single
+DeviceManager worker drains every reader on a shared tick, optionally
+fanning devices out to a thread pool, and measures the CPU each device
+costs so a workstation's bed capacity can be estimated:
+
+    python devices.py synthetic synthetic synthetic --duration 20
+    python devices.py bed1=COM4 bed2=COM5 bed3=tcp://192.168.1.40:5000
+"""
+import os, re, sys, time, threading, argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from config import BAUD, CSV_FILE, SESSION_DIR, LOG_FORMAT, FRAME_RATE, STREAM_HOST, METRICS_INTERVAL_S, INSTRUMENTATION
+from serial_reader import SerialReader
+from sources import SerialSource, TcpSource, UdpSource, ReplaySource, SyntheticSource
+from pipeline import IngestPipeline, open_loggers
+from instrumentation import INSTRUMENTS
+
+
+def open_source(spec, baud=BAUD):
+    """Build a frame source from a device spec.
+
+    ``tcp://host:port``, ``udp://[host]:port``, ``synthetic[:rate]``,
+    ``replay:path``, or anything else as a serial port name.
+    """
+    if spec.startswith("tcp://"):
+        host, _, port = spec[6:].rpartition(":")
+        return TcpSource(host or "localhost", int(port))
+    if spec.startswith("udp://"):
+        host, _, port = spec[6:].rpartition(":")
+        return UdpSource(int(port), host or "0.0.0.0")
+    if spec == "synthetic" or spec.startswith("synthetic:"):
+        rate = float(spec.partition(":")[2] or FRAME_RATE)
+        return SyntheticSource(rate=rate, mode="fixed")
+    if spec.startswith("replay:"):
+        return ReplaySource(spec[7:], mode="realtime", loop=True)
+    return SerialSource(spec, baud)
+
+
+def parse_device(arg, index=0):
+    """Split ``name=spec`` (name optional) into (name, spec)"""
+    name, sep, spec = arg.partition("=")
+    if not sep:
+        name, spec = f"bed{index + 1}", arg
+    return name, spec
+
+
+# === DEVICE ===
+class Device:
+    """One monitored patient: source, reader thread, pipeline and latest analytics"""
+
+    def __init__(self, name, source, pipeline=None, log_format=LOG_FORMAT, stream=None):
+        self.name = name
+        self.source = source
+        if pipeline is None:
+            # Per-device log files so patients never share a CSV or session
+            safe = re.sub(r"[^\w.-]", "_", name)
+            root, ext = os.path.splitext(CSV_FILE)
+            logger, session = open_loggers(log_format, f"{root}_{safe}{ext}",
+                                           os.path.join(SESSION_DIR, safe))
+            # The manager already drives pipelines off the GUI thread, so no spectral worker each
+            pipeline = IngestPipeline(logger=logger, session=session, stream=stream, name=name,
+                                      spectral_worker=False)
+        self.pipeline = pipeline
+        # The reader opens the source, and reopens it after a failure, on its own thread
+        self.reader = SerialReader(source, name=name, connect=True)
+        self.result = None
+        self.error = None
+
+        self.process_cpu_s = 0.0    # CPU spent in the pipeline, on the manager's workers
+        self.cpu_percent = 0.0      # reader + pipeline, over the last measurement interval
+        self._cpu_mark = 0.0
+
+    def start(self):
+        self.reader.start()
+
+    @property
+    def cpu_s(self):
+        return self.reader.cpu_s + self.process_cpu_s
+
+    def poll(self, analyze):
+        """Process queued frames, and refresh the analysis if asked"""
+        t0 = time.thread_time()
+        block = self.reader.drain()
+        if block.count:
+            self.pipeline.process(block)
+        if analyze and self.pipeline.buffer.count:
+            self.result = self.pipeline.analyze()
+        # Cleared again once the reader has reconnected
+        self.error = self.reader.last_error
+        self.process_cpu_s += time.thread_time() - t0
+        return block.count
+
+    def close(self):
+        self.reader.stop()
+        self.source.close()
+        self.pipeline.close()
+
+
+# === DEVICE MANAGER ===
+class DeviceManager:
+    """Drive every device from one worker thread (or a small pool) on a shared tick"""
+
+    def __init__(self, tick=0.1, analyze_every=0.5, workers=1, stream=None):
+        self.tick = tick
+        self.stream = stream
+        self.analyze_every = analyze_every
+        self.workers = workers
+        self.devices = []
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="device") if workers > 1 else None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.ticks = 0
+        self.overruns = 0           # ticks that took longer than the tick interval
+        self.load = 0.0             # busy fraction of the tick interval
+
+    def add(self, name, source, **kwargs):
+        kwargs.setdefault("stream", self.stream)
+        device = Device(name, source, **kwargs)
+        with self._lock:
+            self.devices.append(device)
+        if self._thread is not None:
+            device.start()
+        return device
+
+    def start(self):
+        for device in self.devices:
+            device.start()
+        self._thread = threading.Thread(target=self._run, name="device-manager", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        last_analysis = last_cpu = time.monotonic()
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            analyze = start - last_analysis >= self.analyze_every
+            if analyze:
+                last_analysis = start
+            with self._lock:
+                devices = list(self.devices)
+            if self._pool is not None:
+                list(self._pool.map(lambda d: self._poll(d, analyze), devices))
+            else:
+                for device in devices:
+                    self._poll(device, analyze)
+
+            now = time.monotonic()
+            if now - last_cpu >= 1.0:
+                for device in devices:
+                    cpu = device.cpu_s
+                    device.cpu_percent = 100.0 * (cpu - device._cpu_mark) / (now - last_cpu)
+                    device._cpu_mark = cpu
+                last_cpu = now
+            busy = now - start
+            self.load = busy / self.tick
+            self.ticks += 1
+            if busy > self.tick:
+                self.overruns += 1
+            self._stop_event.wait(max(self.tick - busy, 0.0))
+
+    @staticmethod
+    def _poll(device, analyze):
+        try:
+            device.poll(analyze)
+        except Exception as e:
+            device.error = str(e)
+
+    def metrics(self):
+        """Per-device throughput and CPU, for the overview and capacity planning"""
+        return [{
+            "name": d.name,
+            "source": d.source.name,
+            "frames": d.reader.frames_total,
+            "fps": d.reader.frames_per_sec,
+            "dropped": d.reader.dropped_frames,
+            "sensor_errors": d.pipeline.sensor_error_count,
+            "cpu_percent": d.cpu_percent,
+            "error": d.error,
+        } for d in self.devices]
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+        if self._pool is not None:
+            self._pool.shutdown()
+        for device in self.devices:
+            device.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest several devices and report CPU per device")
+    parser.add_argument("devices", nargs="+", help="[name=]spec: port, tcp://h:p, udp://:p, synthetic[:rate], replay:path")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--log", choices=["none", "csv", "binary", "both"], default="none")
+    parser.add_argument("--stream", type=int, metavar="PORT", help="publish live data on this port")
+    parser.add_argument("--metrics", metavar="PATH", help="record stage timings and write them here (.json or Prometheus text)")
+    parser.add_argument("--metrics-port", type=int, help="record stage timings and serve them on this port")
+    args = parser.parse_args(argv)
+    if args.metrics or args.metrics_port or INSTRUMENTATION:
+        INSTRUMENTS.start(args.metrics, args.metrics_port, METRICS_INTERVAL_S)
+
+    stream = None
+    if args.stream:
+        from stream_server import StreamServer
+        stream = StreamServer(STREAM_HOST, args.stream).start()
+    manager = DeviceManager(workers=args.workers, stream=stream)
+    for i, arg in enumerate(args.devices):
+        name, spec = parse_device(arg, i)
+        manager.add(name, open_source(spec), log_format=args.log)
+    manager.start()
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    metrics = manager.metrics()
+    INSTRUMENTS.close()
+    manager.stop()
+    if stream:
+        stream.stop()
+
+    print(f"\n{'device':<12}{'source':<28}{'frames':>9}{'fps':>8}{'CPU %':>8}")
+    for m in metrics:
+        print(f"{m['name']:<12}{m['source']:<28}{m['frames']:>9}{m['fps']:>8.0f}{m['cpu_percent']:>8.1f}"
+              + (f"  ⚠ {m['error']}" if m["error"] else ""))
+    cpu = [m["cpu_percent"] for m in metrics if m["frames"]]
+    if cpu and sum(cpu) > 0:
+        per_device = sum(cpu) / len(cpu)
+        # Python threads share one core for pipeline work, so plan against a single core
+        print(f"\nMean {per_device:.1f}% of a core per device → about {int(80 / per_device)} devices "
+              f"per workstation at 80% of one core (manager overruns: {manager.overruns}/{manager.ticks} ticks)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
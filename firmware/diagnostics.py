@@ -0,0 +1,123 @@
+import time
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QCheckBox,
+    QTableWidget, QTableWidgetItem, QHeaderView
+)
+from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtGui import QFont
+
+from config import THEME_COLORS
+from instrumentation import INSTRUMENTS
+
+STAGE_COLUMNS = ["Stage", "Device", "Count", "Mean ms", "p50 ms", "p95 ms", "p99 ms", "Max ms"]
+METRIC_COLUMNS = ["Metric", "Labels", "Value"]
+
+
+# === DIAGNOSTICS PANEL ===
+class DiagnosticsPanel(QWidget):
+    """Stage timings, latencies, queue depths and error counters, refreshed every second"""
+
+    def __init__(self, instruments=INSTRUMENTS, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.instruments = instruments
+        self.setWindowTitle("Senso Health Analytics - Diagnostics")
+        self.resize(900, 600)
+        self.setStyleSheet(f"""
+            QWidget {{
+                background-color: {THEME_COLORS['dark_bg']};
+                color: {THEME_COLORS['text']};
+                font-family: 'Segoe UI', Arial;
+            }}
+            QTableWidget {{
+                background: {THEME_COLORS['light_bg']};
+                gridline-color: {THEME_COLORS['dark_bg']};
+            }}
+            QHeaderView::section {{
+                background: {THEME_COLORS['dark_bg']};
+                color: {THEME_COLORS['accent']};
+                font-weight: bold;
+            }}
+            QPushButton {{
+                background: {THEME_COLORS['accent']};
+                color: white;
+                border-radius: 4px;
+                padding: 5px 10px;
+            }}
+        """)
+
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.enabled_box = QCheckBox("Record timings")
+        self.enabled_box.setChecked(instruments.enabled)
+        self.enabled_box.toggled.connect(self.set_enabled)
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(instruments.reset)
+        export_btn = QPushButton("Export JSON")
+        export_btn.clicked.connect(self.export)
+        self.summary = QLabel("")
+        self.summary.setFont(QFont("Segoe UI", 9))
+        controls.addWidget(self.enabled_box)
+        controls.addWidget(reset_btn)
+        controls.addWidget(export_btn)
+        controls.addStretch()
+        controls.addWidget(self.summary)
+        layout.addLayout(controls)
+
+        self.stages = self._table(STAGE_COLUMNS)
+        self.metrics = self._table(METRIC_COLUMNS)
+        layout.addWidget(self.stages, 3)
+        layout.addWidget(self.metrics, 2)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+
+    @staticmethod
+    def _table(columns):
+        table = QTableWidget(0, len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        return table
+
+    @staticmethod
+    def _fill(table, rows):
+        table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                item = table.item(r, c)
+                if item is None:
+                    item = QTableWidgetItem()
+                    table.setItem(r, c, item)
+                if item.text() != value:
+                    item.setText(value)
+
+    def set_enabled(self, enabled):
+        self.instruments.enabled = enabled
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        snap = self.instruments.snapshot()
+        ms = lambda s: f"{s * 1000:.3f}"
+        self._fill(self.stages, [
+            [h["name"], h["device"], str(h["count"]), ms(h["mean"]), ms(h["p50"]),
+             ms(h["p95"]), ms(h["p99"]), ms(h["max"])]
+            for h in snap["histograms"]
+        ])
+        self._fill(self.metrics, [
+            [m["name"], ", ".join(f"{k}={v}" for k, v in sorted(m["labels"].items())), f"{m['value']:g}"]
+            for m in snap["metrics"]
+        ])
+        state = "recording" if snap["enabled"] else "off (gauges and counters only)"
+        self.summary.setText(f"Timings {state} | up {snap['uptime_s']:.0f}s")
+
+    def export(self):
+        path = f"diagnostics_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        try:
+            self.instruments.write(path)
+            self.summary.setText(f"Exported to {path}")
+        except OSError as e:
+            self.summary.setText(f"Export failed: {e}")
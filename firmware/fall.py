@@ -0,0 +1,260 @@
+"""Fall detection on every accelerometer sample.
+
+A fall is a free-fall phase (|a| well below 1 g), an impact spike shortly
+after, and then lying still. The detector keeps a few seconds of |a| and
+steps through that state machine with vectorised searches over each batch,
+so its cost is per batch rather than per sample.
+
+Offline evaluation against recordings (CSV logs or session directories):
+    python fall.py --falls drop1.csv drop2.csv --non-falls walk.csv swing.csv
+    python fall.py --synthetic 10
+"""
+import sys, time, argparse
+import numpy as np
+
+GRAVITY = 9.81
+
+IDLE, FREE_FALL, IMPACT = "idle", "free_fall", "impact"
+
+
+# === FALL DETECTOR ===
+class FallDetector:
+    """Free fall → impact → inactivity state machine over |a| in m/s².
+
+    Thresholds are in g and durations in seconds; ``fs`` converts them to
+    samples. Each confirmed fall is returned from ``process`` as a dict with
+    the impact time, the confirmation time and the algorithmic latency
+    between the two (both in seconds of sample time since the first sample).
+    """
+
+    def __init__(self, fs=250.0, free_fall_g=0.6, free_fall_s=0.06, impact_g=2.0,
+                 impact_window_s=1.0, settle_s=0.5, still_s=1.5, still_std_g=0.05,
+                 hold_s=10.0):
+        self.fs = float(fs)
+        self.free_fall = free_fall_g * GRAVITY
+        self.impact = impact_g * GRAVITY
+        self.still_std = still_std_g * GRAVITY
+        self.free_fall_n = max(int(round(free_fall_s * fs)), 1)
+        self.impact_window_n = max(int(round(impact_window_s * fs)), 1)
+        self.settle_n = int(round(settle_s * fs))
+        self.still_n = max(int(round(still_s * fs)), 2)
+        self.hold_n = int(round(hold_s * fs))
+        self.reset()
+
+    def reset(self):
+        self.state = IDLE
+        self.t0 = 0.0               # seconds of sample time before the first sample
+        self.samples = 0            # samples consumed so far
+        self._mag = np.zeros(0)     # |a| from global index _base onwards
+        self._base = 0
+        self._run = 0               # current free-fall run length carried across batches
+        self._pos = 0               # next global index the state machine looks at
+        self._ff_end = None
+        self._impact_at = None
+        self._impact_peak = 0.0
+        self.last_event = None
+        self.events = 0
+
+    @property
+    def active(self):
+        """True while the newest fall is within hold_s of the latest sample"""
+        return (self.last_event is not None
+                and self.samples - self.last_event["index"] <= self.hold_n)
+
+    def inherit(self, previous):
+        """Carry on from a detector that ran at the wrong rate: sample time, fall count and the held fall.
+
+        Its samples arrived at this detector's rate, which times them from now
+        on. A fall in progress at the switch is not carried over.
+        """
+        self.t0 = previous.t0 + previous.samples / self.fs
+        self.events = previous.events
+        if previous.last_event is not None:
+            # Still held for hold_s after the fall, counted in this detector's frames
+            since = previous.samples - previous.last_event["index"]
+            self.last_event = dict(previous.last_event, index=-since)
+
+    def _slice(self, start, stop):
+        return self._mag[start - self._base:stop - self._base]
+
+    def process(self, ax, ay, az, arrival_ns=None):
+        """Feed accelerometer columns (m/s²); return the falls confirmed in them"""
+        start = time.perf_counter_ns()
+        mag = np.sqrt(np.square(ax) + np.square(ay) + np.square(az))
+        mag = np.where(np.isfinite(mag), mag, GRAVITY)
+        n = len(mag)
+        if n == 0:
+            return []
+        self._mag = np.concatenate((self._mag, mag))
+        end = self.samples + n
+        self.samples = end
+
+        events = []
+        while self._pos < end:
+            if self.state == IDLE:
+                # Free fall: a run of free_fall_n low-|a| samples, possibly spanning batches
+                low = self._slice(self._pos, end) < self.free_fall
+                idx = np.arange(1, len(low) + 1)
+                last_break = np.maximum.accumulate(np.where(low, 0, idx))
+                # Run length at each sample = samples since the last non-low one
+                runs = np.where(last_break == 0, self._run + idx, idx - last_break)
+                hit = np.flatnonzero(runs >= self.free_fall_n)
+                if not len(hit):
+                    self._run = int(runs[-1])
+                    self._pos = end
+                    break
+                self._run = 0
+                self._ff_end = self._pos + int(hit[0])
+                self._pos = self._ff_end + 1
+                self.state = FREE_FALL
+            elif self.state == FREE_FALL:
+                # Impact: first spike within impact_window of the free fall
+                deadline = self._ff_end + self.impact_window_n
+                window = self._slice(self._pos, min(deadline, end))
+                hit = np.flatnonzero(window > self.impact)
+                if len(hit):
+                    self._impact_at = self._pos + int(hit[0])
+                    self._impact_peak = float(window[hit[0]:].max())
+                    self._pos = self._impact_at + 1
+                    self.state = IMPACT
+                elif deadline <= end:
+                    self._pos = deadline
+                    self.state = IDLE
+                else:
+                    self._pos = end
+            else:
+                # Inactivity: low variance once the body has settled after the impact
+                still_from = self._impact_at + self.settle_n
+                still_to = still_from + self.still_n
+                if still_to > end:
+                    peak_to = min(still_from, end)
+                    if peak_to > self._pos:
+                        self._impact_peak = max(self._impact_peak,
+                                                float(self._slice(self._pos, peak_to).max()))
+                    self._pos = end
+                    break
+                window = self._slice(still_from, still_to)
+                if window.std() < self.still_std:
+                    event = {
+                        "index": still_to - 1,
+                        "t_impact": self.t0 + self._impact_at / self.fs,
+                        "t_detect": self.t0 + (still_to - 1) / self.fs,
+                        "latency_s": (still_to - 1 - self._impact_at) / self.fs,
+                        "peak_g": self._impact_peak / GRAVITY,
+                    }
+                    if arrival_ns is not None:
+                        # Time from the batch reaching the host to the detection
+                        event["ingest_latency_s"] = (time.monotonic_ns() - arrival_ns) / 1e9
+                    self.last_event = event
+                    self.events += 1
+                    events.append(event)
+                self._pos = still_to
+                self.state = IDLE
+
+        # Keep only what the state machine can still look back at
+        keep_from = min(self._pos, self._impact_at) if self.state == IMPACT else self._pos
+        if keep_from > self._base:
+            self._mag = self._mag[keep_from - self._base:]
+            self._base = keep_from
+        self.last_process_us = (time.perf_counter_ns() - start) / 1000
+        return events
+
+
+# === OFFLINE EVALUATION ===
+def load_accel(path):
+    """(fs estimate, ax, ay, az) from a CSV log or a session directory"""
+    import os
+    from config import CHANNELS, FRAME_RATE
+    from session_format import SessionReader, read_csv_records
+    if os.path.isdir(path):
+        reader = SessionReader(path)
+        t_ns = np.asarray(reader.t_ns)
+        values = np.asarray(reader.values, dtype=float)
+    else:
+        t_ns, values, _ = read_csv_records(path, CHANNELS)
+        values = values.astype(float)
+    cols = [CHANNELS.index(ch) for ch in ("AccX", "AccY", "AccZ")]
+    fs = FRAME_RATE
+    if len(t_ns) > 1 and t_ns[-1] > t_ns[0]:
+        fs = (len(t_ns) - 1) / ((t_ns[-1] - t_ns[0]) / 1e9)
+    return fs, values[:, cols[0]], values[:, cols[1]], values[:, cols[2]]
+
+
+def run_detector(fs, ax, ay, az, block=25):
+    detector = FallDetector(fs=fs)
+    events = []
+    times = []
+    for i in range(0, len(ax), block):
+        events.extend(detector.process(ax[i:i + block], ay[i:i + block], az[i:i + block]))
+        times.append(detector.last_process_us)
+    return events, times
+
+
+def synthetic_recordings(minutes, rate=250, seed=0):
+    """Labelled recordings from the synthetic source: falls every 20 s vs none"""
+    from sources import SyntheticSource
+    n = int(minutes * 60 * rate)
+    falling = SyntheticSource(rate=rate, seed=seed, fall_every_s=20.0)._rows(0, n)
+    normal = SyntheticSource(rate=rate, seed=seed + 1)._rows(0, n)
+    expected = int(minutes * 60 // 20)
+    return [("synthetic falls", rate, falling[:, 5], falling[:, 6], falling[:, 7], expected),
+            ("synthetic normal", rate, normal[:, 5], normal[:, 6], normal[:, 7], 0)]
+
+
+def evaluate(recordings, block=25):
+    """Score (name, fs, ax, ay, az, expected falls) recordings; print and return totals"""
+    detected_falls = expected_falls = false_alarms = 0
+    hours = 0.0
+    latencies, block_us = [], []
+    print(f"{'recording':<32}{'expected':>9}{'detected':>9}{'latency s':>11}")
+    for name, fs, ax, ay, az, expected in recordings:
+        events, times = run_detector(fs, ax, ay, az, block)
+        block_us.extend(times)
+        found = len(events)
+        if expected:
+            expected_falls += expected
+            detected_falls += min(found, expected)
+            false_alarms += max(found - expected, 0)
+            latencies.extend(e["latency_s"] for e in events)
+        else:
+            false_alarms += found
+            hours += len(ax) / fs / 3600
+        lat = f"{np.median([e['latency_s'] for e in events]):.2f}" if events else "-"
+        print(f"{name:<32}{expected:>9}{found:>9}{lat:>11}")
+
+    sensitivity = detected_falls / expected_falls if expected_falls else float("nan")
+    print(f"\nSensitivity: {sensitivity:.1%} ({detected_falls}/{expected_falls})")
+    print(f"False alarms: {false_alarms}" + (f" ({false_alarms / hours:.2f}/h of normal data)" if hours else ""))
+    if latencies:
+        print(f"Detection latency after impact: median {np.median(latencies):.2f}s, max {max(latencies):.2f}s")
+    if block_us:
+        print(f"Per-block cost ({block} samples): median {np.median(block_us):.1f} µs, max {max(block_us):.1f} µs")
+    return {"sensitivity": sensitivity, "false_alarms": false_alarms, "latencies": latencies}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the fall detector on recorded sessions")
+    parser.add_argument("--falls", nargs="*", default=[], help="recordings containing one fall each")
+    parser.add_argument("--non-falls", nargs="*", default=[], help="recordings with no falls (ADL, swings)")
+    parser.add_argument("--synthetic", type=float, metavar="MIN", help="also score MIN minutes of synthetic data")
+    parser.add_argument("--block", type=int, default=25, help="samples per processing block")
+    args = parser.parse_args(argv)
+
+    recordings = []
+    for path, expected in [(p, 1) for p in args.falls] + [(p, 0) for p in args.non_falls]:
+        try:
+            fs, ax, ay, az = load_accel(path)
+        except (OSError, ValueError) as e:
+            print(f"❌ {path}: {e}")
+            continue
+        recordings.append((path, fs, ax, ay, az, expected))
+    if args.synthetic:
+        recordings.extend(synthetic_recordings(args.synthetic))
+    if not recordings:
+        parser.error("nothing to evaluate: give --falls/--non-falls recordings or --synthetic")
+    evaluate(recordings, args.block)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Run the ingest pipeline without Qt, from a live port, a recorded log or a generator.
+
+Examples:
+    python headless.py replay ../test_logs/Csv/ecg_log.csv --mode fast
+    python headless.py synthetic --rate 1000 --mode fast --frames 200000
+    python headless.py serial --port COM4 --duration 60 --log csv
+"""
+import sys, time, json, argparse
+
+from config import PORT, BAUD, FRAME_RATE, STREAM_HOST, METRICS_INTERVAL_S, INSTRUMENTATION
+from serial_reader import parse_block
+from sources import SerialSource, ReplaySource, SyntheticSource, PLAYBACK_MODES
+from pipeline import IngestPipeline, open_loggers
+from stream_server import StreamServer
+from instrumentation import INSTRUMENTS
+
+
+def run(source, pipeline, duration=None, max_frames=None, analyze_every=0.5,
+        max_read=65536, on_batch=None):
+    """Push frames from source through pipeline until it ends or a limit is hit.
+
+    analyze_every is in seconds of wall time; 0 runs analytics after every batch.
+    Returns throughput figures as a dict.
+    """
+    source.open()
+    remainder = b""
+    frames_total = malformed_total = analyses = 0
+    busy = 0.0
+    start = last_analysis = time.perf_counter()
+    try:
+        while True:
+            if duration is not None and time.perf_counter() - start >= duration:
+                break
+            if max_frames is not None and frames_total >= max_frames:
+                break
+            data = source.read(min(max(source.in_waiting, 1), max_read))
+            if not data:
+                if source.finished:
+                    break
+                continue
+            t0 = time.perf_counter()
+            t_parse = time.perf_counter_ns()
+            block, malformed, remainder = parse_block(remainder + data, time.monotonic_ns())
+            INSTRUMENTS.record("parse", t_parse, pipeline.name)
+            malformed_total += malformed
+            if block.count:
+                pipeline.process(block)
+                frames_total += block.count
+                now = time.perf_counter()
+                if analyze_every == 0 or now - last_analysis >= analyze_every:
+                    result = pipeline.analyze()
+                    analyses += 1
+                    last_analysis = now
+                    if on_batch:
+                        on_batch(result)
+            busy += time.perf_counter() - t0
+    finally:
+        source.close()
+    elapsed = time.perf_counter() - start
+    # Transform what is still queued for the spectral worker (not counted as busy time)
+    pipeline.spectral.flush()
+    return {
+        "source": source.name,
+        "frames": frames_total,
+        "malformed": malformed_total,
+        "sensor_errors": pipeline.sensor_error_count,
+        # Percentage of good samples per channel, and what the rest were flagged for
+        "quality": pipeline.quality.summary(),
+        "frame_gaps": pipeline.quality.gaps,
+        # Frame rate the analytics are tuned for, and the one measured from the arrivals
+        "frame_rate": pipeline.rate,
+        "measured_rate": pipeline.measured_rate,
+        "alerts_raised": pipeline.rules.raised,
+        # Mean evaluation cost of each rule per batch, in µs
+        "rule_us": pipeline.rules.timings(),
+        # Dominant frequency and band powers of the newest Welch spectra
+        "spectral": pipeline.spectral.features(),
+        "analyses": analyses,
+        "elapsed_s": elapsed,
+        "frames_per_s": frames_total / elapsed if elapsed else 0.0,
+        # Processing cost only (excludes time spent waiting on the source)
+        "us_per_frame": busy / frames_total * 1e6 if frames_total else None,
+        "max_sustainable_fps": frames_total / busy if busy else None,
+    }
+
+
+def build_source(args):
+    if args.source == "serial":
+        return SerialSource(args.port, args.baud)
+    if args.source == "replay":
+        return ReplaySource(args.path, mode=args.mode, rate=args.rate,
+                            speed=args.speed, loop=args.loop)
+    return SyntheticSource(rate=args.rate or 250, mode=args.mode, speed=args.speed,
+                           seed=args.seed, fall_every_s=args.fall_every)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless ingest and analytics runner")
+    parser.add_argument("source", choices=["serial", "replay", "synthetic"])
+    parser.add_argument("path", nargs="?", help="log file or session directory to replay")
+    parser.add_argument("--port", default=PORT)
+    parser.add_argument("--baud", type=int, default=BAUD)
+    parser.add_argument("--mode", choices=PLAYBACK_MODES, default="realtime")
+    parser.add_argument("--rate", type=float, help="frames per second for fixed-rate playback")
+    parser.add_argument("--speed", type=float, default=1.0, help="real-time speed-up factor")
+    parser.add_argument("--loop", action="store_true", help="replay the file endlessly")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--fall-every", type=float, help="synthetic: seconds between simulated falls")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--frames", type=int, help="stop after this many frames")
+    parser.add_argument("--analyze-every", type=float, default=0.5,
+                        help="seconds between analytics runs (0 = every batch)")
+    parser.add_argument("--log", choices=["none", "csv", "binary", "both"], default="none")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument("--stream", type=int, metavar="PORT", help="publish live data on this port")
+    parser.add_argument("--metrics", metavar="PATH", help="record stage timings and write them here (.json or Prometheus text)")
+    parser.add_argument("--metrics-port", type=int, help="record stage timings and serve them on this port")
+    args = parser.parse_args(argv)
+    if args.source == "replay" and not args.path:
+        parser.error("replay needs a path")
+    if args.metrics or args.metrics_port or INSTRUMENTATION:
+        INSTRUMENTS.start(args.metrics, args.metrics_port, METRICS_INTERVAL_S)
+
+    logger, session = open_loggers(args.log)
+    stream = StreamServer(STREAM_HOST, args.stream).start() if args.stream else None
+    source = build_source(args)
+    # Frames played back faster than real time arrive faster than they were sampled
+    rate = None
+    if args.source != "serial" and (args.mode == "fast" or args.speed != 1.0):
+        rate = source.nominal_rate or FRAME_RATE
+    pipeline = IngestPipeline(logger=logger, session=session, stream=stream, name=args.source, rate=rate)
+    try:
+        summary = run(source, pipeline, duration=args.duration,
+                      max_frames=args.frames, analyze_every=args.analyze_every)
+    finally:
+        # Final metrics snapshot while the pipeline's counters are still registered
+        INSTRUMENTS.close()
+        pipeline.close()
+        if stream:
+            stream.stop()
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"✅ {summary['frames']} frames from {summary['source']} in {summary['elapsed_s']:.2f}s "
+              f"({summary['frames_per_s']:.0f} fps)")
+        if summary["us_per_frame"] is not None:
+            print(f"   {summary['us_per_frame']:.1f} µs/frame processing, "
+                  f"max sustainable ≈ {summary['max_sustainable_fps']:.0f} fps")
+        print(f"   malformed: {summary['malformed']}, sensor errors: {summary['sensor_errors']}, "
+              f"analytics runs: {summary['analyses']}, frame gaps: {summary['frame_gaps']}")
+        rule_us = summary["rule_us"]
+        print(f"   alerts raised: {summary['alerts_raised']}, {len(rule_us)} rules "
+              f"at {sum(rule_us.values()):.0f} µs per batch")
+        for signal, f in summary["spectral"].items():
+            print(f"   {signal} spectrum: dominant {f['dominant_hz']:.2f} Hz, " + ", ".join(
+                f"{band} {power:.3g}" for band, power in f["bands"].items()))
+        print("   signal quality: " + ", ".join(
+            f"{ch} {q['good_pct']:.1f}%" for ch, q in summary["quality"].items()))
+        for ch, q in summary["quality"].items():
+            flagged = {k: v for k, v in q.items() if k != "good_pct"}
+            if flagged:
+                print(f"   ⚠ {ch}: " + ", ".join(f"{v} {k}" for k, v in flagged.items()))
+        if INSTRUMENTS.enabled:
+            print(INSTRUMENTS.report())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Bounded-memory history of a whole session, in tiers.
+
+    hot     the newest samples at full resolution (float32 RingBuffer)
+    warm    per-bucket count/min/max/sum at each period in HISTORY_TIERS
+            (the rollup format from session_format.py), newest in RAM
+    cold    buckets pushed out of a warm tier, appended to a spill file
+
+Memory is bounded by a byte budget, however long the session runs. The
+arrays are zero-filled by the OS on first touch, so a short session only
+pays for the pages it has written; the spill files grow by one bucket per
+period at most (about 18 MB a day for a 1 s tier of 10 channels). Spill files are a
+cache for this run and are deleted on close; binary sessions remain the
+durable record.
+"""
+import os, shutil, tempfile
+import numpy as np
+
+from ringbuffer import RingBuffer
+from session_format import rollup_dtype
+
+HOT_SHARE = 0.5         # of the budget, for full-resolution samples
+RAW_BIN_LIMIT = 64      # series() bins hot samples up to this many per point
+TIER_BIN_LIMIT = 8      # ...and tier buckets up to this many per point
+
+
+def rebucket(buckets, period):
+    """Merge time-ordered rollup buckets into coarser period-second buckets"""
+    t = buckets["t"] // period * period
+    starts = np.flatnonzero(np.r_[True, t[1:] != t[:-1]])
+    out = np.zeros(len(starts), dtype=buckets.dtype)
+    out["t"] = t[starts]
+    out["count"] = np.add.reduceat(buckets["count"], starts, axis=0)
+    out["sum"] = np.add.reduceat(buckets["sum"], starts, axis=0)
+    out["min"] = np.fmin.reduceat(buckets["min"], starts, axis=0)
+    out["max"] = np.fmax.reduceat(buckets["max"], starts, axis=0)
+    return out
+
+
+# === TIER ===
+class Tier:
+    """Buckets of one period: the newest `capacity` in RAM, older ones spilled to disk"""
+
+    def __init__(self, period, channels, capacity, spill_dir):
+        self.period = int(period)
+        self.dtype = rollup_dtype(channels)
+        self.capacity = max(int(capacity), 1)
+        self.ring = np.zeros(self.capacity, dtype=self.dtype)
+        self.head = 0           # next write slot
+        self.count = 0          # buckets held in RAM
+        self.pending = None     # the newest bucket, still filling
+        self.spill_dir = spill_dir      # callable giving the directory, made on first use
+        self.spill_path = None
+        self.spilled = 0        # buckets in the spill file
+
+    @property
+    def nbytes(self):
+        return self.ring.nbytes
+
+    def add(self, buckets):
+        """Fold time-ordered buckets of this period in; returns the ones that closed"""
+        if not len(buckets):
+            return buckets
+        pending = self.pending
+        if pending is not None and buckets["t"][0] == pending["t"][0]:
+            first = buckets[0]
+            pending["count"] += first["count"]
+            pending["sum"] += first["sum"]
+            pending["min"] = np.fmin(pending["min"], first["min"])
+            pending["max"] = np.fmax(pending["max"], first["max"])
+            buckets = buckets[1:]
+            if not len(buckets):
+                return buckets
+        closed = buckets[:-1] if pending is None else np.concatenate((pending, buckets[:-1]))
+        self.pending = buckets[-1:].copy()
+        self._store(closed)
+        return closed
+
+    def _store(self, closed):
+        n, cap = len(closed), self.capacity
+        if not n:
+            return
+        over = self.count + n - cap
+        if over > 0:
+            # Oldest buckets in RAM first, then any of the new ones that don't fit
+            evict = min(over, self.count)
+            self._spill(self.ring.take((self.head - self.count + np.arange(evict)) % cap))
+            self.count -= evict
+            if over > evict:
+                self._spill(closed[:over - evict])
+                closed = closed[over - evict:]
+                n = len(closed)
+        self.ring[(self.head + np.arange(n)) % cap] = closed
+        self.head = (self.head + n) % cap
+        self.count += n
+
+    def _spill(self, buckets):
+        if self.spill_path is None:
+            self.spill_path = os.path.join(self.spill_dir(), f"tier_{self.period}s.bin")
+        with open(self.spill_path, "ab") as f:
+            buckets.tofile(f)
+        self.spilled += len(buckets)
+
+    def _range(self, t, start, end):
+        return np.searchsorted(t, start - self.period, "right"), np.searchsorted(t, end, "left")
+
+    def buckets(self, start, end):
+        """Buckets overlapping [start, end), oldest first, the filling one included"""
+        parts = []
+        if self.spilled:
+            cold = np.memmap(self.spill_path, dtype=self.dtype, mode="r", shape=(self.spilled,))
+            i0, i1 = self._range(cold["t"], start, end)
+            if i1 > i0:
+                parts.append(np.array(cold[i0:i1]))
+            del cold
+        if self.count:
+            order = (self.head - self.count + np.arange(self.count)) % self.capacity
+            i0, i1 = self._range(self.ring["t"][order], start, end)
+            parts.append(self.ring.take(order[i0:i1]))
+        if self.pending is not None and start - self.period < self.pending["t"][0] < end:
+            parts.append(self.pending)
+        if not parts:
+            return np.zeros(0, dtype=self.dtype)
+        return np.concatenate(parts)
+
+
+# === TIERED HISTORY ===
+class TieredHistory:
+    """Hot samples plus warm/cold tiers, within budget_bytes of RAM"""
+
+    def __init__(self, channels, budget_bytes, periods=(1, 10, 60), spill_dir=None):
+        self.channels = list(channels)
+        self.index = {ch: i for i, ch in enumerate(self.channels)}
+        self.budget = int(budget_bytes)
+        k = len(self.channels)
+        # RingBuffer stores every sample twice: float32 values plus a float64 stamp
+        hot_rows = int(self.budget * HOT_SHARE) // (2 * (4 * k + 8))
+        self.hot = RingBuffer(self.channels, hot_rows, np.float32)
+        self.hot_t = RingBuffer(["t"], hot_rows)
+        self._spill_root = spill_dir
+        self.spill_dir = None   # created on the first spill
+        tier_bytes = (self.budget - self.hot.data.nbytes - self.hot_t.data.nbytes) // max(len(periods), 1)
+        itemsize = rollup_dtype(self.channels).itemsize
+        self.tiers = [Tier(p, self.channels, tier_bytes // itemsize, self._make_spill_dir)
+                      for p in sorted(periods)]
+
+    def _make_spill_dir(self):
+        if self.spill_dir is None:
+            if self._spill_root:
+                os.makedirs(self._spill_root, exist_ok=True)
+            self.spill_dir = tempfile.mkdtemp(prefix="history_", dir=self._spill_root)
+        return self.spill_dir
+
+    @property
+    def nbytes(self):
+        """RAM the history may hold: its budget, reached once the rings have filled"""
+        return self.hot.data.nbytes + self.hot_t.data.nbytes + sum(t.nbytes for t in self.tiers)
+
+    @property
+    def spilled(self):
+        return sum(t.spilled for t in self.tiers)
+
+    @property
+    def start(self):
+        """Wall time of the oldest sample represented, or None"""
+        if not self.hot.count:
+            return None
+        if self.hot.total == self.hot.count:
+            return float(self.hot_t.view("t")[0])
+        # The finest tier saw every sample; its first bucket is the oldest
+        tier = self.tiers[0]
+        if tier.spilled:
+            return float(np.fromfile(tier.spill_path, dtype=tier.dtype, count=1)["t"][0])
+        if tier.count:
+            return float(tier.ring["t"][(tier.head - tier.count) % tier.capacity])
+        return float(tier.pending["t"][0])
+
+    def extend(self, times, values, valid=None):
+        """Append a time-ordered batch: wall seconds (n,), values (n, channels), valid mask or None"""
+        n = len(times)
+        if not n:
+            return
+        self.hot.extend(values)
+        self.hot_t.extend(np.asarray(times)[:, None])
+        if valid is None:
+            valid = np.ones(values.shape, dtype=bool)
+        v = np.asarray(values, dtype=np.float64)
+        samples = np.zeros(n, dtype=self.tiers[0].dtype)
+        samples["t"] = np.floor(times)
+        samples["count"] = valid
+        samples["sum"] = np.where(valid, v, 0.0)
+        samples["min"] = samples["max"] = np.where(valid, v, np.nan)
+        buckets = samples
+        for tier in self.tiers:
+            buckets = tier.add(rebucket(buckets, tier.period))
+            if not len(buckets):
+                break
+
+    def series(self, channel, start, end, points=2000):
+        """(t, y, lo, hi) for plotting [start, end), same shape as SessionStore.series"""
+        ci = self.index[channel]
+        points = max(int(points), 1)
+        duration = max(end - start, 1e-9)
+        times = self.hot_t.view("t")
+        evicted = self.hot.total > self.hot.count
+        if len(times) and (not evicted or times[0] <= start):
+            i0, i1 = np.searchsorted(times, [start, end], "left")
+            if i1 - i0 <= points * RAW_BIN_LIMIT:
+                t = times[i0:i1].copy()
+                y = self.hot.view(channel)[i0:i1].astype(float)
+                if len(t) <= points:
+                    return t, y, y, y
+                starts = np.arange(0, len(t), int(np.ceil(len(t) / points)))
+                mean = np.add.reduceat(y, starts) / np.diff(np.r_[starts, len(y)])
+                return t[starts], mean, np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)
+        tier = next((t for t in self.tiers if duration / t.period <= points * TIER_BIN_LIMIT), self.tiers[-1])
+        b = tier.buckets(start, end)
+        period = tier.period
+        if len(b) > points:
+            period = int(np.ceil(duration / points / tier.period)) * tier.period
+            b = rebucket(b, period)
+        count = b["count"][:, ci]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, b["sum"][:, ci] / count, np.nan)
+        return b["t"] + period / 2, mean, b["min"][:, ci].astype(float), b["max"][:, ci].astype(float)
+
+    def close(self):
+        """Delete the spill files"""
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
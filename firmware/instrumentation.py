@@ -0,0 +1,269 @@
+"""Stage timings, latencies, queue depths and error counts for the whole app.
+
+Hot paths call ``INSTRUMENTS.record(stage, t0_ns, device)`` with a
+``time.perf_counter_ns()`` start stamp; while instrumentation is off that
+is a single attribute check. Gauges and counters that already live on
+objects (reader backlog, logger queue, sensor errors) are registered as
+callbacks and only read when a snapshot is taken, so they cost nothing on
+the data path. Snapshots export as JSON or Prometheus text, to a file or
+over HTTP:
+
+    python headless.py synthetic --mode fast --frames 100000 --metrics metrics.prom
+    python plots.py --device synthetic --metrics-port 9100   # curl :9100/metrics
+"""
+import os, json, time, bisect, threading
+from functools import partial
+
+# Bucket upper bounds in seconds: 10 µs .. ~84 s, doubling
+BUCKETS = tuple(10e-6 * 2 ** i for i in range(24))
+PREFIX = "heartware_"
+
+
+# === HISTOGRAM ===
+class Histogram:
+    """Fixed log-spaced buckets; record is a bisect and a few adds"""
+
+    __slots__ = ("counts", "count", "sum", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)     # last slot: above the largest bound
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Estimate from the buckets (linear within a bucket, clamped to min/max)"""
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = BUCKETS[i - 1] if i else 0.0
+                hi = BUCKETS[i] if i < len(BUCKETS) else self.max
+                value = lo + (hi - lo) * (rank - seen) / n
+                return min(max(value, self.min), self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else float("nan"),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.count else float("nan"),
+        }
+
+
+# === INSTRUMENTS ===
+class Instruments:
+    """Registry of stage histograms and callback gauges/counters, labelled by device"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.time()
+        self._histograms = {}       # (name, device) -> Histogram
+        self._providers = []        # (owner id, name, kind, labels, fn)
+        self._lock = threading.Lock()
+        self._server = None
+        self._export_path = None
+        self._stop_event = threading.Event()
+        self._writer = None
+
+    # --- data path ---
+    def record(self, name, t0_ns, device=""):
+        """Add the time since t0_ns (perf_counter_ns) to histogram name"""
+        if not self.enabled:
+            return
+        self.observe(name, (time.perf_counter_ns() - t0_ns) / 1e9, device)
+
+    def lap(self, name, t0_ns, device=""):
+        """record() and return a fresh start stamp for the next stage"""
+        if not self.enabled:
+            return t0_ns
+        now = time.perf_counter_ns()
+        self.observe(name, (now - t0_ns) / 1e9, device)
+        return now
+
+    def latency(self, name, arrival_ns, device=""):
+        """Add the time since a frame's monotonic arrival stamp to histogram name"""
+        if not self.enabled:
+            return
+        self.observe(name, (time.monotonic_ns() - arrival_ns) / 1e9, device)
+
+    def observe(self, name, seconds, device=""):
+        if not self.enabled:
+            return
+        key = (name, device)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.add(seconds)
+
+    # --- gauges and counters read at snapshot time ---
+    def register(self, owner, name, fn, kind="gauge", **labels):
+        """Read fn() for metric name whenever a snapshot is taken"""
+        with self._lock:
+            self._providers.append((id(owner), name, kind, labels, fn))
+
+    def register_attrs(self, owner, metrics, **labels):
+        """register() (name, attribute, kind) triples read straight off owner"""
+        for name, attr, kind in metrics:
+            self.register(owner, name, partial(getattr, owner, attr), kind, **labels)
+
+    def unregister(self, owner):
+        with self._lock:
+            self._providers = [p for p in self._providers if p[0] != id(owner)]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+        self.started = time.time()
+
+    # --- export ---
+    def snapshot(self):
+        with self._lock:
+            hists = {key: (list(h.counts), h.summary(), h.sum) for key, h in self._histograms.items()}
+            providers = list(self._providers)
+        values = []
+        for _, name, kind, labels, fn in providers:
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            values.append({"name": name, "kind": kind, "labels": labels, "value": value})
+        values.sort(key=lambda m: m["name"])     # keeps each metric's samples together
+        return {
+            "time": time.time(),
+            "uptime_s": time.time() - self.started,
+            "enabled": self.enabled,
+            "histograms": [
+                dict(name=name, device=device, buckets=counts, sum=total, **summary)
+                for (name, device), (counts, summary, total) in sorted(hists.items())
+            ],
+            "metrics": values,
+        }
+
+    def to_json(self, snapshot=None):
+        snap = snapshot or self.snapshot()
+        return json.dumps(snap, indent=2, default=lambda v: None)
+
+    def to_prometheus(self, snapshot=None):
+        snap = snapshot or self.snapshot()
+        lines = []
+        declared = set()
+        for h in snap["histograms"]:
+            metric = f"{PREFIX}{h['name']}_seconds"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            label = f'device="{h["device"]}",' if h["device"] else ""
+            cumulative = 0
+            for bound, n in zip(BUCKETS, h["buckets"]):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{{label}le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{label}le="+Inf"}} {h["count"]}')
+            lines.append(f"{metric}_sum{{{label.rstrip(',')}}} {h['sum']:.9g}")
+            lines.append(f"{metric}_count{{{label.rstrip(',')}}} {h['count']}")
+        for m in snap["metrics"]:
+            metric = PREFIX + m["name"]
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} {m['kind']}")
+            label = ",".join(f'{k}="{v}"' for k, v in sorted(m["labels"].items()))
+            lines.append(f"{metric}{{{label}}} {m['value']:.9g}")
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """Stage timings as a plain-text table"""
+        lines = [f"{'stage':<20}{'device':<18}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for h in self.snapshot()["histograms"]:
+            lines.append(f"{h['name']:<20}{h['device'][:17]:<18}{h['count']:>8}"
+                         f"{h['p50'] * 1e3:>10.3f}{h['p99'] * 1e3:>10.3f}{h['max'] * 1e3:>10.3f}")
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Write a snapshot to path atomically: JSON for *.json, Prometheus text otherwise"""
+        snap = self.snapshot()
+        text = self.to_json(snap) if path.endswith(".json") else self.to_prometheus(snap)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics (Prometheus) and /metrics.json from a daemon thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        instruments = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, kind = instruments.to_json(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, kind = instruments.to_prometheus(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[1]
+
+    def start(self, path=None, port=None, interval=10.0):
+        """Turn recording on; write a snapshot to path every interval seconds and/or serve port"""
+        self.enabled = True
+        if port:
+            port = self.serve(port)
+            print(f"✅ Metrics on http://127.0.0.1:{port}/metrics")
+        if path and self._writer is None:
+            self._export_path = path
+            self._writer = threading.Thread(target=self._export_loop, args=(interval,),
+                                            name="metrics-export", daemon=True)
+            self._writer.start()
+        return self
+
+    def _export_loop(self, interval):
+        while not self._stop_event.wait(interval):
+            try:
+                self.write(self._export_path)
+            except OSError as e:
+                print(f"⚠ Metrics export failed: {e}")
+
+    def close(self):
+        """Stop exporting; the file gets a final snapshot"""
+        if self._writer is not None:
+            self._stop_event.set()
+            self._writer.join(2.0)
+            self._writer = None
+            self.write(self._export_path)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Process-wide registry; the entry points switch it on (INSTRUMENTATION in config or --metrics flags)
+INSTRUMENTS = Instruments()
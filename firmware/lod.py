@@ -0,0 +1,112 @@
+import numpy as np
+from ringbuffer import RingBuffer
+
+
+# === LEVEL-OF-DETAIL PYRAMID ===
+class MinMaxPyramid:
+    """Min/max envelopes of every channel at factor**k decimation.
+
+    Level 0 is the raw RingBuffer shared with the rest of the app; levels
+    1..levels are built incrementally as batches arrive, so a query never
+    rescans raw samples. Each level keeps ``capacity`` bins, so coarse
+    levels reach much further back in history than the raw buffer.
+    Sample positions are global indices (``RingBuffer.total`` based).
+    """
+
+    def __init__(self, raw, factor=8, levels=6, capacity=4096):
+        self.raw = raw
+        self.factor = factor
+        self.channels = raw.channels
+        n = len(self.channels)
+        # Rows 0..n-1 hold bin minima, rows n..2n-1 bin maxima
+        self.levels = [RingBuffer(range(2 * n), capacity, raw.data.dtype) for _ in range(levels)]
+        # Inputs to level k+1 that do not fill a whole bin yet
+        self._pmin = [np.empty((n, 0)) for _ in range(levels)]
+        self._pmax = [np.empty((n, 0)) for _ in range(levels)]
+
+    def extend(self, batch):
+        """Fold a (n, channels) batch into every level; call alongside raw.extend"""
+        lo = hi = np.asarray(batch, dtype=float).T
+        f = self.factor
+        for k, level in enumerate(self.levels):
+            mins = np.concatenate([self._pmin[k], lo], axis=1)
+            maxs = np.concatenate([self._pmax[k], hi], axis=1)
+            full = mins.shape[1] // f
+            self._pmin[k] = mins[:, full * f:]
+            self._pmax[k] = maxs[:, full * f:]
+            if not full:
+                break
+            c = mins.shape[0]
+            lo = mins[:, :full * f].reshape(c, full, f).min(axis=2)
+            hi = maxs[:, :full * f].reshape(c, full, f).max(axis=2)
+            level.extend(np.vstack([lo, hi]).T)
+
+    def span(self):
+        """(first, stop) global sample range covered by any level"""
+        first = self.raw.total - self.raw.count
+        for k, level in enumerate(self.levels, start=1):
+            if level.count:
+                first = min(first, (level.total - level.count) * self.factor ** k)
+        return first, self.raw.total
+
+    def _pick_level(self, start, stop, pixels):
+        span = max(stop - start, 1)
+        k = 0
+        while k < len(self.levels) and span / self.factor ** k > pixels:
+            k += 1
+        # Go coarser until the level actually holds data back to `start`
+        while k < len(self.levels):
+            if k == 0:
+                first = self.raw.total - self.raw.count
+            else:
+                lvl = self.levels[k - 1]
+                first = (lvl.total - lvl.count) * self.factor ** k
+            if first <= start:
+                break
+            k += 1
+        return k
+
+    def envelope(self, channel, start, stop, pixels):
+        """Points for drawing [start, stop) in about ``pixels`` columns.
+
+        Returns (x, y, lo, hi, xc): an interleaved min/max polyline (x, y) plus
+        per-bin minima/maxima at bin centres xc for envelope shading.
+        """
+        ci = self.raw.index[channel]
+        start, stop = int(max(start, 0)), int(min(stop, self.raw.total))
+        if stop <= start:
+            empty = np.zeros(0)
+            return empty, empty, empty, empty, empty
+        k = self._pick_level(start, stop, max(int(pixels), 1))
+
+        if k == 0:
+            first = self.raw.total - self.raw.count
+            i0 = max(start, first)
+            y = self.raw.last(self.raw.total - i0, channel)[:stop - i0].copy()
+            x = np.arange(i0, i0 + len(y), dtype=float)
+            return x, y, y, y, x
+
+        lvl = self.levels[k - 1]
+        n = len(self.channels)
+        s = self.factor ** k
+        first_bin = lvl.total - lvl.count
+        b0 = max(start // s, first_bin)
+        b1 = min(-(-stop // s), lvl.total)
+        view = lvl.last(lvl.total - b0)[:, :max(b1 - b0, 0)]
+        lo = view[ci]
+        hi = view[n + ci]
+
+        # Samples after the newest full bin live in the pending buffers
+        if b1 == lvl.total and stop > lvl.total * s:
+            tail_lo = [p[ci] for p in self._pmin[:k] if p.shape[1]]
+            tail_hi = [p[ci] for p in self._pmax[:k] if p.shape[1]]
+            if tail_lo:
+                lo = np.append(lo, min(t.min() for t in tail_lo))
+                hi = np.append(hi, max(t.max() for t in tail_hi))
+
+        xc = (b0 + np.arange(len(lo)) + 0.5) * s
+        x = np.repeat(xc, 2)
+        y = np.empty(2 * len(lo))
+        y[0::2] = lo
+        y[1::2] = hi
+        return x, y, np.array(lo), np.array(hi), xc
@@ -0,0 +1,346 @@
+import time
+from collections import deque
+import numpy as np
+
+from config import (
+    CHANNELS, SENSOR_RANGES, DEFAULT_LAST_VALID, MAX_POINTS,
+    CSV_FILE, LOG_HEADER, LOG_FORMAT, LOG_FLUSH_ROWS, LOG_FLUSH_INTERVAL,
+    LOG_ROTATE_BYTES, LOG_ROTATE_HOURLY, LOG_FSYNC, SESSION_DIR,
+    FORECAST_CHANNELS, FORECAST_WINDOW_S, FORECAST_FORGETTING, FORECAST_HORIZON_S, FORECAST_MAX_EXTRAPOLATION,
+    PLOT_LOD_FACTOR, PLOT_LOD_LEVELS, PLOT_LOD_CAPACITY,
+    FRAME_RATE, RATE_WINDOW_S, RATE_TOLERANCE, RATE_RETUNE_MIN_S, ECG_HRV_BEATS, FALL_HOLD_S,
+    HISTORY_MEMORY_MB, HISTORY_TIERS, HISTORY_SPILL_DIR,
+    SIGNAL_QUALITY, QUALITY_GAP_S, QUALITY_WINDOW_S, QUALITY_MIN_GOOD, RULES_FILE, THEME_COLORS,
+    SPECTRAL_SIGNALS, SPECTRAL_BANDS, SPECTRAL_SEGMENT, SPECTRAL_OVERLAP, SPECTRAL_AVERAGE, SPECTRAL_HISTORY_S
+)
+from serial_reader import wall_time, FrameRateEstimator
+from ringbuffer import RingBuffer
+from rolling_stats import StatsBank
+from trend import StreamingTrend
+from lod import MinMaxPyramid
+from history import TieredHistory
+from signal_quality import SignalQuality
+from ecg import QRSDetector
+from fall import FallDetector
+from rules import load_rules, RuleEngine
+from spectral import SpectralEngine
+from instrumentation import INSTRUMENTS
+
+
+def open_loggers(log_format=LOG_FORMAT, csv_file=CSV_FILE, session_dir=SESSION_DIR):
+    """Create the (csv logger, binary session) pair selected by log_format"""
+    from csv_logger import CsvLogger
+    from session_format import SessionWriter
+    logger = session = None
+    if log_format in ("csv", "both"):
+        logger = CsvLogger(
+            csv_file, header=LOG_HEADER,
+            flush_rows=LOG_FLUSH_ROWS, flush_interval=LOG_FLUSH_INTERVAL,
+            rotate_bytes=LOG_ROTATE_BYTES, rotate_hourly=LOG_ROTATE_HOURLY,
+            fsync=LOG_FSYNC
+        )
+    if log_format in ("binary", "both"):
+        session = SessionWriter(
+            f"{session_dir}/session_{time.strftime('%Y%m%d_%H%M%S')}", CHANNELS
+        )
+    return logger, session
+
+
+# === INGEST PIPELINE ===
+class IngestPipeline:
+    """Validation, buffering, analytics state and logging for one frame stream.
+
+    Has no Qt dependency: the dashboard drives it from a timer, the headless
+    runner from a plain loop.
+
+    Fall detection, signal quality, QRS detection and the spectra count
+    their time constants in frames. Unless ``rate`` is given, they start at
+    FRAME_RATE and are rebuilt for the rate measured from the frame arrival
+    stamps whenever the two differ by more than RATE_TOLERANCE.
+
+    ``history_mb`` bounds the whole-session history behind the history
+    view; batch runs, which have no such view, pass 0 to keep none.
+    """
+
+    def __init__(self, channels=CHANNELS, max_points=MAX_POINTS, logger=None, session=None,
+                 stream=None, name="local", verbose=True, spectral_worker=True, rate=None,
+                 history_mb=HISTORY_MEMORY_MB):
+        self.channels = list(channels)
+        self.name = name
+        self.verbose = verbose      # print fall detections as they happen
+        self.spectral_worker = spectral_worker
+        # Fast playback arrives faster than it was sampled, so callers pass its rate
+        self.rate_estimator = None if rate else FrameRateEstimator(RATE_WINDOW_S, RATE_WINDOW_S / 2)
+        self.measured_rate = None   # frames per second from the arrival stamps
+        self._rate_off_since = None # arrival stamp since which the measured rate has been off
+        self._retuned_ns = None     # arrival stamp of the last retune
+        self.buffer = RingBuffer(self.channels, max_points)
+        self.times = RingBuffer(["t"], max_points)     # wall-clock seconds of each buffered row
+        self.pyramid = MinMaxPyramid(self.buffer, PLOT_LOD_FACTOR, PLOT_LOD_LEVELS, PLOT_LOD_CAPACITY)
+        # The whole session for the history view, in a fixed memory budget
+        self.history = (TieredHistory(self.channels, history_mb * 2 ** 20, HISTORY_TIERS, HISTORY_SPILL_DIR)
+                        if history_mb else None)
+        self.stats = StatsBank(self.channels)
+        self.trends = {}
+        self.ecg = self.fall = self.quality = self.spectral = self.rules = None
+        self._tune(rate or FRAME_RATE)
+        self.alert_events = deque(maxlen=100)   # raised or cleared since the last analyze()
+        # Practical range and last valid reading of each sensor, column-aligned
+        self.lower = np.array([SENSOR_RANGES[ch][0] for ch in self.channels], dtype=float)
+        self.upper = np.array([SENSOR_RANGES[ch][1] for ch in self.channels], dtype=float)
+        self.last_valid = np.array([DEFAULT_LAST_VALID[ch] for ch in self.channels], dtype=float)
+        self._flag_bits = 1 << np.arange(len(self.channels))
+        self.logger = logger
+        self.session = session
+        self.stream = stream        # StreamServer fanning frames and events out to viewers
+
+        self.frames_processed = 0
+        self.sensor_error_count = 0
+        self.conversion_errors = np.zeros(len(self.channels), dtype=np.int64)   # per channel
+        self.range_errors = np.zeros(len(self.channels), dtype=np.int64)
+        self.last_error = None
+        self.last_arrival_ns = None     # monotonic arrival stamp of the newest frame
+        INSTRUMENTS.register_attrs(self, [
+            ("frames_processed_total", "frames_processed", "counter"),
+            ("sensor_errors_total", "sensor_error_count", "counter"),
+        ], device=name)
+        INSTRUMENTS.register_attrs(self.rules, [
+            ("rule_alerts_total", "raised", "counter"),
+        ], device=name)
+        for i, rule in enumerate(self.rules.ruleset.names):
+            INSTRUMENTS.register(self.rules, "rule_eval_seconds_total", lambda i=i: self.rules.rule_ns[i] / 1e9,
+                                 "counter", device=name, rule=rule)
+        if self.history is not None:
+            INSTRUMENTS.register_attrs(self.history, [
+                ("history_bytes", "nbytes", "gauge"),
+                ("history_spilled_buckets_total", "spilled", "counter"),
+            ], device=name)
+        for i, ch in enumerate(self.channels):
+            INSTRUMENTS.register(self, "conversion_errors_total", lambda i=i: self.conversion_errors[i],
+                                 "counter", device=name, channel=ch)
+            INSTRUMENTS.register(self, "range_errors_total", lambda i=i: self.range_errors[i],
+                                 "counter", device=name, channel=ch)
+            INSTRUMENTS.register(self, "signal_quality_ratio", lambda i=i: self.quality.fraction()[i],
+                                 "gauge", device=name, channel=ch)
+
+    def _tune(self, rate):
+        """(Re)build the analytics whose time constants are counted in frames, for this rate.
+
+        Detectors and quality checks take over the results and history of the
+        ones they replace, and the rules keep their state with their windows
+        recompiled; the spectra start afresh, their bins having moved.
+        """
+        self.rate = float(rate)
+        # The forecast fit spans FORECAST_WINDOW_S at this rate, and its x axis is the frame index
+        window = int(round(FORECAST_WINDOW_S * self.rate)) if FORECAST_WINDOW_S else None
+        for ch in FORECAST_CHANNELS:
+            if ch in self.trends:
+                self.trends[ch].retime(1 / self.rate, window)
+            else:
+                self.trends[ch] = StreamingTrend(window=window, forgetting=FORECAST_FORGETTING,
+                                                 sample_period=1 / self.rate,
+                                                 max_extrapolation=FORECAST_MAX_EXTRAPOLATION)
+        ecg, fall, quality = self.ecg, self.fall, self.quality
+        self.ecg = QRSDetector(fs=self.rate, hrv_beats=ECG_HRV_BEATS) if "ECG" in self.channels else None
+        self.fall = FallDetector(fs=self.rate, hold_s=FALL_HOLD_S)
+        self.quality = SignalQuality(self.channels, self.rate, SIGNAL_QUALITY, QUALITY_GAP_S, QUALITY_WINDOW_S)
+        if ecg is not None:
+            self.ecg.inherit(ecg)
+        if fall is not None:
+            self.fall.inherit(fall)
+            self.quality.inherit(quality)
+        # Alert, risk and mood rules; the compiled rules file is shared by every device at this rate
+        ruleset = load_rules(RULES_FILE, self.channels, self.rate)
+        if self.rules is None:
+            self.rules = RuleEngine(ruleset)
+        else:
+            self.rules.set_ruleset(ruleset)
+        if self.spectral is not None:
+            INSTRUMENTS.unregister(self.spectral)
+            self.spectral.close()
+        # FFTs run on their own thread unless the caller is already off the GUI thread
+        self.spectral = SpectralEngine(
+            self.channels, self.rate, SPECTRAL_SIGNALS, SPECTRAL_BANDS, SPECTRAL_SEGMENT,
+            SPECTRAL_OVERLAP, SPECTRAL_AVERAGE, SPECTRAL_HISTORY_S, worker=self.spectral_worker, name=self.name
+        )
+        INSTRUMENTS.register_attrs(self.spectral, [
+            ("spectral_segments_total", "segments", "counter"),
+            ("spectral_pending_samples", "pending", "gauge"),
+            ("spectral_dropped_samples_total", "dropped", "counter"),
+        ], device=self.name)
+
+    def _check_rate(self, t_ns):
+        """Retune when the measured frame rate has stayed away from the one in use.
+
+        It must be off by more than RATE_TOLERANCE for a whole RATE_WINDOW_S,
+        and retunes are at least RATE_RETUNE_MIN_S apart, so a jittery rate
+        does not keep rebuilding the analytics.
+        """
+        measured = self.rate_estimator.update(t_ns)
+        if measured is None:
+            return
+        self.measured_rate = measured
+        now = int(t_ns[-1])
+        if abs(measured - self.rate) <= RATE_TOLERANCE * self.rate:
+            self._rate_off_since = None
+            return
+        if self._rate_off_since is None:
+            self._rate_off_since = now
+        if now - self._rate_off_since < RATE_WINDOW_S * 1e9:
+            return
+        if self._retuned_ns is not None and now - self._retuned_ns < RATE_RETUNE_MIN_S * 1e9:
+            return
+        if self.verbose:
+            print(f"⚠ {self.name}: frames arrive at {measured:.1f} Hz, not {self.rate:.1f} Hz; "
+                  f"retuning fall, quality, ECG, forecast, rules and spectral analysis")
+        self._tune(measured)
+        self._retuned_ns = now
+        self._rate_off_since = None
+
+    # === SENSOR VALIDATION ===
+    def validate(self, raw):
+        """Range-check a (n, channels) block; return (validated values, valid mask).
+
+        Unparsable (NaN) and out-of-range readings are replaced column-wise
+        by the newest valid reading before them, carried across blocks.
+        """
+        valid = (raw >= self.lower) & (raw <= self.upper)
+        if valid.all():
+            values = raw
+        else:
+            # Row of the newest valid reading at or before each row, -1 if none yet
+            rows = np.where(valid, np.arange(len(raw))[:, None], -1)
+            np.maximum.accumulate(rows, axis=0, out=rows)
+            values = np.where(rows >= 0, np.take_along_axis(raw, np.maximum(rows, 0), 0), self.last_valid)
+
+            invalid = ~valid
+            unparsable = np.isnan(raw)
+            self.conversion_errors += unparsable.sum(0)
+            self.range_errors += (invalid & ~unparsable).sum(0)
+            self.sensor_error_count += int(invalid.sum())
+            row, col = divmod(int(np.flatnonzero(invalid)[-1]), len(self.channels))
+            sensor = self.channels[col]
+            if unparsable[row, col]:
+                self.last_error = f"Conversion error for {sensor}. Using last valid value"
+            else:
+                self.last_error = (
+                    f"Sensor error: {sensor} value {raw[row, col]} out of range. Using {values[row, col]}"
+                )
+        self.last_valid = values[-1].copy()
+        return values, valid
+
+    def process(self, block):
+        """Validate, buffer, analyse and log a FrameBlock"""
+        n = block.count
+        if not n:
+            return 0
+        name = self.name
+        start = t0 = time.perf_counter_ns()
+        # Serial arrival to here: reader queue plus the wait for the GUI timer
+        INSTRUMENTS.latency("queue_wait", block.t_ns[0], name)
+        if self.rate_estimator is not None:
+            self._check_rate(block.t_ns)
+        raw = block.values
+        batch, valid = self.validate(raw)
+        flags = valid.dot(self._flag_bits).astype(np.uint16)
+        times = wall_time(block.t_ns)
+        t0 = INSTRUMENTS.lap("validate", t0, name)
+        good, _ = self.quality.process(raw, valid, block.t_ns)
+        # Analytics see flagged samples as missing (NaN)
+        clean = np.where(good, batch, np.nan)
+        t0 = INSTRUMENTS.lap("quality", t0, name)
+
+        # Update buffers with validated values in one batch
+        self.buffer.extend(batch)
+        self.times.extend(times[:, None])
+        self.pyramid.extend(batch)
+        self.stats.extend(batch)
+        for ch, trend in self.trends.items():
+            trend.extend(clean[:, self.buffer.index[ch]])
+        if self.history is not None:
+            self.history.extend(times, batch, good)
+        t0 = INSTRUMENTS.lap("buffers", t0, name)
+        acc = self.buffer.index
+        for event in self.fall.process(clean[:, acc["AccX"]], clean[:, acc["AccY"]],
+                                       clean[:, acc["AccZ"]], block.t_ns[-1]):
+            if self.verbose:
+                print(f"🚨 Fall detected: {event['peak_g']:.1f} g impact, "
+                      f"confirmed {event['latency_s']:.1f}s later")
+            if self.stream:
+                self.stream.publish_event(self.name, "fall", event)
+        t0 = INSTRUMENTS.lap("fall", t0, name)
+        for event in self.rules.process(times, clean):
+            self.alert_events.append(event)
+            if self.verbose:
+                print(f"🚨 {event['message']}" if event["state"] == "active" else f"✅ Cleared: {event['message']}")
+            if self.stream:
+                self.stream.publish_event(self.name, "alert", event)
+        t0 = INSTRUMENTS.lap("rules", t0, name)
+        if self.ecg is not None:
+            self.ecg.process(batch[:, acc["ECG"]])
+            t0 = INSTRUMENTS.lap("ecg", t0, name)
+        # Validated readings, like the QRS detector; flagged samples leave gaps in the spectra
+        self.spectral.extend(times, batch, good)
+        t0 = INSTRUMENTS.lap("spectral_enqueue", t0, name)
+        if self.logger:
+            # Log both raw and validated values; the logger formats and writes off-thread.
+            # Raw fields are the parsed numbers, blank where the line held no number.
+            self.logger.log_many(np.column_stack((times, raw, batch)).tolist())
+            t0 = INSTRUMENTS.lap("log_enqueue", t0, name)
+        if self.session:
+            self.session.write(block.t_ns, batch, flags)
+            t0 = INSTRUMENTS.lap("session_write", t0, name)
+        if self.stream:
+            self.stream.publish_frames(self.name, block.t_ns, batch, flags)
+            INSTRUMENTS.lap("publish", t0, name)
+
+        self.frames_processed += n
+        self.last_arrival_ns = int(block.t_ns[-1])
+        INSTRUMENTS.record("process", start, name)
+        return n
+
+    def latest(self):
+        """Newest validated value of every channel"""
+        return {ch: self.stats[ch].last for ch in self.channels}
+
+    def analyze(self):
+        """Mood, risk, alerts, fall and forecasts for the newest values"""
+        t0 = time.perf_counter_ns()
+        v = self.latest()
+        trusted = self.quality.trusted(QUALITY_MIN_GOOD)
+        # The rules already ran on every batch; this reads their state
+        mood, mood_color = self.rules.mood()
+        events = list(self.alert_events)
+        self.alert_events.clear()
+        result = {
+            "values": v,
+            "mood": mood,
+            "mood_color": THEME_COLORS.get(mood_color, mood_color),
+            "risk": self.rules.risk(),
+            "alerts": self.rules.alerts(),
+            "alert_events": events,
+            "fall": self.fall.active,
+            "fall_event": self.fall.last_event,
+            "forecast": {ch: t.forecast_seconds(FORECAST_HORIZON_S) for ch, t in self.trends.items()},
+            "ecg": self.ecg.metrics() if self.ecg is not None and "ECG" in trusted else None,
+            "quality": {ch: round(100 * q, 1) for ch, q in zip(self.channels, self.quality.fraction())},
+            # Dominant frequency and band powers of the ECG and accelerometer spectra
+            "spectral": self.spectral.features(),
+        }
+        INSTRUMENTS.record("analyze", t0, self.name)
+        if self.stream:
+            self.stream.publish_event(self.name, "analysis", result)
+        return result
+
+    def close(self):
+        INSTRUMENTS.unregister(self)
+        INSTRUMENTS.unregister(self.rules)
+        INSTRUMENTS.unregister(self.spectral)
+        self.spectral.close()
+        if self.history is not None:
+            INSTRUMENTS.unregister(self.history)
+            self.history.close()
+        if self.logger:
+            self.logger.close()
+        if self.session:
+            self.session.close()
@@ -1,141 +1,42 @@
-import sys, time, csv
-import serial
+import os, sys, time, csv, argparse
 import numpy as np
-import requests
 import pyqtgraph as pg
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QPushButton,
     QVBoxLayout, QHBoxLayout, QGridLayout, QComboBox,
-    QGroupBox, QStatusBar, QSplitter, QFrame
+    QGroupBox, QStatusBar, QSplitter
 )
-from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtCore import QTimer, Qt, QRectF
 from PyQt5.QtGui import QFont, QColor, QPalette
+from config import (
+    PORT, CHANNELS, THEME_COLORS, PLOT_WINDOW, FORECAST_HORIZON_S,
+    ALERT_URL, ALERT_SPOOL, ALERT_DEDUP_S, STREAM_ENABLED, STREAM_HOST, STREAM_PORT, STREAM_QUEUE,
+    SESSION_DIR, HISTORY_RANGES, RENDER_INTERVAL_MS, RENDER_IDLE_MS, RENDER_HIDDEN_MS, DISPLAY_STEP,
+    METRICS_FILE, METRICS_PORT, METRICS_INTERVAL_S, INSTRUMENTATION, QUALITY_MIN_GOOD, SPECTRAL_SIGNALS
+)
+from analytics import calculate_trend
+from serial_reader import SerialReader
+from devices import open_source, parse_device
+from pipeline import IngestPipeline, open_loggers
+from alerts import AlertDispatcher
+from render import RenderScheduler, display_step_format
+from instrumentation import INSTRUMENTS
+# The ward overview, stream server, history store and diagnostics panel are
+# imported where they are first used, to keep them off the startup path
 
-# === CONFIG ===
-PORT = "COM4"       # ← Replace with your actual COM port
-BAUD = 115200
-CSV_FILE = "health_log.csv"
-MAX_POINTS = 500
-THEME_COLORS = {
-    'dark_bg': '#1e1e2e',
-    'light_bg': '#2a2a3a',
-    'text': '#e0e0f0',
-    'accent': '#5e9ae0',
-    'critical': '#ff5555',
-    'warning': '#ffb86c',
-    'normal': '#50fa7b'
-}
-
-# Define practical ranges for sensor validation
-SENSOR_RANGES = {
-    "HR": (30, 250),          # Heart Rate (bpm)
-    "SpO2": (70, 100),        # Blood Oxygen (%)
-    "Temp": (30, 42),         # Body Temperature (°C)
-    "Pressure": (900, 1100),  # Atmospheric Pressure (hPa)
-    "Altitude": (-100, 9000), # Altitude (meters)
-    "AccX": (-20, 20),        # Acceleration (g)
-    "AccY": (-20, 20),
-    "AccZ": (-20, 20),
-    "MQ": (0, 5000),          # Air Quality (ppm)
-    "ECG": (-5, 5)            # ECG (voltage)
-}
-
-# === SERIAL INIT ===
-try:
-    ser = serial.Serial(PORT, BAUD, timeout=1)
-    print(f"✅ Connected to {PORT} at {BAUD} baud")
-except Exception as e:
-    print(f"❌ Serial error: {e}")
-    sys.exit(1)
-
-# === BUFFER ===
-BUFFER = {
-    "HR": [], "SpO2": [], "Temp": [], "Pressure": [],
-    "Altitude": [], "AccX": [], "AccY": [], "AccZ": [],
-    "MQ": [], "ECG": []
-}
-
-# Store last valid readings for each sensor
-LAST_VALID = {
-    "HR": 75, "SpO2": 98, "Temp": 36.6, "Pressure": 1013,
-    "Altitude": 0, "AccX": 0, "AccY": 0, "AccZ": 0,
-    "MQ": 0, "ECG": 0
-}
-
-# === SAFE FORECAST ===
-def forecast(values, future=10):
-    if len(values) < 5:
-        return [0] * future
-    try:
-        y = np.array(values, dtype=float)
-        if np.any(np.isnan(y)) or np.any(np.isinf(y)):
-            return [values[-1]] * future
-        if np.std(y) == 0:
-            return [y[-1]] * future
-        x = np.arange(len(y))
-        coeffs = np.polyfit(x, y, 1)
-        x_future = np.arange(len(y), len(y) + future)
-        return coeffs[0] * x_future + coeffs[1]
-    except Exception as e:
-        print("⚠ Forecast error:", e)
-        return [values[-1]] * future if values else [0] * future
-
-# === ANALYTICAL FUNCTIONS ===
-def detect_mood(hr, spo2, temp, ax, ay, az):
-    acc = np.sqrt(ax*2 + ay2 + az*2)
-    hr_var = np.std(BUFFER["HR"][-10:]) if len(BUFFER["HR"]) > 10 else 0
-    
-    if hr > 100 and acc > 2.5 and hr_var > 8:
-        return ("Stressed", THEME_COLORS['critical'])
-    if hr < 65 and spo2 > 97 and acc < 0.5 and hr_var < 3:
-        return ("Relaxed", THEME_COLORS['normal'])
-    if hr > 90 and spo2 < 94 and temp > 37.2:
-        return ("Fatigued", THEME_COLORS['warning'])
-    if acc > 3.0 and hr > 85:
-        return ("Active", '#a0a0ff')
-    return ("Neutral", THEME_COLORS['accent'])
-
-def risk_index(temp, mq, pressure, hr, spo2):
-    score = 0
-    if temp > 37.5: score += 25
-    if mq > 3000: score += 30
-    if pressure < 980: score += 15
-    if hr > 120 or hr < 50: score += 20
-    if spo2 < 92: score += 25
-    return min(max(score, 0), 100)
-
-def detect_fall(ax, ay, az, hr):
-    acc_mag = np.sqrt(ax*2 + ay2 + az*2)
-    return acc_mag < 0.3 and (hr < 50 or hr > 140)
-
-def calculate_trend(data):
-    if len(data) < 2:
-        return "stable"
-    trend = data[-1] - data[-2]
-    if abs(trend) < 0.1:
-        return "stable"
-    return "rising" if trend > 0 else "falling"
-
-# === SENSOR VALIDATION ===
-def validate_sensor_value(sensor, value):
-    """Validate sensor reading against practical range"""
-    min_val, max_val = SENSOR_RANGES[sensor]
-    
-    if min_val <= value <= max_val:
-        LAST_VALID[sensor] = value
-        return value
-    else:
-        print(f"⚠ Invalid {sensor} reading: {value:.1f} (using last valid: {LAST_VALID[sensor]:.1f})")
-        return LAST_VALID[sensor]
+SERIAL_TICK_MS = 100
 
 # === VITAL INDICATOR WIDGET ===
 class VitalIndicator(QLabel):
-    def _init_(self, title, unit, normal_range, parent=None):
-        super()._init_(parent)
+    def __init__(self, title, unit, normal_range, step=0.1, scheduler=None, parent=None):
+        super().__init__(parent)
         self.title = title
         self.unit = unit
         self.normal_range = normal_range
+        self.step = step            # display precision; changes below it don't repaint
+        self.scheduler = scheduler or RenderScheduler()
         self.value = 0
+        self.stats = None
         self.setMinimumWidth(120)
         self.setAlignment(Qt.AlignCenter)
         self.setStyleSheet("""
@@ -146,18 +47,19 @@ class VitalIndicator(QLabel):
         """)
         self.update_display()
         
-    def update_value(self, value):
+    def update_value(self, value, stats=None):
         self.value = value
+        self.stats = stats
         self.update_display()
         
     def update_display(self):
         # Handle invalid values
         if self.value is None or np.isnan(self.value) or np.isinf(self.value):
-            self.setText(
+            self.scheduler.set_text(self, None, lambda: (
                 f"<b><font size='5' color='{THEME_COLORS['warning']}'>N/A</font></b>"
                 f"<br><font size='4'>-</font>"
                 f"<br><font size='3' color='#a0a0a0'>{self.title}</font>"
-            )
+            ))
             return
             
         color = THEME_COLORS['normal']
@@ -168,21 +70,25 @@ class VitalIndicator(QLabel):
             elif not (low * 1.1 <= self.value <= high * 0.9):
                 color = THEME_COLORS['warning']
                 
-        trend = calculate_trend(BUFFER.get(self.title, []))
+        trend = calculate_trend(self.stats) if self.stats is not None else "stable"
         trend_symbol = "→" if trend == "stable" else "↑" if trend == "rising" else "↓"
+        shown = display_step_format(self.value, self.step)
         
-        self.setText(
-            f"<b><font size='5' color='{color}'>{self.value:.1f}</font></b>"
+        self.scheduler.set_text(self, (shown, color, trend_symbol), lambda: (
+            f"<b><font size='5' color='{color}'>{shown}</font></b>"
             f"<br><font size='4'>{trend_symbol} {self.unit}</font>"
             f"<br><font size='3' color='#a0a0a0'>{self.title}</font>"
-        )
+        ))
 
 # === MAIN DASHBOARD ===
 class HealthDashboard(QMainWindow):
-    def _init_(self):
-        super()._init_()
+    def __init__(self, source, pipeline=None):
+        super().__init__()
         self.setWindowTitle("Senso Health Analytics")
         self.setGeometry(100, 100, 1400, 800)
+        # Repaint only what changed, at a rate that follows the data
+        self.scheduler = RenderScheduler(RENDER_INTERVAL_MS, RENDER_IDLE_MS, RENDER_HIDDEN_MS)
+        self._rendered_frames = 0
         
         # Apply dark theme
         self.setStyleSheet(f"""
@@ -247,8 +153,16 @@ class HealthDashboard(QMainWindow):
         self.export_btn.clicked.connect(self.export_data)
         self.export_btn.setFixedWidth(150)
         
+        # Stage timings, latencies and queue depths
+        self.diagnostics_btn = QPushButton("Diagnostics")
+        self.diagnostics_btn.setFont(QFont("Segoe UI", 8))
+        self.diagnostics_btn.clicked.connect(self.show_diagnostics)
+        self.diagnostics_btn.setFixedWidth(100)
+        self.diagnostics = None
+        
         header_layout.addWidget(title)
         header_layout.addStretch()
+        header_layout.addWidget(self.diagnostics_btn)
         header_layout.addWidget(self.export_btn)
         
         main_layout.addLayout(header_layout)
@@ -269,13 +183,16 @@ class HealthDashboard(QMainWindow):
         metrics_group.setLayout(metrics_layout)
         
         # Create vital indicators
+        indicator = lambda name, unit, normal_range: VitalIndicator(
+            name, unit, normal_range, DISPLAY_STEP.get(name, 0.1), self.scheduler
+        )
         self.indicators = {
-            "HR": VitalIndicator("HR", "bpm", (60, 100)),
-            "SpO2": VitalIndicator("SpO2", "%", (95, 100)),
-            "Temp": VitalIndicator("Temp", "°C", (36.0, 37.5)),
-            "Pressure": VitalIndicator("Pressure", "hPa", (980, 1030)),
-            "Altitude": VitalIndicator("Altitude", "m", None),
-            "MQ": VitalIndicator("MQ", "ppm", (0, 2000))
+            "HR": indicator("HR", "bpm", (60, 100)),
+            "SpO2": indicator("SpO2", "%", (95, 100)),
+            "Temp": indicator("Temp", "°C", (36.0, 37.5)),
+            "Pressure": indicator("Pressure", "hPa", (980, 1030)),
+            "Altitude": indicator("Altitude", "m", None),
+            "MQ": indicator("MQ", "ppm", (0, 2000))
         }
         
         # Position indicators
@@ -315,6 +232,29 @@ class HealthDashboard(QMainWindow):
         """)
         status_layout.addWidget(self.risk_display)
         
+        # ECG-derived heart rate and variability
+        self.ecg_display = QLabel("<b>ECG:</b> Waiting for beats...")
+        self.ecg_display.setFont(QFont("Segoe UI", 10))
+        self.ecg_display.setAlignment(Qt.AlignCenter)
+        self.ecg_display.setStyleSheet("""
+            background: """ + THEME_COLORS['light_bg'] + """;
+            border-radius: 8px;
+            padding: 10px;
+        """)
+        status_layout.addWidget(self.ecg_display)
+        
+        # Channels the analytics are currently ignoring, and why
+        self.quality_display = QLabel("<b>Signal quality:</b> Waiting for data...")
+        self.quality_display.setFont(QFont("Segoe UI", 9))
+        self.quality_display.setAlignment(Qt.AlignCenter)
+        self.quality_display.setWordWrap(True)
+        self.quality_display.setStyleSheet("""
+            background: """ + THEME_COLORS['light_bg'] + """;
+            border-radius: 8px;
+            padding: 8px;
+        """)
+        status_layout.addWidget(self.quality_display)
+        
         left_layout.addWidget(status_group)
         
         # Alerts group
@@ -356,10 +296,18 @@ class HealthDashboard(QMainWindow):
         # Plot selection
         plot_select_layout = QHBoxLayout()
         self.plot_select = QComboBox()
-        self.plot_select.addItems(BUFFER.keys())
+        self.plot_select.addItems(CHANNELS)
+        # Spectrogram of each spectral signal, after the channels
+        self.spectrograms = {f"{signal} Spectrogram": signal for signal in SPECTRAL_SIGNALS}
+        self.plot_select.addItems(list(self.spectrograms))
         self.plot_select.setCurrentIndex(0)
         plot_select_layout.addWidget(QLabel("Select Visualization:"))
         plot_select_layout.addWidget(self.plot_select)
+        
+        # Live buffer, or the tiered history / recorded sessions further back
+        self.range_select = QComboBox()
+        self.range_select.addItems([label for label, _ in HISTORY_RANGES])
+        plot_select_layout.addWidget(self.range_select)
         plot_select_layout.addStretch()
         right_layout.addLayout(plot_select_layout)
         
@@ -380,12 +328,25 @@ class HealthDashboard(QMainWindow):
         ).getLookupTable()
         
         self.curve = self.plot.plot(pen=pg.mkPen('#5e9ae0', width=3))
+        # Shade the min/max envelope of each decimated bin
+        self.env_lo = pg.PlotDataItem()
+        self.env_hi = pg.PlotDataItem()
         self.fill = pg.FillBetweenItem(
-            self.curve, 
-            pg.PlotDataItem(),
+            self.env_lo, 
+            self.env_hi,
             brush=pg.mkBrush(QColor(94, 154, 224, 80))
         )
         self.plot.addItem(self.fill)
+        # Power in dB over time and frequency, shown instead of the curve for spectrogram choices
+        self.spectrogram = pg.ImageItem(axisOrder="row-major")
+        self.spectrogram.setLookupTable(gradient)
+        self.spectrogram.hide()
+        self.plot.addItem(self.spectrogram)
+        self.plot.getViewBox().sigXRangeChanged.connect(self.on_plot_range_changed)
+        self.plot_select.currentIndexChanged.connect(self.update_plot)
+        self.range_select.currentIndexChanged.connect(self.update_plot)
+        self.history_store = None
+        self._history_key = None
         
         right_layout.addWidget(self.plot)
         
@@ -394,158 +355,184 @@ class HealthDashboard(QMainWindow):
         splitter.addWidget(right_panel)
         splitter.setSizes([500, 900])
         
-        # Setup timers
+        # Setup pipeline, alerts and timers
+        if pipeline is None:
+            logger, session = open_loggers()
+            pipeline = IngestPipeline(logger=logger, session=session)
+        self.pipeline = pipeline
+        
+        self.alerts = AlertDispatcher(ALERT_URL, spool_path=ALERT_SPOOL,
+                                      dedup_window=ALERT_DEDUP_S)
+        
+        # Connects (and reconnects) on the reader thread; the window never waits for the port
+        self.reader = SerialReader(source, name=pipeline.name, connect=True)
+        self.reader.start()
+        
         self.serial_timer = QTimer()
         self.serial_timer.timeout.connect(self.read_serial)
-        self.serial_timer.start(100)
+        self.serial_timer.start(SERIAL_TICK_MS)
+        self._last_tick_ns = None
+        self.render_errors = 0
+        INSTRUMENTS.register(self, "repaints_total", lambda: self.scheduler.performed,
+                             "counter", device=pipeline.name)
+        INSTRUMENTS.register(self, "repaints_skipped_total", lambda: self.scheduler.skipped,
+                             "counter", device=pipeline.name)
+        INSTRUMENTS.register_attrs(self, [("render_errors_total", "render_errors", "counter")],
+                                   device=pipeline.name)
         
         self.update_timer = QTimer()
         self.update_timer.timeout.connect(self.update_dashboard)
-        self.update_timer.start(500)
+        self.update_timer.start(RENDER_INTERVAL_MS)
         
         self.last_alert = ""
         self.fall_detected = False
-        self.sensor_error_count = 0
         
     def read_serial(self):
+        """Process every frame the background reader queued since the last tick"""
+        if INSTRUMENTS.enabled:
+            # How late this timer fired: time the GUI thread was busy elsewhere
+            now = time.perf_counter_ns()
+            if self._last_tick_ns is not None:
+                late = (now - self._last_tick_ns) / 1e9 - self.serial_timer.interval() / 1000
+                INSTRUMENTS.observe("event_loop_lag", max(late, 0.0), self.pipeline.name)
+            self._last_tick_ns = now
         try:
-            if ser.in_waiting:
-                line = ser.readline().decode().strip()
-                if not line.startswith("PYTHON->"): 
-                    return
-                    
-                raw_values = line.replace("PYTHON->", "").split(",")
-                if len(raw_values) != 10: 
-                    return
-                
-                # Validate and process sensor values
-                validated_values = []
-                keys = list(BUFFER.keys())
-                
-                for i, raw_val in enumerate(raw_values):
-                    try:
-                        value = float(raw_val)
-                        sensor = keys[i]
-                        
-                        # Validate against practical range
-                        min_val, max_val = SENSOR_RANGES[sensor]
-                        if min_val <= value <= max_val:
-                            validated_values.append(value)
-                            LAST_VALID[sensor] = value
-                        else:
-                            # Use last valid value if current is out of range
-                            validated_values.append(LAST_VALID[sensor])
-                            self.sensor_error_count += 1
-                            self.status_bar.showMessage(
-                                f"Sensor error: {sensor} value {value} out of range. Using {LAST_VALID[sensor]}"
-                            )
-                    except ValueError:
-                        # Handle conversion errors
-                        validated_values.append(LAST_VALID[keys[i]])
-                        self.sensor_error_count += 1
-                        self.status_bar.showMessage(
-                            f"Conversion error for {keys[i]}. Using last valid value"
-                        )
-                
-                # Update buffers with validated values
-                for i in range(10):
-                    BUFFER[keys[i]].append(validated_values[i])
-                    if len(BUFFER[keys[i]]) > MAX_POINTS:
-                        BUFFER[keys[i]].pop(0)
-                
-                # Save to CSV with both raw and validated values
-                with open(CSV_FILE, "a", newline="", encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([time.strftime("%Y-%m-%d %H:%M:%S")] + 
-                                   raw_values + 
-                                   [str(v) for v in validated_values])
-                    
-                self.status_bar.showMessage(
-                    f"Last update: {time.strftime('%H:%M:%S')} | "
-                    f"Points: {len(BUFFER['HR'])} | "
-                    f"Errors: {self.sensor_error_count}"
-                )
+            block = self.reader.drain()
+            serial_error = self.reader.last_error
+            self.reader.last_error = None
+            if not block.count:
+                if serial_error:
+                    self.status_bar.showMessage(f"Serial error: {serial_error}")
+                return
+            
+            self.pipeline.process(block)
+            
+            reader = self.reader
+            # Serial and validation errors from this block go on the status line, not under it
+            errors = [f"Serial error: {serial_error}"] if serial_error else []
+            if self.pipeline.last_error:
+                errors.append(self.pipeline.last_error)
+                self.pipeline.last_error = None
+            error = "".join(f" | {e}" for e in errors)
+            self.status_bar.showMessage(
+                f"Last update: {time.strftime('%H:%M:%S')} | "
+                f"Points: {self.pipeline.buffer.count} | "
+                f"Errors: {self.pipeline.sensor_error_count} | "
+                f"{reader.frames_per_sec:.0f} fps, {reader.bytes_per_sec / 1024:.1f} KB/s | "
+                f"Backlog: {reader.port_backlog} B + {reader.pending_frames} frames | "
+                f"Dropped: {reader.dropped_frames} | "
+                f"Repaints: {self.scheduler.performed} done, {self.scheduler.skipped} skipped | "
+                f"Alerts sent: {self.alerts.sent}, pending: {self.alerts.pending}"
+                f"{error}"
+            )
                 
         except Exception as e:
             self.status_bar.showMessage(f"Serial error: {str(e)}")
     
     def update_dashboard(self):
-        if not BUFFER["HR"]:
+        visible = self.isVisible() and not self.isMinimized()
+        interval = self.scheduler.interval(self.reader.frames_per_sec, visible)
+        if interval != self.update_timer.interval():
+            self.update_timer.setInterval(interval)
+        # No new frames since the last update: nothing shown can have changed
+        if self.pipeline.frames_processed == self._rendered_frames:
             return
+        self._rendered_frames = self.pipeline.frames_processed
+        t0 = time.perf_counter_ns()
             
         try:
-            # Get latest validated values
-            hr = BUFFER["HR"][-1]
-            spo2 = BUFFER["SpO2"][-1]
-            temp = BUFFER["Temp"][-1]
-            pres = BUFFER["Pressure"][-1]
-            alt = BUFFER["Altitude"][-1]
-            mq = BUFFER["MQ"][-1]
-            ax = BUFFER["AccX"][-1]
-            ay = BUFFER["AccY"][-1]
-            az = BUFFER["AccZ"][-1]
-            ecg = BUFFER["ECG"][-1]
+            # Get latest validated values and analytics
+            result = self.pipeline.analyze()
+            values = result["values"]
+            
+            # Check for alerts
+            alert_text = "No critical alerts"
+            alert_state = "normal"
+            alert_style = f"color: {THEME_COLORS['normal']};"
+            
+            if result["fall"] and not self.fall_detected:
+                self.fall_detected = True
+                self.last_alert = f"🚨 FALL DETECTED! At {time.strftime('%H:%M:%S')}"
+                # Send emergency notification (queued, delivered off the GUI thread)
+                self.alerts.submit("fall", {"message": "Fall detected!", "priority": "critical"})
+            
+            # Rules marked "notify" in the rules file are sent as they are raised
+            for event in result["alert_events"]:
+                if event["notify"]:
+                    self.alerts.submit(event["rule"], {"message": event["message"], "priority": event["severity"]})
+                
+            if self.fall_detected:
+                alert_text = self.last_alert
+                alert_state = "fall"
+                alert_style = "background-color: #ff5555; color: white; font-weight: bold;"
+                
+            elif result["alerts"]:
+                # Active alert rules, in the order the rules file lists them
+                alert = result["alerts"][0]
+                alert_text = f"⚠ {alert['message']}"
+                alert_state = alert["severity"]
+                alert_style = f"color: {THEME_COLORS[alert['severity']]};"
+            
+            # Minimised: analytics and alerts above still run, repaints wait
+            if not visible:
+                return
             
             # Update indicators
-            self.indicators["HR"].update_value(hr)
-            self.indicators["SpO2"].update_value(spo2)
-            self.indicators["Temp"].update_value(temp)
-            self.indicators["Pressure"].update_value(pres)
-            self.indicators["Altitude"].update_value(alt)
-            self.indicators["MQ"].update_value(mq)
+            stats = self.pipeline.stats
+            for name, indicator in self.indicators.items():
+                indicator.update_value(values[name], stats[name])
             
             # Update mood
-            mood, mood_color = detect_mood(hr, spo2, temp, ax, ay, az)
-            self.mood_display.setText(
+            mood, mood_color = result["mood"], result["mood_color"]
+            self.scheduler.set_text(self.mood_display, (mood, mood_color), lambda: (
                 f"<b>Emotional Status:</b>"
                 f"<br><font size='5' color='{mood_color}'>{mood}</font>"
-            )
+            ))
             
             # Update risk
-            risk = risk_index(temp, mq, pres, hr, spo2)
+            risk = result["risk"]
             risk_color = THEME_COLORS['normal']
             if risk > 60:
                 risk_color = THEME_COLORS['critical']
             elif risk > 30:
                 risk_color = THEME_COLORS['warning']
-                
-            self.risk_display.setText(
+            
+            risk_text = f"{risk:.0f}"
+            self.scheduler.set_text(self.risk_display, (risk_text, risk_color), lambda: (
                 f"<b>Risk Index:</b>"
-                f"<br><font size='5' color='{risk_color}'>{risk:.0f}/100</font>"
-            )
+                f"<br><font size='5' color='{risk_color}'>{risk_text}/100</font>"
+            ))
             
-            # Check for alerts
-            alert_text = "No critical alerts"
-            alert_style = f"color: {THEME_COLORS['normal']};"
+            # Update ECG HR / HRV
+            ecg = result["ecg"]
+            if ecg and ecg["rr_count"]:
+                shown = tuple(f"{ecg[k]:.0f}" for k in ("hr", "sdnn", "rmssd", "pnn50"))
+                self.scheduler.set_text(self.ecg_display, shown, lambda: (
+                    f"<b>ECG HR:</b> {shown[0]} bpm &nbsp; "
+                    f"<b>SDNN:</b> {shown[1]} ms<br>"
+                    f"<b>RMSSD:</b> {shown[2]} ms &nbsp; "
+                    f"<b>pNN50:</b> {shown[3]}%"
+                ))
+            elif ecg is None and "ECG" in self.pipeline.channels:
+                self.scheduler.set_text(self.ecg_display, "poor", lambda: "<b>ECG:</b> Poor signal (check leads)")
             
-            if detect_fall(ax, ay, az, hr) and not self.fall_detected:
-                self.fall_detected = True
-                self.last_alert = f"🚨 FALL DETECTED! At {time.strftime('%H:%M:%S')}"
-                # Send emergency notification (simulated)
-                try:
-                    requests.post("https://api.emergency.com/alert", 
-                                 json={"message": "Fall detected!", "priority": "critical"})
-                except:
-                    pass
-                
-            if self.fall_detected:
-                alert_text = self.last_alert
-                alert_style = f"background-color: #ff5555; color: white; font-weight: bold;"
-                
-            elif temp > 38.0:
-                alert_text = f"⚠ HIGH TEMPERATURE: {temp:.1f}°C"
-                alert_style = f"color: {THEME_COLORS['warning']};"
-                
-            elif spo2 < 92:
-                alert_text = f"⚠ LOW OXYGEN: SpO2 at {spo2:.1f}%"
-                alert_style = f"color: {THEME_COLORS['critical']};"
-                
-            elif hr > 120:
-                alert_text = f"⚠ HIGH HEART RATE: {hr:.0f} bpm"
-                alert_style = f"color: {THEME_COLORS['critical']};"
-                
-            self.alert_display.setText(alert_text)
-            self.alert_display.setStyleSheet(f"""
+            # Update signal quality
+            quality = self.pipeline.quality
+            poor = tuple(
+                (ch, f"{q:.0f}", ", ".join(quality.reasons(ch)))
+                for ch, q in result["quality"].items() if q < QUALITY_MIN_GOOD * 100
+            )
+            self.scheduler.set_text(self.quality_display, poor, lambda: (
+                "<b>Signal quality:</b> " + (
+                    "<br>".join(f"<font color='{THEME_COLORS['warning']}'>{ch} {q}%</font> {why}"
+                                for ch, q, why in poor)
+                    if poor else f"<font color='{THEME_COLORS['normal']}'>all channels good</font>"
+                )
+            ))
+            
+            self.scheduler.set_text(self.alert_display, alert_text, lambda: alert_text)
+            # Stylesheets are reparsed by Qt on every set, so only on a state change
+            self.scheduler.set_style(self.alert_display, alert_state, lambda: f"""
                 background: {THEME_COLORS['light_bg']};
                 border-radius: 8px;
                 padding: 15px;
@@ -553,25 +540,157 @@ class HealthDashboard(QMainWindow):
             """)
             
             # Update forecast
-            f_temp = forecast(BUFFER["Temp"])[-1]
-            f_pres = forecast(BUFFER["Pressure"])[-1]
-            f_mq = forecast(BUFFER["MQ"])[-1]
-            
-            self.forecast_display.setText(
-                "<b>10-min Forecast:</b><br>"
-                f"Temperature: {f_temp:.1f}°C<br>"
-                f"Pressure: {f_pres:.1f} hPa<br>"
-                f"Air Quality: {f_mq:.0f} ppm"
-            )
+            forecast = result["forecast"]
+            shown = (f"{forecast['Temp']:.1f}", f"{forecast['Pressure']:.1f}", f"{forecast['MQ']:.0f}")
+            self.scheduler.set_text(self.forecast_display, shown, lambda: (
+                f"<b>{FORECAST_HORIZON_S / 60:.0f}-min Forecast:</b><br>"
+                f"Temperature: {shown[0]}°C<br>"
+                f"Pressure: {shown[1]} hPa<br>"
+                f"Air Quality: {shown[2]} ppm"
+            ))
             
             # Update plots
-            current_vital = self.plot_select.currentText()
-            data = BUFFER[current_vital]
-            self.curve.setData(data)
-            self.plot.setTitle(f"{current_vital} Signal", color='w')
+            self.update_plot()
+            
+            name = self.pipeline.name
+            INSTRUMENTS.record("render", t0, name)
+            if INSTRUMENTS.enabled:
+                # Runs once the event loop has painted the widgets updated above
+                arrival = self.pipeline.last_arrival_ns
+                QTimer.singleShot(0, lambda: INSTRUMENTS.latency("sensor_to_pixel", arrival, name))
             
         except Exception as e:
+            self.render_errors += 1
             print("Dashboard update error:", e)
+    
+    def update_plot(self):
+        """Draw the visible range at no more points than the plot has pixels"""
+        t0 = time.perf_counter_ns()
+        current_vital = self.plot_select.currentText()
+        view_box = self.plot.getViewBox()
+        pixels = max(int(view_box.width()), 100)
+        signal = self.spectrograms.get(current_vital)
+        self.show_spectrogram(signal is not None)
+        if signal is not None:
+            self.plot_spectrogram(signal)
+            return
+        span = HISTORY_RANGES[self.range_select.currentIndex()][1]
+        if span:
+            self.plot_history(current_vital, span, pixels)
+            return
+        if self._history_key is not None:
+            self._history_key = None
+            self.plot.setLabel('bottom', "")
+            view_box.enableAutoRange()
+        if view_box.autoRangeEnabled()[0]:
+            # Following live data
+            stop = self.pipeline.buffer.total
+            start = stop - PLOT_WINDOW
+        else:
+            # User has panned/zoomed into history
+            start, stop = view_box.viewRange()[0]
+            start, stop = int(np.floor(start)), int(np.ceil(stop)) + 1
+        if not self.scheduler.changed("plot", (current_vital, start, stop, pixels)):
+            return
+        x, y, lo, hi, xc = self.pipeline.pyramid.envelope(current_vital, start, stop, pixels)
+        self.curve.setData(x, y)
+        self.env_lo.setData(xc, lo)
+        self.env_hi.setData(xc, hi)
+        self.plot.setTitle(f"{current_vital} Signal", color='w')
+        INSTRUMENTS.record("plot", t0, self.pipeline.name)
+    
+    def plot_history(self, vital, span, pixels):
+        """Plot this run's tiered history, or recorded sessions for ranges before it; reloads every 30 s"""
+        key = (vital, span)
+        if self._history_key and self._history_key[0] == key and time.time() - self._history_key[1] < 30:
+            return
+        now = time.time()
+        history = self.pipeline.history
+        source = history
+        if history.start is None or history.start > now - span:
+            if self.history_store is None:
+                from session_store import SessionStore
+                session = self.pipeline.session
+                root = os.path.dirname(session.path) if session else SESSION_DIR
+                self.history_store = SessionStore(root)
+            else:
+                self.history_store.refresh()
+            if self.history_store.sessions:
+                source = self.history_store
+        t, y, lo, hi = source.series(vital, now - span, now, pixels)
+        x = (t - now) / 60.0
+        self.curve.setData(x, y, connect="finite")
+        self.env_lo.setData(x, lo, connect="finite")
+        self.env_hi.setData(x, hi, connect="finite")
+        self.plot.setLabel('bottom', "minutes ago")
+        self.plot.setTitle(f"{vital} History ({len(t)} points)", color='w')
+        self.plot.getViewBox().enableAutoRange()
+        self._history_key = (key, now)
+        self.scheduler.invalidate("plot")
+    
+    def show_spectrogram(self, shown):
+        """Swap the curve and envelope for the spectrogram image, or back"""
+        if shown == self.spectrogram.isVisible():
+            return
+        self.spectrogram.setVisible(shown)
+        for item in (self.curve, self.fill):
+            item.setVisible(not shown)
+        # Spectrograms only cover the live session
+        self.range_select.setEnabled(not shown)
+        self.plot.setLabel('bottom', "seconds ago" if shown else "")
+        self.plot.setLabel('left', "Hz" if shown else "")
+        self._history_key = None
+        self.scheduler.invalidate("plot")
+        self.plot.getViewBox().enableAutoRange()
+    
+    def plot_spectrogram(self, signal):
+        """Scrolling spectrogram of one signal in dB; the FFTs already ran on the spectral worker"""
+        spectral = self.pipeline.spectral
+        if signal not in spectral.signals:
+            self.plot.setTitle(f"{signal} Spectrogram (no such channels)", color='w')
+            return
+        if not self.scheduler.changed("plot", (signal, spectral.segments)):
+            return
+        t, freqs, power = spectral.spectrogram(signal)
+        if not len(t):
+            self.plot.setTitle(f"{signal} Spectrogram (waiting for data)", color='w')
+            return
+        t0 = time.perf_counter_ns()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            db = 10 * np.log10(power)
+        finite = db[np.isfinite(db)]
+        lo, hi = np.percentile(finite, (5, 99.5)) if len(finite) else (0, 1)
+        # Gaps (segments with flagged samples) show at the bottom of the scale
+        self.spectrogram.setImage(np.where(np.isfinite(db), db, lo), levels=(lo, hi), autoLevels=False)
+        step = spectral.hop / spectral.fs
+        self.spectrogram.setRect(QRectF(t[0] - time.time() - step / 2, -spectral.df / 2,
+                                        step * len(t), spectral.df * len(freqs)))
+        features = spectral.features().get(signal)
+        peak = f", dominant {features['dominant_hz']:.1f} Hz" if features else ""
+        self.plot.setTitle(f"{signal} Spectrogram{peak}", color='w')
+        INSTRUMENTS.record("plot", t0, self.pipeline.name)
+    
+    def on_plot_range_changed(self, *args):
+        # Autorange changes come from our own setData; only react to panning/zooming
+        if not self.plot.getViewBox().autoRangeEnabled()[0]:
+            self.update_plot()
+            
+    def show_diagnostics(self):
+        if self.diagnostics is None:
+            from diagnostics import DiagnosticsPanel
+            self.diagnostics = DiagnosticsPanel()
+        self.diagnostics.show()
+        self.diagnostics.raise_()
+        self.diagnostics.refresh()
+            
+    def closeEvent(self, event):
+        INSTRUMENTS.unregister(self)
+        if self.diagnostics is not None:
+            self.diagnostics.close()
+        self.reader.stop()
+        self.alerts.close()
+        self.pipeline.close()
+        super().closeEvent(event)
             
     def export_data(self):
         """Export current buffer data to CSV"""
@@ -580,31 +699,50 @@ class HealthDashboard(QMainWindow):
             with open(filename, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile)
                 # Write header
-                writer.writerow(['Timestamp'] + list(BUFFER.keys()))
+                buffer = self.pipeline.buffer
+                writer.writerow(['Timestamp'] + buffer.keys())
                 
-                # Determine number of data points (all buffers should be same length)
-                n = len(BUFFER["HR"])
+                # All channels share one write index, so one count covers them
+                n = buffer.count
                 
-                # Create timestamps (relative to now)
-                timestamps = [f"{-i}s" for i in range(n, 0, -1)]
+                # Arrival time of every buffered row
+                timestamps = [
+                    time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t)) + f".{int(t * 1000) % 1000:03d}"
+                    for t in self.pipeline.times.view("t")
+                ]
                 
                 # Write data
+                samples = buffer.view().T.tolist()
                 for i in range(n):
-                    row = [timestamps[i]]
-                    for key in BUFFER:
-                        if i < len(BUFFER[key]):
-                            row.append(BUFFER[key][i])
-                        else:
-                            row.append('')
-                    writer.writerow(row)
+                    writer.writerow([timestamps[i]] + samples[i])
                     
             self.status_bar.showMessage(f"Exported {n} data points to {filename}", 5000)
         except Exception as e:
             self.status_bar.showMessage(f"Export failed: {str(e)}", 5000)
 
 # === MAIN ===
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SensoHealth dashboard")
+    parser.add_argument("--device", action="append", metavar="[NAME=]SPEC",
+                        help="serial port (\"auto\" finds the ESP32), tcp://host:port, udp://:port, "
+                             "synthetic or replay:path; repeat for a ward overview of several devices")
+    parser.add_argument("--list-ports", action="store_true", help="list serial ports that look like an ESP32 and exit")
+    parser.add_argument("--stream", action="store_true", default=STREAM_ENABLED,
+                        help=f"publish live data for remote viewers on port {STREAM_PORT}")
+    parser.add_argument("--metrics", metavar="PATH", default=METRICS_FILE,
+                        help="record stage timings and write them here periodically (.json or Prometheus text)")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="record stage timings and serve them on http://127.0.0.1:PORT/metrics")
+    return parser.parse_args(argv)
+
+
+def launch(args):
+    """Create the application and show the dashboard (or ward overview); returns (app, window).
+
+    Nothing here waits on a device: readers open their sources in the
+    background, so the window is up as soon as the widgets are built.
+    """
+    app = QApplication.instance() or QApplication(sys.argv[:1])
     
     # Set application style
     app.setStyle('Fusion')
@@ -613,8 +751,48 @@ if __name__ == "__main__":
     palette.setColor(QPalette.WindowText, QColor(THEME_COLORS['text']))
     app.setPalette(palette)
     
+    if args.metrics or args.metrics_port or INSTRUMENTATION:
+        INSTRUMENTS.start(args.metrics, args.metrics_port, METRICS_INTERVAL_S)
+    stream = None
+    if args.stream:
+        from stream_server import StreamServer
+        stream = StreamServer(STREAM_HOST, STREAM_PORT, STREAM_QUEUE).start()
+    
+    # === DEVICES ===
+    specs = args.device or [PORT]
+    if len(specs) > 1:
+        from devices import DeviceManager
+        from ward import WardOverview
+        manager = DeviceManager(stream=stream)
+        for i, arg in enumerate(specs):
+            name, spec = parse_device(arg, i)
+            manager.add(name, open_source(spec))
+        manager.start()
+        window = WardOverview(manager)
+        window.show()
+        return app, window
+    
     # Create and show dashboard
-    dashboard = HealthDashboard()
+    source = open_source(specs[0])
+    logger, session = open_loggers()
+    pipeline = IngestPipeline(logger=logger, session=session, stream=stream, name=source.name)
+    dashboard = HealthDashboard(source, pipeline)
     dashboard.show()
-    
-    sys.exit(app.exec_())
\ No newline at end of file
+    return app, dashboard
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list_ports:
+        from sources import find_serial_ports
+        ports = find_serial_ports()
+        print("\n".join(ports) if ports else "❌ No ESP32 serial ports found")
+        return 0 if ports else 1
+    app, window = launch(args)
+    code = app.exec_()
+    INSTRUMENTS.close()
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
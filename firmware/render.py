@@ -0,0 +1,73 @@
+import math
+
+_UNSET = object()
+
+
+def display_step_format(value, step):
+    """Round value to the display step and format it with the step's decimals"""
+    decimals = max(0, -int(math.floor(math.log10(step)))) if step < 1 else 0
+    return f"{round(value / step) * step:.{decimals}f}"
+
+
+# === RENDER SCHEDULER ===
+class RenderScheduler:
+    """Dirty tracking for the dashboard's widgets.
+
+    Each widget is repainted only when the key of what it would show (its
+    rounded values, colours, trend) differs from the key it was last
+    painted with; stylesheets are built once per state and only applied
+    when a widget's state changes. ``interval`` picks the refresh period
+    from the data rate and whether the window can be seen.
+    """
+
+    def __init__(self, interval_ms=500, idle_ms=2000, hidden_ms=1000):
+        self.interval_ms = interval_ms
+        self.idle_ms = idle_ms
+        self.hidden_ms = hidden_ms
+        self._keys = {}         # slot -> key last painted
+        self._sheets = {}       # state -> stylesheet text
+        self.performed = 0      # repaints done
+        self.skipped = 0        # repaints avoided because nothing visible changed
+
+    def changed(self, slot, key):
+        """Record key for slot (any hashable); True if it differs from the previous one"""
+        if self._keys.get(slot, _UNSET) == key:
+            self.skipped += 1
+            return False
+        self._keys[slot] = key
+        self.performed += 1
+        return True
+
+    def set_text(self, widget, key, render):
+        """setText(render()) only when key has changed; render builds the HTML lazily"""
+        if self.changed((id(widget), "text"), key):
+            widget.setText(render())
+
+    def set_style(self, widget, state, build):
+        """Apply the cached stylesheet for state, building it on first use"""
+        if not self.changed((id(widget), "style"), state):
+            return
+        sheet = self._sheets.get(state)
+        if sheet is None:
+            sheet = self._sheets[state] = build()
+        widget.setStyleSheet(sheet)
+
+    def invalidate(self, slot=None):
+        """Force a repaint of slot (or of everything) on the next update"""
+        if slot is None:
+            self._keys.clear()
+        else:
+            self._keys.pop(slot, None)
+
+    def interval(self, frames_per_sec, visible=True):
+        """Refresh period in ms: normal while data flows, slower for slow or no data or when hidden"""
+        if not visible:
+            return self.hidden_ms
+        if frames_per_sec <= 0:
+            return self.idle_ms
+        return int(min(max(1000.0 / frames_per_sec, self.interval_ms), self.idle_ms))
+
+    @property
+    def skip_ratio(self):
+        total = self.performed + self.skipped
+        return self.skipped / total if total else 0.0
@@ -0,0 +1,90 @@
+import numpy as np
+
+
+# === COLUMNAR RING BUFFER ===
+class RingBuffer:
+    """Fixed-capacity, channels x capacity ring buffer with O(1) appends.
+
+    Every sample is written twice, at ``head`` and ``head + capacity``, so the
+    most recent N samples of any channel are always one contiguous slice of
+    ``data``. Views returned by ``last``/``view`` alias the storage and are
+    only valid until the next append; copy them if they must outlive it.
+    """
+
+    def __init__(self, channels, capacity, dtype=np.float64):
+        self.channels = list(channels)
+        self.index = {name: i for i, name in enumerate(self.channels)}
+        self.capacity = int(capacity)
+        self.data = np.zeros((len(self.channels), 2 * self.capacity), dtype=dtype)
+        self.head = 0    # next write slot, in [0, capacity)
+        self.count = 0   # samples currently held
+        self.total = 0   # samples ever appended
+
+    # --- dict-like access by channel name ---
+    def keys(self):
+        return list(self.channels)
+
+    def __iter__(self):
+        return iter(self.channels)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __getitem__(self, name):
+        return self.view(name)
+
+    # --- writes ---
+    def append(self, row):
+        """Append one sample (one value per channel)"""
+        h = self.head
+        self.data[:, h] = row
+        self.data[:, h + self.capacity] = row
+        self.head = (h + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.total += 1
+
+    def extend(self, rows):
+        """Append a batch of samples shaped (n, channels)"""
+        block = np.asarray(rows, dtype=self.data.dtype)
+        n = block.shape[0]
+        if n == 0:
+            return
+        cap = self.capacity
+        skipped = max(n - cap, 0)
+        block = block[skipped:].T
+        m = block.shape[1]
+
+        start = (self.head + skipped) % cap
+        first = min(m, cap - start)
+        self.data[:, start:start + first] = block[:, :first]
+        self.data[:, start + cap:start + cap + first] = block[:, :first]
+        rest = m - first
+        if rest:
+            self.data[:, :rest] = block[:, first:]
+            self.data[:, cap:cap + rest] = block[:, first:]
+
+        self.head = (self.head + n) % cap
+        self.count = min(self.count + n, cap)
+        self.total += n
+
+    def clear(self):
+        self.head = self.count = self.total = 0
+
+    # --- reads ---
+    def last(self, n, channel=None):
+        """Zero-copy view of the newest n samples, oldest first"""
+        n = min(int(n), self.count)
+        end = self.head + self.capacity
+        if channel is None:
+            return self.data[:, end - n:end]
+        return self.data[self.index[channel], end - n:end]
+
+    def view(self, channel=None):
+        """Zero-copy chronological view of everything held"""
+        return self.last(self.count, channel)
+
+    def latest(self, channel):
+        """Newest value of one channel"""
+        if not self.count:
+            raise IndexError("ring buffer is empty")
+        return self.data[self.index[channel], self.head + self.capacity - 1]
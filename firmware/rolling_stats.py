@@ -0,0 +1,43 @@
+import numpy as np
+
+
+# === LATEST READINGS ===
+class LastStep:
+    """The two newest finite readings of one channel, for its trend arrow"""
+
+    def __init__(self):
+        self.count = 0              # finite readings seen, up to 2
+        self.last = float("nan")
+        self.previous = float("nan")
+
+    @property
+    def delta(self):
+        """Change between the two newest readings"""
+        return self.last - self.previous if self.count > 1 else 0.0
+
+    def extend(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        xs = xs[np.isfinite(xs)][-2:]
+        for x in xs.tolist():
+            self.previous, self.last = self.last, x
+        self.count = min(self.count + len(xs), 2)
+
+
+class StatsBank:
+    """LastStep for every channel; the rules compute their own windows"""
+
+    def __init__(self, channels):
+        self.channels = list(channels)
+        self._stats = {ch: LastStep() for ch in self.channels}
+
+    def __contains__(self, channel):
+        return channel in self._stats
+
+    def __getitem__(self, channel):
+        return self._stats[channel]
+
+    def extend(self, batch):
+        """Feed a (n, channels) batch, once per ingested block"""
+        batch = np.asarray(batch, dtype=float)
+        for i, ch in enumerate(self.channels):
+            self._stats[ch].extend(batch[:, i])
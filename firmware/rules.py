@@ -0,0 +1,590 @@
+"""Declarative alert, risk and mood rules (rules.json).
+
+Rules are conditions over the channels and over derived metrics, written
+as Python-style expressions and compiled once into numpy evaluators:
+
+    "derived": {"AccDyn": "mean(abs(sqrt(AccX**2 + AccY**2 + AccZ**2) - 9.81), 0.2)",
+                "HRVar": "std(HR, 10)"}
+    "alerts":  [{"name": "low_spo2", "when": "SpO2 < 92", "for_s": 10,
+                 "clear": "SpO2 >= 93", "clear_s": 5, "severity": "critical",
+                 "message": "LOW OXYGEN: SpO2 at {SpO2:.1f}%"}]
+    "risk":    [{"name": "fever", "when": "Temp > 37.5", "score": 25}]
+    "mood":    [{"name": "Stressed", "when": "HR > 100 and HRVar > 8", "color": "critical"}]
+
+Alert rules raised with "notify": true are also sent through the alert
+dispatcher. Mood rules are tried in order; the first active one wins.
+
+Expressions take numbers, channel and derived names, + - * / ** and
+comparisons, and/or/not, sqrt/abs/log, and mean/std/min/max/delta over
+the last N seconds, e.g. "delta(Temp, 60) > 0.5". Windows, like rule
+durations, are in seconds: a rules file is compiled for a frame rate,
+which turns them into samples. Flagged samples are unknown: a comparison
+with one is neither true nor false.
+
+A rule becomes active once `when` has held for for_s seconds and clears
+once `clear` (default: not `when`) has held for clear_s; a clear threshold
+away from the trigger gives hysteresis. Unknown samples break either
+streak, so an active alert holds while the signal is poor; "on_unknown":
+"clear" drops the rule instead (the default for risk and mood rules).
+
+Every rule is evaluated on every sample batch. Comparisons with a
+constant are evaluated together, one numpy call per operator, as are the
+rules built from them with and/or; other expressions run as compiled
+closures with shared sub-expressions computed once. The streaks of all
+rules advance together as (rules, samples) arrays. RuleEngine.rule_ns
+holds each rule's evaluation time; batched work is shared out evenly.
+"""
+import os, ast, json, time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SECTIONS = ("alerts", "risk", "mood")
+SEVERITIES = ("warning", "critical")
+FUNCTIONS = {"sqrt": np.sqrt, "abs": np.abs, "log": np.log}
+COMPARE = {ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater,
+           ast.GtE: np.greater_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal}
+FLIPPED = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE}     # 92 > x is x < 92
+ARITHMETIC = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+              ast.Div: np.divide, ast.Pow: np.power}
+
+
+# === WINDOW FUNCTIONS ===
+# Each maps a series and a window of w samples to a series of the same
+# length; the first w - 1 values (w for delta) have no full window and are NaN
+def _sums(x, w):
+    """Count, sum and sum of squares of the known samples in each window"""
+    known = ~np.isnan(x)
+    z = x if known.all() else np.where(known, x, 0.0)
+    c = np.zeros((3, len(x) + 1))
+    np.cumsum(known, out=c[0, 1:])
+    np.cumsum(z, out=c[1, 1:])
+    np.cumsum(z * z, out=c[2, 1:])
+    return c[:, w:] - c[:, :-w]
+
+
+def _mean(x, w):
+    count, s, _ = _sums(x, w)
+    return s / count
+
+
+def _std(x, w):
+    count, s, ss = _sums(x, w)
+    mean = s / count
+    return np.sqrt(np.maximum(ss / count - mean * mean, 0.0))
+
+
+def _extreme(reduce):
+    return lambda x, w: reduce.reduce(sliding_window_view(x, w), axis=1)
+
+
+WINDOWS = {"mean": _mean, "std": _std, "min": _extreme(np.fmin), "max": _extreme(np.fmax)}
+
+
+def _window(fn, arg, w):
+    def run(env):
+        x = np.broadcast_to(arg(env), (env["_length"],))
+        out = np.full(len(x), np.nan)
+        if len(x) >= w:
+            out[w - 1:] = fn(x, w)
+        return out
+    return run
+
+
+def _delta(arg, w):
+    def run(env):
+        x = np.broadcast_to(arg(env), (env["_length"],))
+        out = np.full(len(x), np.nan)
+        out[w:] = x[w:] - x[:-w]
+        return out
+    return run
+
+
+# === TRUTH VALUES ===
+# Conditions are float series: 1 true, 0 false, NaN unknown (Kleene logic)
+def _compare(op, a, b):
+    def run(env):
+        x, y = a(env), b(env)
+        out = op(x, y).astype(float)
+        unknown = np.isnan(x) | np.isnan(y)
+        return np.where(unknown, np.nan, out) if np.any(unknown) else out
+    return run
+
+
+def _all(parts):
+    def run(env):
+        out = parts[0](env)
+        for part in parts[1:]:
+            x = part(env)
+            out = np.where(np.fmin(out, x) == 0, 0.0, out * x)
+        return out
+    return run
+
+
+def _any(parts):
+    def run(env):
+        out = parts[0](env)
+        for part in parts[1:]:
+            x = part(env)
+            out = np.where(np.fmax(out, x) == 1, 1.0, out + x)
+        return out
+    return run
+
+
+def _number(node):
+    """The value of a numeric literal such as 92 or -0.5, else None"""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _number(node.operand)
+        return None if value is None else (-value if isinstance(node.op, ast.USub) else value)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    return None
+
+
+def _combine(kind, values):
+    """A group's (rules, arity, samples) leaf values -> (rules, samples) truth values"""
+    if kind == "all":
+        return np.where(np.fmin.reduce(values, axis=1) == 0, 0.0, values.prod(axis=1))
+    return np.where(np.fmax.reduce(values, axis=1) == 1, 1.0, values.sum(axis=1))
+
+
+# === COMPILER ===
+class Compiler:
+    """Expression source -> evaluator(env); sub-expressions are memoised in env by their AST.
+
+    In rule conditions, a comparison of any numeric expression with a
+    constant is a "leaf": the expression becomes a series column and the
+    engine evaluates every leaf in one numpy call per operator. Conditions
+    that are a leaf, or an and/or of leaves, are evaluated as groups.
+    """
+
+    def __init__(self, names, rate):
+        self.rate = float(rate)     # frames per second, to turn window seconds into samples
+        self.lookback = dict.fromkeys(names, 0)     # samples of history each name needs
+        self.series = []        # (key, evaluator) of expressions compared with constants
+        self.leaves = {}        # (name or series key, op, value) -> leaf index
+        self.leaf_keys = []
+        self.batching = False   # derived metrics are computed before the leaves
+
+    def compile(self, source, where):
+        """(evaluator, lookback in samples, plan); plan is (kind, leaf indices) or None"""
+        try:
+            tree = ast.parse(str(source), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"{where}: cannot parse {source!r}: {e.msg}") from None
+        self.where = where
+        body = tree.body
+        fn, back = self._node(body)
+        if not self.batching:
+            return fn, back, None
+        if self._leaf(body) is not None:
+            return fn, back, ("leaf", (self._leaf(body),))
+        if isinstance(body, ast.BoolOp):
+            ks = [self._leaf(v) for v in body.values]
+            if None not in ks:
+                return fn, back, ("all" if isinstance(body.op, ast.And) else "any", tuple(ks))
+        return fn, back, None
+
+    def _leaf(self, node):
+        """Leaf index of a comparison between an expression and a constant, else None"""
+        if not (self.batching and isinstance(node, ast.Compare) and len(node.ops) == 1
+                and type(node.ops[0]) in COMPARE):
+            return None
+        left, right, op = node.left, node.comparators[0], type(node.ops[0])
+        if _number(left) is not None:
+            left, right, op = right, left, FLIPPED.get(op, op)
+        value = _number(right)
+        if value is None or _number(left) is not None:
+            return None
+        if isinstance(left, ast.Name):
+            if left.id not in self.lookback:
+                return None
+            name = left.id
+        elif isinstance(left, (ast.BinOp, ast.Call)) or (isinstance(left, ast.UnaryOp) and isinstance(left.op, ast.USub)):
+            name = ast.dump(left)
+            if name not in self.lookback:
+                # Series are computed before the leaves, so can't read them
+                self.batching = False
+                fn, back = self._node(left)
+                self.batching = True
+                self.series.append((name, fn))
+                self.lookback[name] = back
+        else:
+            return None
+        key = (name, op, value)
+        if key not in self.leaves:
+            self.leaves[key] = len(self.leaf_keys)
+            self.leaf_keys.append(key)
+        return self.leaves[key]
+
+    def _node(self, node):
+        """(evaluator, lookback in samples) for one AST node"""
+        fn, back = self._build(node)
+        if isinstance(node, ast.Name) or _number(node) is not None:
+            return fn, back
+        key = ast.dump(node)
+
+        def memo(env):
+            out = env.get(key)
+            if out is None:
+                out = env[key] = fn(env)
+            return out
+        return memo, back
+
+    def _build(self, node):
+        k = self._leaf(node)
+        if k is not None:
+            return (lambda env: env["_leaves"][k]), self.lookback[self.leaf_keys[k][0]]
+        value = _number(node)
+        if value is not None:
+            return (lambda env: value), 0
+        if isinstance(node, ast.Name):
+            if node.id not in self.lookback:
+                raise ValueError(f"{self.where}: unknown name {node.id!r}")
+            name = node.id
+            return (lambda env: env[name]), self.lookback[name]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            arg, back = self._node(node.operand)
+            return (lambda env: 1.0 - arg(env)), back
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            arg, back = self._node(node.operand)
+            return (lambda env: -arg(env)), back
+        if isinstance(node, ast.BinOp) and type(node.op) in ARITHMETIC:
+            op = ARITHMETIC[type(node.op)]
+            (a, ba), (b, bb) = self._node(node.left), self._node(node.right)
+
+            return (lambda env: op(a(env), b(env))), max(ba, bb)
+        if isinstance(node, ast.BoolOp):
+            parts = [self._node(v) for v in node.values]
+            combine = _all if isinstance(node.op, ast.And) else _any
+            return combine([p[0] for p in parts]), max(p[1] for p in parts)
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARE for op in node.ops):
+            # a < b < c is (a < b) and (b < c)
+            terms = [self._node(node.left)] + [self._node(c) for c in node.comparators]
+            parts = [_compare(COMPARE[type(op)], terms[i][0], terms[i + 1][0])
+                     for i, op in enumerate(node.ops)]
+            back = max(t[1] for t in terms)
+            return (parts[0] if len(parts) == 1 else _all(parts)), back
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id
+            if name in FUNCTIONS and len(node.args) == 1:
+                fn = FUNCTIONS[name]
+                arg, back = self._node(node.args[0])
+                return (lambda env: fn(arg(env))), back
+            if (name in WINDOWS or name == "delta") and len(node.args) == 2:
+                seconds = _number(node.args[1])
+                if seconds is None or seconds <= 0:
+                    raise ValueError(f"{self.where}: {name}() needs a window of a positive number of seconds")
+                arg, back = self._node(node.args[0])
+                w = max(int(round(seconds * self.rate)), 1)
+                if name == "delta":
+                    return _delta(arg, w), back + w
+                return _window(WINDOWS[name], arg, w), back + w - 1
+        raise ValueError(f"{self.where}: unsupported expression {ast.unparse(node)!r}")
+
+
+# === RULE SET ===
+class RuleSet:
+    """A rules file compiled for one channel layout and frame rate; shared by every device using them"""
+
+    def __init__(self, spec, channels, rate, source="rules"):
+        self.source = source
+        self.channels = list(channels)
+        self.rate = float(rate)
+        compiler = Compiler(self.channels, rate)
+        self.derived = []
+        for name, expr in spec.get("derived", {}).items():
+            if name in compiler.lookback:
+                raise ValueError(f"{source}: derived metric {name!r} shadows a channel or metric")
+            fn, back, _ = compiler.compile(expr, f"{source}: derived {name}")
+            self.derived.append((name, fn))
+            compiler.lookback[name] = back
+        compiler.batching = True
+
+        self.rules = []
+        seen = set()
+        for section in SECTIONS:
+            for entry in spec.get(section, []):
+                name = entry.get("name")
+                where = f"{source}: {section} rule {name!r}"
+                if not name or name in seen:
+                    raise ValueError(f"{where}: every rule needs a unique name")
+                if "when" not in entry:
+                    raise ValueError(f"{where}: no 'when' condition")
+                seen.add(name)
+                rule = {
+                    "name": name,
+                    "section": section,
+                    "for_s": float(entry.get("for_s", 0)),
+                    "clear_s": float(entry.get("clear_s", 0)),
+                    "drop_unknown": entry.get("on_unknown", "hold" if section == "alerts" else "clear") == "clear",
+                    "severity": entry.get("severity", "warning"),
+                    "message": entry.get("message", name),
+                    "notify": bool(entry.get("notify", False)),
+                    "score": float(entry.get("score", 0)),
+                    "color": entry.get("color", "accent"),
+                }
+                if rule["severity"] not in SEVERITIES:
+                    raise ValueError(f"{where}: severity must be one of {SEVERITIES}")
+                if section == "risk" and "score" not in entry:
+                    raise ValueError(f"{where}: risk rules need a score")
+                rule["when"], back, rule["when_plan"] = compiler.compile(entry["when"], where)
+                rule["clear"] = rule["clear_plan"] = None
+                if "clear" in entry:
+                    rule["clear"], clear_back, rule["clear_plan"] = compiler.compile(entry["clear"], where)
+                    back = max(back, clear_back)
+                rule["lookback"] = back
+                self.rules.append(rule)
+
+        self.names = [r["name"] for r in self.rules]
+        self.lookback = max([r["lookback"] for r in self.rules] + [0])
+        self.for_s = np.array([r["for_s"] for r in self.rules])
+        self.clear_s = np.array([r["clear_s"] for r in self.rules])
+        self.drop_unknown = np.array([r["drop_unknown"] for r in self.rules], dtype=bool)
+        self.scores = np.array([r["score"] if r["section"] == "risk" else 0.0 for r in self.rules])
+        self.is_alert = np.array([r["section"] == "alerts" for r in self.rules], dtype=bool)
+        self.alert_rows = np.flatnonzero(self.is_alert)
+        self.mood_rows = np.flatnonzero([r["section"] == "mood" for r in self.rules])
+        self.default_mood = spec.get("default_mood", {"name": "Neutral", "color": "accent"})
+
+        # Series columns follow the channels: derived metrics, then expressions compared with constants
+        self.series = self.derived + compiler.series
+        self.metrics = self.channels + [name for name, _ in self.series]
+        # Leaves grouped by operator: (op, leaf indices, metric columns, thresholds)
+        keys = compiler.leaf_keys
+        self.leaf_cols = np.array([self.metrics.index(name) for name, _, _ in keys], dtype=np.intp)
+        self.leaf_groups = []
+        for op in dict.fromkeys(op for _, op, _ in keys):
+            index = np.array([k for k, (_, o, _) in enumerate(keys) if o is op], dtype=np.intp)
+            thresholds = np.array([keys[k][2] for k in index])
+            self.leaf_groups.append((COMPARE[op], index, self.leaf_cols[index], thresholds[:, None]))
+        # Conditions with a plan are evaluated in groups of the same kind
+        self.true_leaf, self.false_leaf = len(keys), len(keys) + 1
+        self.when_groups = self._groups("when")
+        self.clear_groups = self._groups("clear")
+        self.default_clear = np.array([r["clear"] is None for r in self.rules], dtype=bool)
+        # Active exactly while `when` holds: no durations and no separate clear condition
+        self.instant = self.default_clear & (self.for_s == 0) & (self.clear_s == 0)
+        self.compound = [i for i, r in enumerate(self.rules)
+                         if r["when_plan"] is None or (r["clear"] is not None and r["clear_plan"] is None)]
+
+    def _groups(self, which):
+        """(kind, rule rows, leaf indices) per kind; and/or groups are padded
+        to one arity with the constant leaves TRUE and FALSE"""
+        groups = {}
+        for i, rule in enumerate(self.rules):
+            plan = rule[f"{which}_plan"]
+            if plan is not None:
+                groups.setdefault(plan[0], []).append((i, plan[1]))
+        out = []
+        for kind, members in groups.items():
+            arity = max(len(ks) for _, ks in members)
+            pad = self.true_leaf if kind == "all" else self.false_leaf
+            ks = [list(ks) + [pad] * (arity - len(ks)) for _, ks in members]
+            out.append((kind, np.array([i for i, _ in members], dtype=np.intp), np.array(ks, dtype=np.intp)))
+        return out
+
+
+_loaded = {}
+
+
+def load_rules(path, channels, rate):
+    """Compile a rules file (relative paths are next to this module) for a frame rate, cached until it changes"""
+    path = os.path.join(HERE, path)
+    key = (path, os.path.getmtime(path), tuple(channels), float(rate))
+    if key not in _loaded:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+        _loaded[key] = RuleSet(spec, channels, rate, os.path.basename(path))
+    return _loaded[key]
+
+
+# === RULE ENGINE ===
+class RuleEngine:
+    """Per-device rule state, advanced one (n, channels) batch at a time"""
+
+    def __init__(self, ruleset):
+        self.ruleset = ruleset
+        r = len(ruleset.rules)
+        self.active = np.zeros(r, dtype=bool)
+        self.since = np.full(r, np.nan)     # start of each rule's current streak
+        self.activated = {}                 # alert rule name -> event that raised it
+        self.rule_ns = np.zeros(r, dtype=np.int64)     # evaluation time per rule
+        self.batches = 0
+        self.raised = 0                     # alert activations so far
+        self._tail = np.zeros((0, len(ruleset.metrics)))
+
+    def set_ruleset(self, ruleset):
+        """Switch to the same rules compiled for another frame rate, keeping every streak and active rule"""
+        if ruleset.names != self.ruleset.names or ruleset.metrics != self.ruleset.metrics:
+            raise ValueError("set_ruleset needs the same rules file and channels")
+        self.ruleset = ruleset
+        self._tail = self._tail[len(self._tail) - min(len(self._tail), ruleset.lookback):]
+
+    def process(self, times, values):
+        """Evaluate every rule on a batch (wall seconds, validated values with NaN
+        for flagged samples); returns the alert events raised or cleared, in order"""
+        rs = self.ruleset
+        if not len(times) or not rs.rules:
+            return []
+        t0 = time.perf_counter_ns()
+        # Comparisons with NaN and windows of unknown samples are expected
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            x, m, when, clear, own = self._conditions(values)
+        events = self._advance(np.asarray(times, dtype=float), when, clear, x, m)
+        # Rules with compound conditions were timed one by one; the shared work is split evenly
+        self.rule_ns += (time.perf_counter_ns() - t0 - own) // len(rs.rules)
+        self.batches += 1
+        return events
+
+    def _conditions(self, values):
+        """Series, leaves and every rule's when/clear truth values over the batch"""
+        rs = self.ruleset
+        clock = time.perf_counter_ns
+        n = len(values)
+        m = len(self._tail)
+        x = np.empty((m + n, len(rs.metrics)))
+        x[:m] = self._tail
+        x[m:, :len(rs.channels)] = values
+        env = {ch: x[:, i] for i, ch in enumerate(rs.channels)}
+        env["_length"] = m + n
+        for j, (name, fn) in enumerate(rs.series):
+            col = x[:, len(rs.channels) + j]
+            col[:] = fn(env)
+            env[name] = col
+        self._tail = x[len(x) - min(len(x), rs.lookback):].copy()
+
+        # Every comparison with a constant at once, one call per operator;
+        # the last two rows are the constant leaves TRUE and FALSE
+        leaves = np.empty((len(rs.leaf_cols) + 2, m + n))
+        leaves[-2:] = ((1.0,), (0.0,))
+        metrics = x.T
+        for op, index, cols, thresholds in rs.leaf_groups:
+            leaves[index] = op(metrics[cols], thresholds)
+        if np.isnan(x).any():
+            unknown = np.isnan(metrics[rs.leaf_cols])
+            leaves[:-2][unknown] = np.nan
+        env["_leaves"] = leaves
+        when = np.empty((len(rs.rules), n))
+        clear = np.empty((len(rs.rules), n))
+        batch = leaves[:, m:]
+        for out, groups in ((when, rs.when_groups), (clear, rs.clear_groups)):
+            for kind, rows, ks in groups:
+                out[rows] = batch[ks[:, 0]] if kind == "leaf" else _combine(kind, batch[ks])
+        own = 0
+        for i in rs.compound:
+            t0 = clock()
+            rule = rs.rules[i]
+            if rule["when_plan"] is None:
+                w = rule["when"](env)
+                when[i] = w[m:] if np.ndim(w) else w
+            if rule["clear"] is not None and rule["clear_plan"] is None:
+                c = rule["clear"](env)
+                clear[i] = c[m:] if np.ndim(c) else c
+            spent = clock() - t0
+            self.rule_ns[i] += spent
+            own += spent
+        clear[rs.default_clear] = 1.0 - when[rs.default_clear]
+        return x, m, when, clear, own
+
+    def _advance(self, t, when, clear, x, m):
+        """Move every rule's streak and active state through the batch.
+
+        Active rules progress towards clearing, the rest towards triggering.
+        A rule that changes state mid-batch starts a fresh streak on the
+        next sample; rounds repeat, over just those rules, until none does.
+        """
+        rs = self.ruleset
+        n = len(t)
+        index = np.arange(n)
+        since = self.since
+        changes = self._instant(when, index)
+        # Most rules make no progress in a batch: their streak, if any, is over
+        active = self.active[:, None]
+        p = np.where(active, clear, when)
+        progress = p == 1
+        if self.active.any():
+            progress |= active & rs.drop_unknown[:, None] & np.isnan(p)
+        moving = progress.any(axis=1) & ~rs.instant
+        since[~moving] = np.nan
+        rows = np.flatnonzero(moving)
+        begin = np.zeros(len(rows), dtype=np.intp)
+        while len(rows):
+            active = self.active[rows, None]
+            p = np.where(active, clear[rows], when[rows])
+            progress = (p == 1) | (active & rs.drop_unknown[rows, None] & np.isnan(p))
+            progress &= index >= begin[:, None]
+            last_break = np.maximum.accumulate(np.where(progress, -1, index), axis=1)
+            first = np.where(np.isnan(since[rows]), t[0], since[rows])
+            start = np.where(last_break < 0, first[:, None], t[np.minimum(last_break + 1, n - 1)])
+            duration = np.where(self.active[rows], rs.clear_s[rows], rs.for_s[rows])
+            hit = progress & (t - start >= duration[:, None])
+            changed = hit.any(axis=1)
+            done = rows[~changed]
+            since[done] = np.where(progress[~changed, -1], start[~changed, -1], np.nan)
+            rows = rows[changed]
+            at = np.argmax(hit[changed], axis=1)
+            self.active[rows] = ~self.active[rows]
+            changes.extend(zip(at.tolist(), rows.tolist(), self.active[rows].tolist()))
+            since[rows] = np.nan
+            begin = at + 1
+            more = begin < n
+            rows, begin = rows[more], begin[more]
+        return [self._event(i, t[j], x[m + j], on) for j, i, on in sorted(changes) if rs.is_alert[i]]
+
+    def _instant(self, when, index):
+        """State of the instant rules at every sample; returns their changes as (sample, rule, active)"""
+        rs = self.ruleset
+        rows = np.flatnonzero(rs.instant)
+        if not len(rows):
+            return []
+        w = when[rows]
+        before = self.active[rows, None]
+        state = w == 1
+        hold = ~rs.drop_unknown[rows, None] & np.isnan(w)
+        if hold.any():
+            # Unknown samples keep the state of the last known one
+            last = np.maximum.accumulate(np.where(hold, -1, index), axis=1)
+            state = np.where(last >= 0, np.take_along_axis(state, np.maximum(last, 0), 1), before)
+        flips = state != np.concatenate((before, state[:, :-1]), axis=1)
+        self.active[rows] = state[:, -1]
+        r, j = np.nonzero(flips)
+        return list(zip(j.tolist(), rows[r].tolist(), state[r, j].tolist()))
+
+    def _event(self, i, t, row, active):
+        rule = self.ruleset.rules[i]
+        if not active:
+            raised = self.activated.pop(rule["name"], None)
+            return {"rule": rule["name"], "state": "cleared", "time": float(t), "severity": rule["severity"],
+                    "message": raised["message"] if raised else rule["message"], "notify": False}
+        try:
+            message = rule["message"].format(**dict(zip(self.ruleset.metrics, row.tolist())))
+        except (KeyError, IndexError, ValueError):
+            message = rule["message"]
+        event = {"rule": rule["name"], "state": "active", "time": float(t),
+                 "severity": rule["severity"], "message": message, "notify": rule["notify"]}
+        self.activated[rule["name"]] = event
+        self.raised += 1
+        return event
+
+    def alerts(self):
+        """Active alerts, in the order the rules file lists them"""
+        rs = self.ruleset
+        return [self.activated[rs.names[i]] for i in rs.alert_rows if self.active[i]]
+
+    def risk(self):
+        """0-100: the scores of the active risk rules, summed"""
+        return float(min(max(self.ruleset.scores[self.active].sum(), 0), 100))
+
+    def mood(self):
+        """(name, color) of the first active mood rule, or the default mood"""
+        rs = self.ruleset
+        for i in rs.mood_rows:
+            if self.active[i]:
+                return rs.rules[i]["name"], rs.rules[i]["color"]
+        return rs.default_mood["name"], rs.default_mood["color"]
+
+    def timings(self):
+        """Per rule: mean evaluation time per batch in µs"""
+        batches = max(self.batches, 1)
+        return {name: ns / batches / 1e3 for name, ns in zip(self.ruleset.names, self.rule_ns)}
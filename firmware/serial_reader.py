@@ -0,0 +1,275 @@
+import re, threading, time, queue, warnings
+from collections import namedtuple, deque
+import numpy as np
+
+from instrumentation import INSTRUMENTS
+
+# === FRAME FORMAT ===
+FRAME_PREFIX = b"PYTHON->"
+FRAME_CHANNELS = ["HR", "SpO2", "Temp", "Pressure", "Altitude",
+                  "AccX", "AccY", "AccZ", "MQ", "ECG"]
+FRAME_FIELDS = len(FRAME_CHANNELS)
+MAX_PARTIAL = 65536   # drop a runaway line that never sees a newline
+RECONNECT_MIN_S = 0.5   # first retry after a failed open or a lost port...
+RECONNECT_MAX_S = 5.0   # ...doubling up to this
+FRAME_LINE = re.compile(rb"^[ \t]*" + re.escape(FRAME_PREFIX) + rb"([^\r\n]*)", re.M)
+
+# Offset that maps monotonic arrival stamps onto wall-clock time
+WALL_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+class FrameBlock(namedtuple("FrameBlock", ["t_ns", "values"])):
+    """Parsed frames: arrival times (monotonic ns, int64 (n,)) and raw values
+    (float64 (n, FRAME_FIELDS)), NaN wherever a field is not a number"""
+
+    __slots__ = ()
+
+    @property
+    def count(self):
+        return len(self.t_ns)
+
+    @classmethod
+    def concat(cls, blocks):
+        if len(blocks) == 1:
+            return blocks[0]
+        if not blocks:
+            return cls(np.zeros(0, np.int64), np.zeros((0, FRAME_FIELDS)))
+        return cls(np.concatenate([b.t_ns for b in blocks]),
+                   np.concatenate([b.values for b in blocks]))
+
+
+def wall_time(t_ns):
+    """Convert a monotonic frame stamp to epoch seconds"""
+    return (t_ns + WALL_OFFSET_NS) / 1e9
+
+
+class FrameRateEstimator:
+    """Frames per second from arrival stamps, over the last window_s seconds.
+
+    Frames read in one chunk share a stamp, so the rate is counted from
+    block to block: the frames that arrived after the oldest kept stamp,
+    over the time since it. A pause longer than gap_s starts afresh.
+    """
+
+    def __init__(self, window_s=10.0, min_span_s=5.0, gap_s=2.0):
+        self.window_ns = int(window_s * 1e9)
+        self.min_span_ns = int(min_span_s * 1e9)
+        self.gap_ns = int(gap_s * 1e9)
+        self._marks = deque()   # (stamp, frames arrived up to it)
+        self._frames = 0
+
+    def update(self, t_ns):
+        """Add a block's arrival stamps; return the rate, or None while too little time is covered"""
+        if not len(t_ns):
+            return self.rate
+        last = int(t_ns[-1])
+        if self._marks and last - self._marks[-1][0] > self.gap_ns:
+            self._marks.clear()
+        self._frames += len(t_ns)
+        if self._marks and last <= self._marks[-1][0]:
+            # Same stamp as the previous block: more frames for that mark
+            self._marks[-1] = (self._marks[-1][0], self._frames)
+        else:
+            self._marks.append((last, self._frames))
+        # Keep one mark at or before the window's start
+        while len(self._marks) > 2 and last - self._marks[1][0] >= self.window_ns:
+            self._marks.popleft()
+        return self.rate
+
+    @property
+    def rate(self):
+        if len(self._marks) < 2:
+            return None
+        (t0, n0), (t1, n1) = self._marks[0], self._marks[-1]
+        if t1 - t0 < self.min_span_ns:
+            return None
+        return (n1 - n0) / ((t1 - t0) / 1e9)
+
+
+def _parse_fields(bodies):
+    """Slow path: field-by-field conversion for blocks holding non-numeric fields"""
+    values = np.full((len(bodies), FRAME_FIELDS), np.nan)
+    for i, body in enumerate(bodies):
+        for j, field in enumerate(body.split(b",")):
+            try:
+                values[i, j] = float(field)
+            except ValueError:
+                pass
+    return values
+
+
+def parse_block(buf, t_ns):
+    """Parse every complete frame line in buf in one pass.
+
+    Returns (FrameBlock, malformed, remainder): lines with the wrong number
+    of fields count as malformed, and the bytes after the last newline are
+    handed back for the next read.
+    """
+    end = buf.rfind(b"\n") + 1
+    remainder = buf[end:]
+    bodies = FRAME_LINE.findall(buf, 0, end)
+    frames = [body for body in bodies if body.count(b",") == FRAME_FIELDS - 1]
+    malformed = len(bodies) - len(frames)
+    n = len(frames)
+    if not n:
+        return FrameBlock.concat([]), malformed, remainder
+    try:
+        # One C-level conversion for the whole block. Older numpy stops at the
+        # first bad field with a DeprecationWarning instead of raising, so the
+        # count is checked too
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            values = np.fromstring(b",".join(frames), sep=",")
+        if values.size != n * FRAME_FIELDS:
+            raise ValueError(f"parsed {values.size} of {n * FRAME_FIELDS} fields")
+        values = values.reshape(n, FRAME_FIELDS)
+    except (ValueError, DeprecationWarning):
+        values = _parse_fields(frames)
+    return FrameBlock(np.full(n, t_ns, np.int64), values), malformed, remainder
+
+
+# === BACKGROUND READER ===
+class SerialReader(threading.Thread):
+    """Drain the serial port in bulk, parse it here and hand FrameBlocks to the GUI thread.
+
+    With ``connect=True`` the port is opened on this thread rather than by
+    the caller, and closed and reopened (with backoff) whenever it fails, so
+    nothing waits on a slow or unplugged device.
+    """
+
+    def __init__(self, port, max_batches=256, max_read=65536, name=None, connect=False):
+        super().__init__(daemon=True)
+        self.port = port
+        self.name = name or getattr(port, "name", "serial")
+        self.connect = connect
+        self.connected = not connect
+        self.max_read = max_read
+        self.batches = queue.Queue(maxsize=max_batches)
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._remainder = b""
+
+        # Counters (written by the reader, read by the GUI)
+        self.frames_total = 0
+        self.bytes_total = 0
+        self.malformed_frames = 0
+        self.dropped_frames = 0
+        self.pending_frames = 0
+        self.port_backlog = 0
+        self.frames_per_sec = 0.0
+        self.bytes_per_sec = 0.0
+        self.cpu_s = 0.0            # CPU time used by this thread
+        self.errors = 0
+        self.connects = 0           # successful opens, including reconnects
+        self.last_error = None
+        INSTRUMENTS.register_attrs(self, [
+            ("reader_connected", "connected", "gauge"),
+            ("reader_connects_total", "connects", "counter"),
+            ("reader_pending_frames", "pending_frames", "gauge"),
+            ("reader_port_backlog_bytes", "port_backlog", "gauge"),
+            ("reader_frames_per_second", "frames_per_sec", "gauge"),
+            ("reader_frames_total", "frames_total", "counter"),
+            ("reader_malformed_frames_total", "malformed_frames", "counter"),
+            ("reader_dropped_frames_total", "dropped_frames", "counter"),
+            ("reader_errors_total", "errors", "counter"),
+        ], device=self.name)
+
+    def run(self):
+        rate_start = time.monotonic()
+        rate_frames = rate_bytes = 0
+        delay = RECONNECT_MIN_S
+        while not self._stop_event.is_set():
+            if not self.connected:
+                try:
+                    self.port.open()
+                except Exception as e:
+                    self.errors += 1
+                    self.last_error = f"{e} (retrying in {delay:.1f}s)"
+                    self._stop_event.wait(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_S)
+                    continue
+                self.connected = True
+                self.connects += 1
+                self.last_error = None
+                self._remainder = b""
+                print(f"✅ {self.name}: connected to {getattr(self.port, 'device', None) or self.port.name}")
+            try:
+                waiting = self.port.in_waiting
+                # Block for at most the port timeout when idle, otherwise take the whole backlog
+                data = self.port.read(min(max(waiting, 1), self.max_read))
+                self.port_backlog = self.port.in_waiting
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                if not self.connect:
+                    time.sleep(1)
+                    continue
+                # Unplugged or reset: close it and go back to opening it
+                print(f"⚠ {self.name}: {e}; reconnecting")
+                self.connected = False
+                try:
+                    self.port.close()
+                except Exception:
+                    pass
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX_S)
+                continue
+
+            if data:
+                delay = RECONNECT_MIN_S
+                self.bytes_total += len(data)
+                rate_bytes += len(data)
+                t0 = time.perf_counter_ns()
+                block, malformed, self._remainder = parse_block(
+                    self._remainder + data, time.monotonic_ns()
+                )
+                INSTRUMENTS.record("parse", t0, self.name)
+                if len(self._remainder) > MAX_PARTIAL:
+                    self._remainder = b""
+                    malformed += 1
+                self.malformed_frames += malformed
+                if block.count:
+                    self.frames_total += block.count
+                    rate_frames += block.count
+                    self._enqueue(block)
+
+            self.cpu_s = time.thread_time()
+            now = time.monotonic()
+            if now - rate_start >= 1.0:
+                self.frames_per_sec = rate_frames / (now - rate_start)
+                self.bytes_per_sec = rate_bytes / (now - rate_start)
+                rate_start = now
+                rate_frames = rate_bytes = 0
+
+    def _enqueue(self, block):
+        """Queue a block, discarding the oldest block when the GUI falls behind"""
+        with self._lock:
+            try:
+                self.batches.put_nowait(block)
+            except queue.Full:
+                try:
+                    stale = self.batches.get_nowait()
+                    self.dropped_frames += stale.count
+                    self.pending_frames -= stale.count
+                except queue.Empty:
+                    pass
+                self.batches.put_nowait(block)
+            self.pending_frames += block.count
+
+    def drain(self):
+        """Return every frame queued since the last call as one FrameBlock, oldest first"""
+        blocks = []
+        with self._lock:
+            while True:
+                try:
+                    blocks.append(self.batches.get_nowait())
+                except queue.Empty:
+                    break
+            self.pending_frames = 0
+        return FrameBlock.concat(blocks)
+
+    def stop(self, timeout=2.0):
+        INSTRUMENTS.unregister(self)
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
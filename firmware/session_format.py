@@ -0,0 +1,481 @@
+"""Binary columnar session files.
+
+A session is a directory of fixed-size chunk files plus ``index.json``.
+Each chunk starts with a HEADER_SIZE-byte header (magic + JSON, space
+padded) followed by packed records:
+
+    t_ns    int64              monotonic arrival time (add wall_offset_ns for epoch)
+    values  float32[channels]  validated sensor values
+    flags   uint16             bit i set when channel i passed validation
+
+Alongside the chunks the writer keeps per-minute and per-hour rollups
+(``rollup_60s.npy``, ``rollup_3600s.npy``): record count, min, max and sum
+of the valid samples of every channel, keyed by wall-clock bucket start.
+
+Usage:
+    python session_format.py to-session health_log.csv sessions/night1
+    python session_format.py to-csv sessions/night1 night1.csv
+"""
+import os, csv, json, time, glob, argparse, itertools
+import numpy as np
+
+from serial_reader import FRAME_CHANNELS
+from instrumentation import INSTRUMENTS
+
+MAGIC = b"HWSESS1\n"
+HEADER_SIZE = 512
+FORMAT_VERSION = 1
+INDEX_FILE = "index.json"
+CHUNK_PATTERN = "chunk_{:06d}.hwb"
+ROLLUP_PERIODS = (60, 3600)
+ROLLUP_PATTERN = "rollup_{}s.npy"
+
+# Column names used by the TRL-8 detailed logs in test_logs/Csv
+CSV_COLUMN_MAP = {
+    "Pressure (Pa)": ("Pressure", 0.01),       # Pa -> hPa
+    "Pressure (hPa)": ("Pressure", 1.0),
+    "Altitude (m)": ("Altitude", 1.0),
+    "Body Temperature (°C)": ("Temp", 1.0),
+    "Air Quality (ppm)": ("MQ", 1.0),
+    "ECG Value": ("ECG", 1.0),
+}
+
+
+def record_dtype(channels):
+    return np.dtype([
+        ("t_ns", "<i8"),
+        ("values", "<f4", (len(channels),)),
+        ("flags", "<u2"),
+    ])
+
+
+def _encode_header(meta):
+    body = MAGIC + json.dumps(meta).encode()
+    if len(body) > HEADER_SIZE:
+        raise ValueError("session header too large")
+    return body.ljust(HEADER_SIZE, b" ")
+
+
+def _decode_header(raw):
+    if not raw.startswith(MAGIC):
+        raise ValueError("not a session chunk (bad magic)")
+    return json.loads(raw[len(MAGIC):].decode())
+
+
+# === ROLLUPS ===
+def rollup_dtype(channels):
+    n = len(channels)
+    return np.dtype([
+        ("t", "<i8"),                   # bucket start, epoch seconds
+        ("count", "<i4", (n,)),         # valid samples per channel
+        ("min", "<f4", (n,)),
+        ("max", "<f4", (n,)),
+        ("sum", "<f8", (n,)),
+    ])
+
+
+class Rollup:
+    """Min/max/sum/count of valid samples per fixed wall-clock bucket"""
+
+    def __init__(self, period, channels, data=None):
+        self.period = int(period)
+        self.channels = list(channels)
+        self.dtype = rollup_dtype(self.channels)
+        self.data = np.zeros(0, dtype=self.dtype) if data is None else data
+
+    def add(self, wall_ns, values, flags):
+        """Fold a time-ordered batch into the buckets (vectorised per batch)"""
+        if not len(wall_ns):
+            return
+        nch = len(self.channels)
+        bucket = np.asarray(wall_ns, dtype=np.int64) // (self.period * 1_000_000_000) * self.period
+        valid = (np.asarray(flags, dtype=np.uint16)[:, None] >> np.arange(nch, dtype=np.uint16)) & 1 == 1
+        v = np.where(valid, np.asarray(values, dtype=np.float64), np.nan)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        new = np.zeros(len(starts), dtype=self.dtype)
+        new["t"] = bucket[starts]
+        new["count"] = np.add.reduceat(valid, starts, axis=0)
+        new["sum"] = np.add.reduceat(np.where(valid, v, 0.0), starts, axis=0)
+        new["min"] = np.fmin.reduceat(v, starts, axis=0)
+        new["max"] = np.fmax.reduceat(v, starts, axis=0)
+        data = self.data
+        if len(data) and new["t"][0] == data["t"][-1]:
+            # First bucket continues the last one already held
+            last, first = data[-1], new[0]
+            last["count"] += first["count"]
+            last["sum"] += first["sum"]
+            last["min"] = np.fmin(last["min"], first["min"])
+            last["max"] = np.fmax(last["max"], first["max"])
+            new = new[1:]
+        if len(new):
+            self.data = np.concatenate((data, new))
+
+    def mean(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.data["count"] > 0, self.data["sum"] / self.data["count"], np.nan)
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, self.data)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, period, channels):
+        return cls(period, channels, np.load(path))
+
+
+# === WRITER ===
+class SessionWriter:
+    """Append records to a chunked binary session, buffering in a preallocated array"""
+
+    def __init__(self, path, channels=FRAME_CHANNELS, chunk_records=1_000_000,
+                 buffer_records=4096, wall_offset_ns=None):
+        if len(channels) > 16:
+            raise ValueError("validation flags hold at most 16 channels")
+        self.path = path
+        self.channels = list(channels)
+        self.dtype = record_dtype(self.channels)
+        self.chunk_records = chunk_records
+        self.wall_offset_ns = (time.time_ns() - time.monotonic_ns()
+                               if wall_offset_ns is None else int(wall_offset_ns))
+        os.makedirs(path, exist_ok=True)
+
+        self._buffer = np.zeros(buffer_records, dtype=self.dtype)
+        self._buffered = 0
+        self._chunks = []
+        self._file = None
+        self._chunk_count = 0
+        self.records_written = 0
+        self._closed = False
+        self.rollups = [Rollup(p, self.channels) for p in ROLLUP_PERIODS]
+
+    def write(self, t_ns, values, flags=None):
+        """Append a batch: t_ns (n,), values (n, channels), flags (n,) or None for all-valid"""
+        t_ns = np.asarray(t_ns, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32).reshape(len(t_ns), len(self.channels))
+        if flags is None:
+            flags = np.full(len(t_ns), (1 << len(self.channels)) - 1, dtype=np.uint16)
+        start = 0
+        while start < len(t_ns):
+            room = len(self._buffer) - self._buffered
+            take = min(room, len(t_ns) - start)
+            dst = self._buffer[self._buffered:self._buffered + take]
+            dst["t_ns"] = t_ns[start:start + take]
+            dst["values"] = values[start:start + take]
+            dst["flags"] = np.asarray(flags)[start:start + take]
+            self._buffered += take
+            start += take
+            if self._buffered == len(self._buffer):
+                self.flush()
+
+    def flush(self):
+        """Write buffered records to disk, opening new chunks as needed"""
+        t0 = time.perf_counter_ns()
+        pending = self._buffer[:self._buffered]
+        while len(pending):
+            if self._file is None or self._chunk_count >= self.chunk_records:
+                self._open_chunk()
+            take = min(len(pending), self.chunk_records - self._chunk_count)
+            part = pending[:take]
+            self._file.write(part.tobytes())
+            entry = self._chunks[-1]
+            if entry["records"] == 0:
+                entry["t_first"] = int(part["t_ns"][0])
+            entry["t_last"] = int(part["t_ns"][-1])
+            entry["records"] += take
+            self._chunk_count += take
+            self.records_written += take
+            pending = pending[take:]
+        records = self._buffer[:self._buffered]
+        if len(records):
+            wall_ns = records["t_ns"] + self.wall_offset_ns
+            for rollup in self.rollups:
+                rollup.add(wall_ns, records["values"], records["flags"])
+        self._buffered = 0
+        if self._file is not None:
+            self._file.flush()
+            self._write_index()
+            for rollup in self.rollups:
+                rollup.save(os.path.join(self.path, ROLLUP_PATTERN.format(rollup.period)))
+        INSTRUMENTS.record("session_flush", t0, os.path.basename(self.path))
+
+    def _open_chunk(self):
+        if self._file is not None:
+            self._file.close()
+        name = CHUNK_PATTERN.format(len(self._chunks))
+        self._file = open(os.path.join(self.path, name), "wb")
+        self._file.write(_encode_header({
+            "version": FORMAT_VERSION,
+            "channels": self.channels,
+            "wall_offset_ns": self.wall_offset_ns,
+        }))
+        self._chunks.append({"file": name, "records": 0, "t_first": None, "t_last": None})
+        self._chunk_count = 0
+
+    def _write_index(self):
+        index = {
+            "version": FORMAT_VERSION,
+            "channels": self.channels,
+            "wall_offset_ns": self.wall_offset_ns,
+            "record_size": self.dtype.itemsize,
+            "header_size": HEADER_SIZE,
+            "chunks": self._chunks,
+        }
+        tmp = os.path.join(self.path, INDEX_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, INDEX_FILE))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# === READER ===
+class SessionReader:
+    """Expose a session directory as memory-mapped NumPy arrays"""
+
+    def __init__(self, path):
+        self.path = path
+        chunk_files = sorted(glob.glob(os.path.join(path, "chunk_*.hwb")))
+        if not chunk_files:
+            raise FileNotFoundError(f"no session chunks in {path}")
+        with open(chunk_files[0], "rb") as f:
+            meta = _decode_header(f.read(HEADER_SIZE))
+        self.channels = meta["channels"]
+        self.index = {name: i for i, name in enumerate(self.channels)}
+        self.wall_offset_ns = meta["wall_offset_ns"]
+        self.dtype = record_dtype(self.channels)
+
+        # Record counts come from file sizes, so a session that was not
+        # closed cleanly is still readable up to its last whole record
+        self.chunks = []
+        for name in chunk_files:
+            n = (os.path.getsize(name) - HEADER_SIZE) // self.dtype.itemsize
+            if n > 0:
+                self.chunks.append(np.memmap(name, dtype=self.dtype, mode="r",
+                                             offset=HEADER_SIZE, shape=(n,)))
+        self._records = None
+
+    def __len__(self):
+        return sum(len(c) for c in self.chunks)
+
+    @property
+    def records(self):
+        """All records; zero-copy for single-chunk sessions"""
+        if self._records is None:
+            if len(self.chunks) == 1:
+                self._records = self.chunks[0]
+            elif self.chunks:
+                self._records = np.concatenate(self.chunks)
+            else:
+                self._records = np.zeros(0, dtype=self.dtype)
+        return self._records
+
+    @property
+    def t_ns(self):
+        return self.records["t_ns"]
+
+    @property
+    def values(self):
+        return self.records["values"]
+
+    @property
+    def flags(self):
+        return self.records["flags"]
+
+    def channel(self, name):
+        return self.records["values"][:, self.index[name]]
+
+    def valid(self, name):
+        return (self.records["flags"] >> self.index[name]) & 1 == 1
+
+    def wall_times(self):
+        """Epoch seconds for every record"""
+        return (self.t_ns + self.wall_offset_ns) / 1e9
+
+    def iter_records(self, chunk_rows=65536):
+        """(t_ns, values, flags) of at most chunk_rows records at a time.
+
+        Reads the chunk files directly rather than through the memory maps,
+        so a pass over a long session never holds more than one block.
+        """
+        for chunk in self.chunks:
+            with open(chunk.filename, "rb") as f:
+                f.seek(HEADER_SIZE)
+                for i in range(0, len(chunk), chunk_rows):
+                    part = np.fromfile(f, dtype=self.dtype, count=min(chunk_rows, len(chunk) - i))
+                    yield part["t_ns"], part["values"], part["flags"]
+
+
+# === CSV CONVERSION ===
+def _to_float(text):
+    try:
+        return float(text)
+    except ValueError:
+        return float("nan")
+
+
+def _parse_timestamp(text):
+    return int(time.mktime(time.strptime(text.strip(), "%Y-%m-%d %H:%M:%S")) * 1e9)
+
+
+def _pack(t_ns, values, flags, nch):
+    return (np.array(t_ns, dtype=np.int64),
+            np.array(values, dtype=np.float32).reshape(-1, nch),
+            np.array(flags, dtype=np.uint16))
+
+
+def iter_csv_records(csv_path, channels=FRAME_CHANNELS, sample_period_s=0.004, chunk_rows=65536):
+    """Stream a health_log.csv or test_logs/Csv file as (t_ns, values, flags) chunks.
+
+    Rows cut short (a logger killed mid-line) are skipped and counted.
+    """
+    nch = len(channels)
+    short = 0
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = (r for r in csv.reader(f) if r)
+        first = next(rows, None)
+        if first is None:
+            return
+        t_ns, values, flags = [], [], []
+        if len(first) == 1 + 2 * nch:
+            # health_log.csv: timestamp, raw values, validated values (header optional)
+            for r in itertools.chain([first], rows):
+                if r[0] == "Timestamp":
+                    continue
+                if len(r) < 1 + 2 * nch:
+                    short += 1
+                    continue
+                raw = [_to_float(v) for v in r[1:1 + nch]]
+                val = [_to_float(v) for v in r[1 + nch:]]
+                t_ns.append(_parse_timestamp(r[0]))
+                values.append(val)
+                flags.append(sum(1 << i for i in range(nch) if raw[i] == val[i]))
+                if len(t_ns) == chunk_rows:
+                    yield _pack(t_ns, values, flags, nch)
+                    t_ns, values, flags = [], [], []
+        else:
+            # TRL-8 logs: "Timestamp (ms)", "Test Stage", measurement columns;
+            # single-column logs such as ecg_log.csv have no time column at all
+            header = first
+            cols = [(j, channels.index(CSV_COLUMN_MAP[h][0]), CSV_COLUMN_MAP[h][1])
+                    for j, h in enumerate(header) if h in CSV_COLUMN_MAP]
+            if not cols:
+                raise ValueError(f"{csv_path}: no recognised columns in {header}")
+            time_col = header.index("Timestamp (ms)") if "Timestamp (ms)" in header else None
+            width = 1 + max([j for j, _, _ in cols] + ([] if time_col is None else [time_col]))
+            n = 0
+            for r in rows:
+                if r == header:
+                    continue   # some loggers repeat the header after a restart
+                if len(r) < width:
+                    short += 1
+                    continue
+                row = [float("nan")] * nch
+                bits = 0
+                for j, ch, scale in cols:
+                    v = _to_float(r[j]) * scale
+                    row[ch] = v
+                    if v == v:
+                        bits |= 1 << ch
+                if time_col is None:
+                    t_ns.append(int(n * sample_period_s * 1e9))
+                else:
+                    t_ns.append(int(_to_float(r[time_col]) * 1e6))
+                n += 1
+                values.append(row)
+                flags.append(bits)
+                if len(t_ns) == chunk_rows:
+                    yield _pack(t_ns, values, flags, nch)
+                    t_ns, values, flags = [], [], []
+        if t_ns:
+            yield _pack(t_ns, values, flags, nch)
+    if short:
+        print(f"⚠ {csv_path}: skipped {short} short row{'s' if short > 1 else ''}")
+
+
+def read_csv_records(csv_path, channels=FRAME_CHANNELS, sample_period_s=0.004):
+    """Load a health_log.csv or test_logs/Csv file as (t_ns, values, flags)"""
+    chunks = list(iter_csv_records(csv_path, channels, sample_period_s))
+    if not chunks:
+        return _pack([], [], [], len(channels))
+    return tuple(np.concatenate(parts) for parts in zip(*chunks))
+
+
+def iter_records(path, channels=FRAME_CHANNELS, chunk_rows=65536, **kwargs):
+    """Stream a session directory or CSV log as (t_ns, values, flags) chunks of at most chunk_rows"""
+    if os.path.isdir(path):
+        reader = SessionReader(path)
+        if reader.channels == list(channels):
+            yield from reader.iter_records(chunk_rows)
+            return
+        # Recorded with other channels: reorder, NaN (and a clear flag) where one is missing
+        cols = [reader.index.get(ch) for ch in channels]
+        for t_ns, values, flags in reader.iter_records(chunk_rows):
+            out = np.full((len(t_ns), len(channels)), np.nan, dtype=np.float32)
+            bits = np.zeros(len(t_ns), dtype=np.uint16)
+            for i, j in enumerate(cols):
+                if j is not None:
+                    out[:, i] = values[:, j]
+                    bits |= ((flags >> j) & 1).astype(np.uint16) << i
+            yield t_ns, out, bits
+    else:
+        yield from iter_csv_records(path, channels, chunk_rows=chunk_rows, **kwargs)
+
+
+def csv_to_session(csv_path, session_path, channels=FRAME_CHANNELS, **kwargs):
+    """Convert a CSV log into a binary session directory"""
+    t_ns, values, flags = read_csv_records(csv_path, channels, **kwargs)
+    writer = SessionWriter(session_path, channels, wall_offset_ns=0)
+    writer.write(t_ns, values, flags)
+    writer.close()
+    return len(t_ns)
+
+
+def session_to_csv(session_path, csv_path):
+    """Write a session back out in the health_log.csv layout"""
+    reader = SessionReader(session_path)
+    channels = reader.channels
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Timestamp"] + [f"{ch}_raw" for ch in channels] + channels)
+        for chunk in reader.chunks:
+            times = (chunk["t_ns"] + reader.wall_offset_ns) / 1e9
+            for t, vals, bits in zip(times, chunk["values"].tolist(), chunk["flags"].tolist()):
+                vals = [format(v, ".7g") for v in vals]   # float32 precision
+                # Raw values are only kept when they passed validation
+                raw = [v if (bits >> i) & 1 else "" for i, v in enumerate(vals)]
+                writer.writerow([time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))]
+                                + raw + vals)
+    return len(reader)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert between CSV logs and binary sessions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    to_session = sub.add_parser("to-session", help="CSV log -> session directory")
+    to_session.add_argument("csv")
+    to_session.add_argument("session")
+    to_session.add_argument("--sample-period", type=float, default=0.004,
+                            help="seconds between rows for logs without a time column")
+    to_csv = sub.add_parser("to-csv", help="session directory -> CSV log")
+    to_csv.add_argument("session")
+    to_csv.add_argument("csv")
+    args = parser.parse_args(argv)
+
+    if args.command == "to-session":
+        n = csv_to_session(args.csv, args.session, sample_period_s=args.sample_period)
+    else:
+        n = session_to_csv(args.session, args.csv)
+    print(f"✅ Converted {n} records")
+
+
+if __name__ == "__main__":
+    main()
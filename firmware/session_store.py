@@ -0,0 +1,287 @@
+"""Time-indexed access to every recorded session.
+
+Sessions are located by their wall-clock span; inside a session, each
+chunk's first/last stamps narrow the search to one or two chunks, and a
+sparse index (every SPARSE_STRIDE-th timestamp, built once per chunk)
+narrows it to a few thousand records before the final binary search, so a
+query touches pages in proportion to what it returns.
+Long ranges are served from the per-minute/per-hour rollups instead of raw
+records.
+
+    python session_store.py info
+    python session_store.py query --from "2025-06-01 02:00" --to "2025-06-01 03:00" --channels HR SpO2
+    python session_store.py query --from "2025-06-01 00:00" --to "2025-06-02 00:00" --rollup 3600 --csv day.csv
+"""
+import os, sys, csv, json, glob, time, argparse
+import numpy as np
+
+from config import SESSION_DIR
+from session_format import (
+    SessionReader, Rollup, ROLLUP_PERIODS, ROLLUP_PATTERN, INDEX_FILE
+)
+
+SPARSE_STRIDE = 4096    # records between sparse index entries
+RAW_BIN_LIMIT = 64      # series() bins raw records up to this many per point, then uses rollups
+
+
+def parse_time(text):
+    """Epoch seconds from 'YYYY-mm-dd HH:MM[:SS]' (local time) or a plain number"""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised time: {text!r}")
+
+
+def _fmt(t):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+
+
+# === STORED SESSION ===
+class StoredSession:
+    """One session directory: its wall-clock span, records and rollups"""
+
+    def __init__(self, path):
+        self.path = path
+        self.reader = SessionReader(path)
+        self.channels = self.reader.channels
+        self.wall_offset_ns = self.reader.wall_offset_ns
+        self.chunk_spans = [(int(c["t_ns"][0]), int(c["t_ns"][-1])) for c in self.reader.chunks]
+        self.start = (self.chunk_spans[0][0] + self.wall_offset_ns) / 1e9 if self.chunk_spans else None
+        self.end = (self.chunk_spans[-1][1] + self.wall_offset_ns) / 1e9 if self.chunk_spans else None
+        self._rollups = {}
+        self._sparse = {}
+
+    def __len__(self):
+        return len(self.reader)
+
+    def overlaps(self, start, end):
+        return self.start is not None and self.start <= end and self.end >= start
+
+    def records(self, start, end):
+        """Records with start <= wall time < end, read from the memmaps"""
+        lo_ns = int(start * 1e9) - self.wall_offset_ns
+        hi_ns = int(end * 1e9) - self.wall_offset_ns
+        parts = []
+        for chunk, (first, last) in zip(self.reader.chunks, self.chunk_spans):
+            if last < lo_ns or first >= hi_ns:
+                continue
+            i0 = self._locate(chunk, lo_ns) if first < lo_ns else 0
+            i1 = self._locate(chunk, hi_ns) if last >= hi_ns else len(chunk)
+            if i1 > i0:
+                parts.append(np.asarray(chunk[i0:i1]))
+        if not parts:
+            return np.zeros(0, dtype=self.reader.dtype)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _locate(self, chunk, t_ns):
+        """First record index with stamp >= t_ns, reading ~SPARSE_STRIDE stamps"""
+        sparse = self._sparse.get(id(chunk))
+        if sparse is None:
+            sparse = self._sparse[id(chunk)] = np.array(chunk["t_ns"][::SPARSE_STRIDE])
+        block = max(int(np.searchsorted(sparse, t_ns, "left")) - 1, 0)
+        lo = block * SPARSE_STRIDE
+        window = np.array(chunk["t_ns"][lo:lo + 2 * SPARSE_STRIDE])
+        return lo + int(np.searchsorted(window, t_ns, "left"))
+
+    def rollup(self, period):
+        """The session's rollup at period seconds, built from the records if missing"""
+        if period in self._rollups:
+            return self._rollups[period]
+        path = os.path.join(self.path, ROLLUP_PATTERN.format(period))
+        rollup = None
+        if os.path.exists(path):
+            rollup = Rollup.load(path, period, self.channels)
+            # A rollup saved before a crash can trail the chunks; rebuild then
+            if not len(rollup.data) or rollup.data["t"][-1] + period < self.end:
+                rollup = None
+        if rollup is None:
+            rollup = Rollup(period, self.channels)
+            for chunk in self.reader.chunks:
+                for i in range(0, len(chunk), 1_000_000):
+                    part = chunk[i:i + 1_000_000]
+                    rollup.add(part["t_ns"] + self.wall_offset_ns, part["values"], part["flags"])
+            try:
+                rollup.save(path)
+            except OSError:
+                pass    # read-only archive: keep it in memory only
+        self._rollups[period] = rollup
+        return rollup
+
+
+# === SESSION STORE ===
+class SessionStore:
+    """Range queries across all sessions under root (default SESSION_DIR)"""
+
+    def __init__(self, root=SESSION_DIR):
+        self.root = root
+        self.sessions = []
+        self.refresh()
+
+    def refresh(self):
+        """Rescan the directory; picks up new sessions and growth of the live one"""
+        sessions = []
+        for index in sorted(glob.glob(os.path.join(self.root, "**", INDEX_FILE), recursive=True)):
+            try:
+                session = StoredSession(os.path.dirname(index))
+            except (OSError, ValueError, json.JSONDecodeError) as e:
+                print(f"⚠ Skipping {os.path.dirname(index)}: {e}")
+                continue
+            if session.start is not None:
+                sessions.append(session)
+        sessions.sort(key=lambda s: s.start)
+        self.sessions = sessions
+        return self
+
+    @property
+    def channels(self):
+        return self.sessions[0].channels if self.sessions else []
+
+    @property
+    def span(self):
+        if not self.sessions:
+            return None, None
+        return self.sessions[0].start, max(s.end for s in self.sessions)
+
+    def _columns(self, session, channels):
+        if channels is None:
+            return list(range(len(session.channels))), list(session.channels)
+        return [session.reader.index[ch] for ch in channels], list(channels)
+
+    def query(self, start, end, channels=None):
+        """Raw records in [start, end): (epoch seconds, values (n, k), valid mask (n, k))"""
+        times, values, valid = [], [], []
+        for session in self.sessions:
+            if not session.overlaps(start, end):
+                continue
+            rec = session.records(start, end)
+            cols, _ = self._columns(session, channels)
+            times.append((rec["t_ns"] + session.wall_offset_ns) / 1e9)
+            values.append(rec["values"][:, cols])
+            valid.append((rec["flags"][:, None] >> np.asarray(cols, dtype=np.uint16)) & 1 == 1)
+        k = len(channels) if channels else len(self.channels)
+        if not times:
+            return np.zeros(0), np.zeros((0, k), np.float32), np.zeros((0, k), bool)
+        return np.concatenate(times), np.concatenate(values), np.concatenate(valid)
+
+    def aggregate(self, start, end, period=60, channels=None):
+        """Rollup buckets in [start, end): (bucket start, count, min, mean, max), each (n, k)"""
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"period must be one of {ROLLUP_PERIODS}")
+        parts = []
+        for session in self.sessions:
+            if not session.overlaps(start, end):
+                continue
+            rollup = session.rollup(period)
+            data = rollup.data
+            i0 = np.searchsorted(data["t"], start - period + 1, "left")
+            i1 = np.searchsorted(data["t"], end, "left")
+            cols, _ = self._columns(session, channels)
+            part = data[i0:i1]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = part["sum"][:, cols] / part["count"][:, cols]
+            parts.append((part["t"], part["count"][:, cols], part["min"][:, cols], mean, part["max"][:, cols]))
+        if not parts:
+            k = len(channels) if channels else len(self.channels)
+            empty = np.zeros((0, k))
+            return np.zeros(0, np.int64), empty, empty, empty, empty
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def series(self, channel, start, end, points=2000):
+        """(t, y, lo, hi) for plotting: raw when it fits in points, else the finest rollup that does"""
+        duration = max(end - start, 1e-9)
+        raw_estimate = sum(
+            len(s) * min(duration, s.end - s.start) / max(s.end - s.start, 1e-9)
+            for s in self.sessions if s.overlaps(start, end)
+        )
+        if raw_estimate <= points * RAW_BIN_LIMIT:
+            t, v, ok = self.query(start, end, [channel])
+            y = np.where(ok[:, 0], v[:, 0], np.nan)
+            if len(t) <= points:
+                return t, y, y, y
+            # Bin the raw records to the requested resolution
+            starts = np.arange(0, len(t), int(np.ceil(len(t) / points)))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                counts = np.add.reduceat(~np.isnan(y), starts)
+                mean = np.add.reduceat(np.nan_to_num(y), starts) / counts
+            return (t[starts], mean, np.fmin.reduceat(y, starts), np.fmax.reduceat(y, starts))
+        period = next((p for p in ROLLUP_PERIODS if duration / p <= points), ROLLUP_PERIODS[-1])
+        t, count, lo, mean, hi = self.aggregate(start, end, period, [channel])
+        return t + period / 2, mean[:, 0], lo[:, 0], hi[:, 0]
+
+    def export_csv(self, path, start, end, channels=None, period=None):
+        """Write raw records (or rollup buckets) with real timestamps; returns rows written"""
+        channels = channels or self.channels
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            if period:
+                t, count, lo, mean, hi = self.aggregate(start, end, period, channels)
+                writer.writerow(["Timestamp"] + [f"{ch}_{stat}" for ch in channels
+                                                 for stat in ("count", "min", "mean", "max")])
+                for i in range(len(t)):
+                    row = [_fmt(t[i])]
+                    for j in range(len(channels)):
+                        row += [int(count[i, j]), f"{lo[i, j]:.7g}", f"{mean[i, j]:.7g}", f"{hi[i, j]:.7g}"]
+                    writer.writerow(row)
+                return len(t)
+            t, values, valid = self.query(start, end, channels)
+            writer.writerow(["Timestamp"] + list(channels))
+            for i in range(len(t)):
+                writer.writerow([f"{_fmt(t[i])}.{int(t[i] * 1000) % 1000:03d}"] +
+                                [f"{v:.7g}" if ok else "" for v, ok in zip(values[i], valid[i])])
+            return len(t)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query recorded sessions by time")
+    parser.add_argument("--root", default=SESSION_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info", help="list sessions and their time spans")
+    q = sub.add_parser("query", help="records or rollups in a time range")
+    q.add_argument("--from", dest="start", required=True, help="'YYYY-mm-dd HH:MM[:SS]' or epoch seconds")
+    q.add_argument("--to", dest="end", required=True)
+    q.add_argument("--channels", nargs="+")
+    q.add_argument("--rollup", type=int, choices=ROLLUP_PERIODS, help="bucket size in seconds")
+    q.add_argument("--csv", help="write the result here instead of summarising it")
+    args = parser.parse_args(argv)
+
+    store = SessionStore(args.root)
+    if not store.sessions:
+        print(f"❌ No sessions under {args.root}")
+        return 1
+    if args.command == "info":
+        for s in store.sessions:
+            print(f"{s.path}: {len(s)} records, {_fmt(s.start)} → {_fmt(s.end)}")
+        return 0
+
+    start, end = parse_time(args.start), parse_time(args.end)
+    t0 = time.perf_counter()
+    if args.csv:
+        n = store.export_csv(args.csv, start, end, args.channels, args.rollup)
+        print(f"✅ Wrote {n} rows to {args.csv} in {time.perf_counter() - t0:.3f}s")
+        return 0
+    channels = args.channels or store.channels
+    if args.rollup:
+        t, count, lo, mean, hi = store.aggregate(start, end, args.rollup, channels)
+        print(f"✅ {len(t)} buckets in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        for j, ch in enumerate(channels):
+            if len(t):
+                print(f"   {ch:<9} min {np.nanmin(lo[:, j]):.2f}  mean {np.nanmean(mean[:, j]):.2f}  "
+                      f"max {np.nanmax(hi[:, j]):.2f}")
+    else:
+        t, values, valid = store.query(start, end, channels)
+        print(f"✅ {len(t)} records in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        for j, ch in enumerate(channels):
+            v = values[valid[:, j], j]
+            if len(v):
+                print(f"   {ch:<9} min {v.min():.2f}  mean {v.mean():.2f}  max {v.max():.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
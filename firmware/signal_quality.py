@@ -0,0 +1,170 @@
+"""Per-sample signal quality for every channel.
+
+Validation only range-checks readings and holds the last valid value, so a
+stuck sensor, a finger off the oximeter (the board then reports exactly
+98 % / 75 bpm) or ECG leads off (the ADC pins at a rail) look like clean
+data downstream. Each batch is checked here, column-wise with carried
+state, for:
+
+    flatline    identical readings for longer than the channel's flat_s
+    spike       a jump away from the median of the previous samples
+                (Hampel filter) larger than the channel's spike floor
+    saturated   readings pinned at the channel's ADC rails
+    slew        a change within one second larger than the channel's step
+    dropout     unparsable readings, or a gap between frames
+    range       outside SENSOR_RANGES (the value validation substituted)
+
+The good-sample mask lets analytics skip flagged samples; the fraction of
+good samples over the last QUALITY_WINDOW_S decides whether a channel is
+trusted at all.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ringbuffer import RingBuffer
+
+FLATLINE, SPIKE, SATURATED, SLEW, DROPOUT, RANGE = (1 << i for i in range(6))
+REASONS = {FLATLINE: "flatline", SPIKE: "spike", SATURATED: "saturated",
+           SLEW: "slew", DROPOUT: "dropout", RANGE: "range"}
+SPIKE_WINDOW = 7        # previous samples in the Hampel median
+SPIKE_K = 6.0           # ...and robust standard deviations counted as a spike
+
+
+# === SIGNAL QUALITY ===
+class SignalQuality:
+    """Quality flags for (n, channels) batches; settings maps channel -> checks (see config.py)"""
+
+    def __init__(self, channels, fs, settings, gap_s=0.5, window_s=2.0):
+        self.channels = list(channels)
+        self.fs = float(fs)
+        self.gap_s = gap_s
+        k = len(self.channels)
+        get = lambda key, default: np.array(
+            [settings.get(ch, {}).get(key, default) for ch in self.channels], dtype=float)
+        flat_s = get("flat_s", np.inf)
+        self.flat_n = np.where(np.isfinite(flat_s), np.maximum(np.round(flat_s * self.fs), 2), np.inf)
+        self.max_step = get("step", np.inf)
+        self.spike_floor = get("spike", np.inf)
+        rails = [settings.get(ch, {}).get("rails", (np.nan, np.nan)) for ch in self.channels]
+        self.rail_lo = np.array([r[0] for r in rails], dtype=float)
+        self.rail_hi = np.array([r[1] for r in rails], dtype=float)
+        self.check_range = get("range", True).astype(bool)
+        self._slew_cols = np.flatnonzero(np.isfinite(self.max_step))
+        self._spike_cols = np.flatnonzero(np.isfinite(self.spike_floor))
+        self.step_n = max(int(round(self.fs)), 1)
+
+        self._tail = np.full((max(self.step_n, SPIKE_WINDOW), k), np.nan)   # previous raw samples
+        self._run = np.zeros(k)         # length of the identical-reading run ending at the last sample
+        self._last_t_ns = None
+        self._interval_ns = None        # typical frame interval, for spotting gaps
+        self.recent = RingBuffer(self.channels, max(int(window_s * self.fs), 1), np.uint8)
+
+        self.samples = 0
+        self.gaps = 0
+        self.good = np.zeros(k, dtype=np.int64)
+        self.flagged = {name: np.zeros(k, dtype=np.int64) for name in REASONS.values()}
+        self.last_flags = np.zeros(k, dtype=np.uint8)
+
+    def inherit(self, previous):
+        """Carry on from a checker that ran at another rate: counts, gap timing and the recent window.
+
+        Slew and spike history, and flatline runs, restart.
+        """
+        self.samples = previous.samples
+        self.gaps = previous.gaps
+        self.good = previous.good.copy()
+        self.flagged = {name: counts.copy() for name, counts in previous.flagged.items()}
+        self.last_flags = previous.last_flags.copy()
+        self._last_t_ns = previous._last_t_ns
+        self._interval_ns = previous._interval_ns
+        self.recent.extend(previous.recent.last(self.recent.capacity).T)
+
+    def process(self, raw, valid, t_ns):
+        """Flag a batch of raw readings; returns (good mask, reason bits), each (n, channels)"""
+        x = np.asarray(raw, dtype=float)
+        n = len(x)
+        if not n:
+            return np.zeros(x.shape, dtype=bool), np.zeros(x.shape, dtype=np.uint8)
+        flags = np.zeros(x.shape, dtype=np.uint8)
+        missing = np.isnan(x)
+        flags[missing] |= DROPOUT
+        flags[~valid & ~missing & self.check_range] |= RANGE
+        flags[(x == self.rail_lo) | (x == self.rail_hi)] |= SATURATED
+        self._mark_gaps(np.asarray(t_ns, dtype=np.int64), flags)
+
+        m = len(self._tail)
+        h = np.concatenate((self._tail, x))
+        cols = self._slew_cols
+        if len(cols):
+            back = h[m - self.step_n:m - self.step_n + n, cols]
+            flags[:, cols] |= np.where(np.abs(x[:, cols] - back) > self.max_step[cols], SLEW, 0).astype(np.uint8)
+        cols = self._spike_cols
+        if len(cols):
+            window = sliding_window_view(h[m - SPIKE_WINDOW:m + n - 1, cols], SPIKE_WINDOW, axis=0)
+            median = np.median(window, axis=2)
+            deviation = np.abs(x[:, cols] - median)
+            # The limit is never below the floor, so only those past it need the MAD
+            rows, which = np.nonzero(deviation > self.spike_floor[cols])
+            if len(rows):
+                near = window[rows, which]
+                mad = np.median(np.abs(near - median[rows, which, None]), axis=1)
+                spike = deviation[rows, which] > SPIKE_K * 1.4826 * mad
+                flags[rows[spike], cols[which[spike]]] |= SPIKE
+
+        # Length of the run of identical readings ending at each sample
+        same = h[m:] == h[m - 1:m + n - 1]
+        index = np.arange(1, n + 1)[:, None]
+        last_change = np.maximum.accumulate(np.where(same, 0, index), axis=0)
+        run = np.where(last_change == 0, self._run + index, index - last_change + 1)
+        flags[run >= self.flat_n] |= FLATLINE
+        self._run = run[-1].astype(float)
+        self._tail = h[-m:]
+
+        good = flags == 0
+        self.samples += n
+        self.good += good.sum(0)
+        for bit, name in REASONS.items():
+            self.flagged[name] += (flags & bit != 0).sum(0)
+        self.recent.extend(good)
+        self.last_flags = np.bitwise_or.reduce(flags, axis=0)
+        return good, flags
+
+    def _mark_gaps(self, t_ns, flags):
+        """Flag the first frame after a silence of gap_s (or several typical intervals)"""
+        prev = t_ns[0] if self._last_t_ns is None else self._last_t_ns
+        span = int(t_ns[-1] - prev)
+        dt = np.diff(t_ns, prepend=prev)
+        limit = self.gap_s * 1e9
+        if self._interval_ns is not None:
+            limit = max(limit, 4 * self._interval_ns)
+        gaps = np.flatnonzero(dt > limit)
+        if len(gaps):
+            flags[gaps] |= DROPOUT
+            self.gaps += len(gaps)
+        elif self._last_t_ns is not None and span > 0:
+            interval = span / len(t_ns)
+            self._interval_ns = interval if self._interval_ns is None else 0.9 * self._interval_ns + 0.1 * interval
+        self._last_t_ns = int(t_ns[-1])
+
+    def fraction(self):
+        """Share of good samples over the recent window, per channel"""
+        if not self.recent.count:
+            return np.ones(len(self.channels))
+        return self.recent.view().mean(axis=1)
+
+    def trusted(self, min_good):
+        """Channels whose recent share of good samples is at least min_good"""
+        return {ch for ch, q in zip(self.channels, self.fraction()) if q >= min_good}
+
+    def summary(self):
+        """Per channel: percentage of good samples so far and the count of each flag"""
+        out = {}
+        for i, ch in enumerate(self.channels):
+            out[ch] = {"good_pct": 100.0 * self.good[i] / self.samples if self.samples else 100.0}
+            out[ch].update({name: int(counts[i]) for name, counts in self.flagged.items() if counts[i]})
+        return out
+
+    def reasons(self, channel):
+        """Names of the flags raised on channel in the latest batch"""
+        bits = int(self.last_flags[self.channels.index(channel)])
+        return [name for bit, name in REASONS.items() if bits & bit]
@@ -0,0 +1,330 @@
+import os, time, socket
+import numpy as np
+
+from config import CHANNELS
+
+PLAYBACK_MODES = ("realtime", "fixed", "fast")
+ECG_COUNTS_PER_MV = 0.1 / 3.3 * 4095     # 1 mV at the electrodes, after the AD8232's gain of 100
+
+# USB vendor ids of the USB-serial bridges found on ESP32 boards
+ESP32_USB_VIDS = {
+    0x10C4: "Silicon Labs CP210x",
+    0x1A86: "WCH CH340",
+    0x0403: "FTDI",
+    0x303A: "Espressif native USB",
+}
+
+
+def encode_frames(rows):
+    """Format rows of channel values as the firmware's PYTHON-> lines"""
+    return "".join(
+        "PYTHON-> " + ",".join(f"{v:.6g}" for v in row) + "\r\n" for row in rows
+    ).encode()
+
+
+# === FRAME SOURCES ===
+class FrameSource:
+    """Byte stream of PYTHON-> frames with the pyserial-style calls the reader uses"""
+
+    name = "source"
+    finished = False
+
+    def open(self):
+        pass
+
+    @property
+    def in_waiting(self):
+        return 0
+
+    def read(self, size=1):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def find_serial_ports():
+    """Serial ports behind a USB bridge that ESP32 boards use, sorted by name"""
+    from serial.tools import list_ports
+    return sorted(p.device for p in list_ports.comports() if p.vid in ESP32_USB_VIDS)
+
+
+class SerialSource(FrameSource):
+    """Live ESP32 over a serial port; port "auto" opens the first one find_serial_ports lists"""
+
+    def __init__(self, port, baud, timeout=0.1):
+        self.port = port
+        self.baud = baud
+        self.timeout = timeout
+        self.name = port
+        self.device = None if port == "auto" else port     # the port actually opened
+        self.ser = None
+
+    def open(self):
+        import serial
+        self.close()
+        ports = find_serial_ports() if self.port == "auto" else [self.port]
+        if not ports:
+            raise OSError("no ESP32 serial port found (CP210x, CH340, FTDI or native USB)")
+        for i, port in enumerate(ports):
+            try:
+                self.ser = serial.Serial(port, self.baud, timeout=self.timeout)
+            except serial.SerialException:
+                if i == len(ports) - 1:
+                    raise
+                continue
+            self.device = port
+            return self
+
+    @property
+    def in_waiting(self):
+        return self.ser.in_waiting
+
+    def read(self, size=1):
+        return self.ser.read(size)
+
+    def close(self):
+        if self.ser is not None:
+            self.ser.close()
+            self.ser = None
+
+
+class TcpSource(FrameSource):
+    """Frames from a TCP stream (ESP32 over Wi-Fi or a serial-to-TCP bridge)"""
+
+    def __init__(self, host, port, timeout=0.1, recv_size=65536):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.recv_size = recv_size
+        self.name = f"tcp://{host}:{port}"
+        self.sock = None
+
+    def open(self):
+        self.close()
+        self.finished = False
+        self.sock = socket.create_connection((self.host, self.port), timeout=5)
+        self.sock.settimeout(self.timeout)
+        return self
+
+    def read(self, size=1):
+        # A socket hands back whatever has arrived, so always ask for a full chunk
+        try:
+            data = self.sock.recv(max(size, self.recv_size))
+        except socket.timeout:
+            return b""
+        if not data:
+            self.finished = True
+            raise ConnectionError(f"{self.name} closed the connection")
+        return data
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class UdpSource(FrameSource):
+    """Frames sent as UDP datagrams to a local port"""
+
+    def __init__(self, port, host="0.0.0.0", timeout=0.1):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.name = f"udp://{host}:{port}"
+        self.sock = None
+
+    def open(self):
+        self.close()        # reopening must not leave the old socket holding the port
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((self.host, self.port))
+        self.sock.settimeout(self.timeout)
+        return self
+
+    def read(self, size=1):
+        try:
+            return self.sock.recv(65536)
+        except socket.timeout:
+            return b""
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class PacedSource(FrameSource):
+    """Emit generated frames in real time, at a fixed rate, or as fast as possible.
+
+    Subclasses provide ``_rows(i0, i1)`` and, for real-time playback,
+    ``_offsets`` (seconds from the first frame).
+    """
+
+    frame_count = None      # None for endless sources
+    _offsets = None
+
+    def __init__(self, mode="realtime", rate=None, speed=1.0, chunk_frames=256):
+        if mode not in PLAYBACK_MODES:
+            raise ValueError(f"mode must be one of {PLAYBACK_MODES}, got {mode!r}")
+        if mode == "fixed" and not rate:
+            raise ValueError("fixed-rate playback needs a rate")
+        self.mode = mode
+        self.rate = rate
+        self.speed = speed
+        self.chunk_frames = chunk_frames
+        self._next = 0
+        self._pending = b""
+        self._t0 = None
+
+    def open(self):
+        self._t0 = time.monotonic()
+        return self
+
+    @property
+    def nominal_rate(self):
+        """Frames per second of the recorded or generated timeline, whatever the playback speed"""
+        if self.mode == "fixed" or self._offsets is None or len(self._offsets) < 2 or self._offsets[-1] <= 0:
+            return self.rate
+        return (len(self._offsets) - 1) / self._offsets[-1]
+
+    def _elapsed(self):
+        if self._t0 is None:
+            self.open()
+        return (time.monotonic() - self._t0) * self.speed
+
+    def _offset(self, i):
+        if self.mode == "fixed" or self._offsets is None:
+            return i / self.rate
+        return self._offsets[i]
+
+    def _due(self):
+        """How many frames are due now"""
+        remaining = None if self.frame_count is None else self.frame_count - self._next
+        if remaining == 0:
+            return 0
+        if self.mode == "fast":
+            n = self.chunk_frames
+        elif self.mode == "fixed" or self._offsets is None:
+            n = int(self._elapsed() * self.rate) + 1 - self._next
+        else:
+            n = int(np.searchsorted(self._offsets, self._elapsed(), side="right")) - self._next
+        n = max(min(n, self.chunk_frames), 0)
+        return n if remaining is None else min(n, remaining)
+
+    @property
+    def in_waiting(self):
+        if self._pending:
+            return len(self._pending)
+        return 64 * self._due()
+
+    def read(self, size=1):
+        if not self._pending:
+            n = self._due()
+            if n == 0:
+                if self.frame_count is not None and self._next >= self.frame_count:
+                    self.finished = True
+                    time.sleep(0.01)
+                elif self.mode != "fast":
+                    wait = self._offset(self._next) - self._elapsed()
+                    time.sleep(min(max(wait / self.speed, 0.0), 0.1))
+                return b""
+            self._pending = encode_frames(self._rows(self._next, self._next + n))
+            self._next += n
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+class ReplaySource(PacedSource):
+    """Replay a health_log.csv, a test_logs/Csv log or a binary session directory"""
+
+    def __init__(self, path, mode="realtime", rate=None, speed=1.0, loop=False, chunk_frames=256):
+        super().__init__(mode, rate, speed, chunk_frames)
+        from session_format import SessionReader, read_csv_records
+        self.name = os.path.basename(path.rstrip("/\\"))
+        if os.path.isdir(path):
+            reader = SessionReader(path)
+            t_ns = np.asarray(reader.t_ns)
+            values = np.asarray(reader.values, dtype=float)
+        else:
+            t_ns, values, _ = read_csv_records(path, CHANNELS)
+            values = values.astype(float)
+        if not len(t_ns):
+            raise ValueError(f"{path}: nothing to replay")
+        self.values = values
+        self.loop = loop
+        self._offsets = (t_ns - t_ns[0]) / 1e9
+        self.frame_count = None if loop else len(values)
+        if mode == "realtime" and self._offsets[-1] <= 0 and not rate:
+            raise ValueError(f"{path}: no timestamps; use fixed-rate playback")
+
+    def _rows(self, i0, i1):
+        n = len(self.values)
+        return self.values[np.arange(i0, i1) % n]
+
+    def _offset(self, i):
+        if self.mode == "fixed" or not self.loop:
+            return super()._offset(i)
+        n = len(self._offsets)
+        period = self._offsets[-1] + (self._offsets[-1] / max(n - 1, 1))
+        return (i // n) * period + self._offsets[i % n]
+
+    def _due(self):
+        if self.loop and self.mode == "realtime":
+            # Unroll the looped timeline one pass at a time
+            n = 0
+            while n < self.chunk_frames and self._offset(self._next + n) <= self._elapsed():
+                n += 1
+            return n
+        return super()._due()
+
+
+class SyntheticSource(PacedSource):
+    """Plausible vitals, an ECG waveform and optional simulated falls"""
+
+    def __init__(self, rate=250, mode="fixed", speed=1.0, seed=None,
+                 fall_every_s=None, duration_s=None, chunk_frames=256):
+        super().__init__("fixed" if mode == "realtime" else mode, rate, speed, chunk_frames)
+        self.name = "synthetic"
+        self.rng = np.random.default_rng(seed)
+        self.fall_every_s = fall_every_s
+        self.frame_count = int(duration_s * rate) if duration_s else None
+
+    def _ecg(self, t, hr):
+        """Sum-of-Gaussians P-QRS-T beat, in mV"""
+        phase = (t * hr / 60.0) % 1.0
+        wave = (0.12 * np.exp(-((phase - 0.18) / 0.025) ** 2)
+                - 0.10 * np.exp(-((phase - 0.285) / 0.008) ** 2)
+                + 1.10 * np.exp(-((phase - 0.30) / 0.010) ** 2)
+                - 0.20 * np.exp(-((phase - 0.315) / 0.008) ** 2)
+                + 0.30 * np.exp(-((phase - 0.55) / 0.045) ** 2))
+        return wave + 0.1 * np.sin(2 * np.pi * 0.25 * t)   # breathing baseline wander
+
+    def _rows(self, i0, i1):
+        t = np.arange(i0, i1) / self.rate
+        n = len(t)
+        rng = self.rng
+        hr = 72 + 6 * np.sin(2 * np.pi * t / 60.0) + rng.normal(0, 1.0, n)
+        rows = np.empty((n, len(CHANNELS)))
+        rows[:, 0] = hr
+        rows[:, 1] = 97.5 + 0.8 * np.sin(2 * np.pi * t / 90.0) + rng.normal(0, 0.2, n)
+        rows[:, 2] = 36.7 + 0.002 * t / 60.0 + rng.normal(0, 0.03, n)
+        rows[:, 3] = 1008.2 + rng.normal(0, 0.05, n)
+        rows[:, 4] = 41.8 + rng.normal(0, 0.15, n)
+        rows[:, 5] = rng.normal(0, 0.15, n)
+        rows[:, 6] = rng.normal(0, 0.15, n)
+        rows[:, 7] = 9.81 + rng.normal(0, 0.15, n)
+        rows[:, 8] = 300 + 10 * np.sin(2 * np.pi * t / 300.0) + rng.normal(0, 5, n)
+        # AD8232 output (gain 100, mid-scale at rest) as the ESP32's 12-bit analogRead counts
+        ecg = self._ecg(t, 72) + rng.normal(0, 0.02, n)
+        rows[:, 9] = np.round(2048 + ecg * ECG_COUNTS_PER_MV)
+
+        if self.fall_every_s:
+            # Free fall (~0.3 s), impact spike, then lying still on the side
+            since = t % self.fall_every_s - (self.fall_every_s - 3.0)
+            ff = (since >= 0) & (since < 0.3)
+            impact = (since >= 0.3) & (since < 0.35)
+            still = (since >= 0.35) & (since < 3.0)
+            rows[ff, 5:8] = rng.normal(0, 0.3, (ff.sum(), 3))
+            rows[impact, 5:8] = rng.normal(0, 1.0, (impact.sum(), 3)) + [18.0, -12.0, 15.0]
+            rows[still, 5:8] = rng.normal(0, 0.05, (still.sum(), 3)) + [9.81, 0.0, 0.0]
+        return rows
@@ -0,0 +1,228 @@
+"""Short-time spectra of the fast channels: Welch PSD, spectrogram and band features.
+
+Tremor, gait cadence and ECG noise (baseline wander, 50/60 Hz mains) are
+invisible in the time series. Each signal, one channel or several whose
+spectra add up (the three accelerometer axes), is cut into segments that
+overlap by ``overlap``. A segment is detrended, windowed and transformed
+once, when its last sample arrives, and its periodogram goes into a ring
+buffer that is both the spectrogram and the pool the Welch PSD averages
+its newest ``average`` periodograms from: overlapping windows are never
+transformed twice. The window, its scaling and the band bins are built
+once; the segment length never changes, so numpy's FFT reuses its cached
+plan on every call.
+
+Segments holding flagged (NaN) samples are left out of the average and
+show as gaps in the spectrogram. With a worker, ``extend`` only queues
+the samples and the FFTs run on a background thread; readers get copies.
+"""
+import time, threading
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ringbuffer import RingBuffer
+from instrumentation import INSTRUMENTS
+
+
+# === SPECTRAL ENGINE ===
+class SpectralEngine:
+    """Incremental spectra of signals, a dict name -> channels whose PSDs are summed"""
+
+    def __init__(self, channels, fs, signals, bands=None, segment=512, overlap=0.5,
+                 average=8, history_s=120, worker=True, name="local", max_pending_s=30):
+        if not 0 <= overlap < 1:
+            raise ValueError(f"overlap must be in [0, 1), got {overlap}")
+        if segment < 4 or average < 1:
+            raise ValueError("segment needs at least 4 samples and average at least 1")
+        self.channels = list(channels)
+        self.fs = float(fs)
+        self.name = name
+        # Signals whose channels this stream does not carry are left out
+        self.signals = {s: list(chs) for s, chs in signals.items() if all(c in self.channels for c in chs)}
+        self._columns = [self.channels.index(c) for chs in self.signals.values() for c in chs]
+        self._starts = np.cumsum([0] + [len(chs) for chs in self.signals.values()])[:-1]
+        self.segment = int(segment)
+        self.hop = max(int(round(self.segment * (1 - overlap))), 1)
+        self.average = int(average)
+
+        # Periodic Hann window and one-sided PSD scaling, per bin
+        self.window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(self.segment) / self.segment)
+        self.freqs = np.fft.rfftfreq(self.segment, 1 / self.fs)
+        self.df = self.freqs[1]
+        scale = np.full(len(self.freqs), 2.0 / (self.fs * np.sum(self.window ** 2)))
+        scale[0] /= 2
+        if self.segment % 2 == 0:
+            scale[-1] /= 2
+        self._scale = scale
+        self.bands = {}
+        self._search = {}       # bins searched for the dominant frequency: every band's, or all
+        for s in self.signals:
+            self.bands[s] = {}
+            signal_bands = (bands or {}).get(s, {})
+            search = np.full(len(self.freqs), not signal_bands)
+            for band, (lo, hi) in signal_bands.items():
+                if not lo < hi:
+                    raise ValueError(f"band {s}/{band} needs low < high, got ({lo}, {hi})")
+                self.bands[s][band] = (self.freqs >= lo) & (self.freqs < hi)
+                search |= self.bands[s][band]
+            search[0] = False   # the detrended DC bin only holds leakage
+            self._search[s] = np.flatnonzero(search)
+
+        k, f = len(self.signals), len(self.freqs)
+        capacity = max(int(history_s * self.fs / self.hop), self.average)
+        self._power = RingBuffer(range(k * f), capacity, np.float32)   # one column per segment
+        self._times = RingBuffer(["t"], capacity)                       # wall time of each segment's centre
+        self._tail = np.empty((0, len(self._columns)))
+        self._tail_t = np.empty(0)
+        self._features = {}
+        self._lock = threading.Lock()   # spectra and features, between the worker and readers
+        self._busy = threading.Lock()   # one batch of FFTs at a time, in arrival order
+
+        self.segments = 0       # periodograms computed
+        self.gaps = 0           # ...of which held flagged samples
+        self.dropped = 0        # samples discarded because the worker fell behind
+        self.pending = 0        # samples queued for the worker
+        self.max_pending = int(max_pending_s * self.fs)
+        self._queue = []
+        self._restart = False   # samples were dropped: the next segment starts afresh
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+        if worker and self.signals:
+            self._thread = threading.Thread(target=self._run, name=f"spectral-{name}", daemon=True)
+            self._thread.start()
+
+    # --- producer side ---
+    def extend(self, times, values, good=None):
+        """Add a (n, channels) batch; samples where good is False count as missing"""
+        if not self.signals or not len(values):
+            return
+        x = values[:, self._columns]
+        if good is not None:
+            x = np.where(good[:, self._columns], x, np.nan)
+        if self._thread is None:
+            with self._busy:
+                self._compute(np.asarray(times, dtype=float), x)
+            return
+        with self._cond:
+            self._queue.append((np.asarray(times, dtype=float), x))
+            self.pending += len(x)
+            while self.pending > self.max_pending and len(self._queue) > 1:
+                # The worker has stalled; keep the newest samples
+                self.dropped += len(self._queue.pop(0)[1])
+                self.pending = sum(len(b[1]) for b in self._queue)
+                self._restart = True
+            if self.pending >= self.hop:
+                self._cond.notify()
+
+    def flush(self):
+        """Transform everything queued now, on the calling thread"""
+        with self._busy:
+            with self._cond:
+                batches, self._queue = self._queue, []
+                self.pending = 0
+                restart, self._restart = self._restart, False
+            if restart:
+                self._tail = self._tail[:0]
+                self._tail_t = self._tail_t[:0]
+            if batches:
+                self._compute(np.concatenate([b[0] for b in batches]),
+                              np.concatenate([b[1] for b in batches]))
+
+    # --- worker side ---
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and self.pending < self.hop:
+                    self._cond.wait()
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def _compute(self, t, x):
+        """Periodograms of every segment completed by this batch"""
+        h = np.concatenate((self._tail, x))
+        ht = np.concatenate((self._tail_t, t))
+        m = (len(h) - self.segment) // self.hop + 1 if len(h) >= self.segment else 0
+        if m > 0:
+            t0 = time.perf_counter_ns()
+            seg = sliding_window_view(h, self.segment, axis=0)[:m * self.hop:self.hop]   # (m, columns, segment)
+            seg = seg - seg.mean(axis=2, keepdims=True)
+            spectrum = np.fft.rfft(seg * self.window, axis=2)
+            power = (spectrum.real ** 2 + spectrum.imag ** 2) * self._scale
+            power = np.add.reduceat(power, self._starts, axis=1)       # (m, signals, freqs)
+            centre = ht[np.arange(m) * self.hop + self.segment // 2]
+            with self._lock:
+                self._power.extend(power.reshape(m, -1))
+                self._times.extend(centre[:, None])
+                self.segments += m
+                self.gaps += int(np.isnan(power[:, :, 0]).any(axis=1).sum())
+                self._features = self._extract()
+            INSTRUMENTS.record("spectral", t0, self.name)
+        self._tail = h[m * self.hop:]
+        self._tail_t = ht[m * self.hop:]
+
+    def _welch(self):
+        """(signals, freqs) mean of the newest periodograms without gaps; NaN rows for none"""
+        cols = self._power.last(self.average)
+        cols = cols.reshape(len(self.signals), len(self.freqs), -1)
+        ok = ~np.isnan(cols[:, 0, :])
+        n = ok.sum(axis=1)
+        total = np.where(ok[:, None, :], cols, 0).sum(axis=2, dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return total / n[:, None]
+
+    def _extract(self):
+        """Dominant frequency, total power and band powers of each signal's Welch PSD"""
+        out = {}
+        for psd, (s, masks) in zip(self._welch(), self.bands.items()):
+            if np.isnan(psd[0]):
+                continue
+            search = self._search[s]
+            if not len(search):
+                continue
+            peak = int(search[np.argmax(psd[search])])
+            shift = 0.0
+            if 0 < peak < len(psd) - 1:
+                # Parabola through the log powers around the peak, for a finer estimate than one bin
+                a, b, c = np.log(np.maximum(psd[peak - 1:peak + 2], 1e-30))
+                if a - 2 * b + c < 0:
+                    shift = 0.5 * (a - c) / (a - 2 * b + c)
+            out[s] = {
+                "dominant_hz": float((peak + shift) * self.df),
+                "power": float(psd.sum() * self.df),
+                "bands": {band: float(psd[mask].sum() * self.df) for band, mask in masks.items()},
+            }
+        return out
+
+    # --- readers ---
+    def features(self):
+        """Per signal: dominant_hz, power and band powers over the Welch window; signals with no clean data are absent"""
+        return self._features
+
+    def psd(self, signal):
+        """(freqs, Welch PSD) of one signal; the PSD is all NaN until a clean segment has been seen"""
+        i = list(self.signals).index(signal)
+        with self._lock:
+            if not self._power.count:
+                return self.freqs, np.full(len(self.freqs), np.nan)
+            return self.freqs, self._welch()[i]
+
+    def spectrogram(self, signal):
+        """(segment times, freqs, power shaped (freqs, segments)) of one signal, oldest first"""
+        i = list(self.signals).index(signal)
+        f = len(self.freqs)
+        with self._lock:
+            t = self._times.view("t").copy()
+            power = self._power.view()[i * f:(i + 1) * f].copy()
+        return t, self.freqs, power
+
+    def close(self):
+        """Stop the worker after it has transformed everything queued (safe to call twice)"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
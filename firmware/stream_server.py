@@ -0,0 +1,379 @@
+"""Fan live frames and derived events out to remote viewers over TCP.
+
+Clients connect, send one JSON line such as ``{"devices": ["bed1"]}``
+(omit or use ``"*"`` for every device) and then receive length-prefixed
+messages:
+
+    kind (1 byte) | payload length (uint32 LE) | payload
+
+    b"H"  hello, JSON: channels and the devices published so far
+    b"F"  frame batch, binary: name length (uint8), name, frame count and
+          channel count (uint16 each), decimation (uint16), wall-clock
+          t_ns (int64[n]), validity flags (uint16[n]), values (float32[n, ch])
+    b"E"  event, JSON: {"device", "type", "t", "data"}
+
+Each subscriber has a bounded queue. A slow client never blocks ingest:
+when its queue fills, frame batches are dropped and later ones are
+decimated for it until it catches up. Events go through a separate queue
+and are only dropped if that one overflows too.
+
+    python stream_server.py watch --port 8765
+"""
+import sys, json, time, struct, socket, asyncio, threading, argparse
+from collections import deque
+import numpy as np
+
+from serial_reader import FRAME_CHANNELS, WALL_OFFSET_NS
+from instrumentation import INSTRUMENTS
+
+HEADER = struct.Struct("<cI")
+BATCH = struct.Struct("<HHH")
+MAX_DECIMATION = 64
+
+
+def pack(kind, payload):
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+class FrameBatch:
+    """One published batch, packed lazily once per decimation factor"""
+
+    __slots__ = ("device", "t_ns", "flags", "values", "_packed")
+
+    def __init__(self, device, t_ns, flags, values):
+        self.device = device
+        self.t_ns = t_ns
+        self.flags = flags
+        self.values = values
+        self._packed = {}
+
+    def packed(self, decimation=1):
+        data = self._packed.get(decimation)
+        if data is None:
+            sl = slice(None, None, decimation)
+            t_ns, flags, values = self.t_ns[sl], self.flags[sl], self.values[sl]
+            name = self.device.encode()[:255]
+            payload = b"".join((
+                bytes([len(name)]), name,
+                BATCH.pack(len(t_ns), values.shape[1], decimation),
+                t_ns.tobytes(), flags.tobytes(), values.tobytes(),
+            ))
+            data = self._packed[decimation] = pack(b"F", payload)
+        return data
+
+
+def unpack_batch(payload):
+    """Decode a b"F" payload into (device, t_ns, flags, values, decimation)"""
+    n_name = payload[0]
+    device = payload[1:1 + n_name].decode()
+    pos = 1 + n_name
+    n, ch, decimation = BATCH.unpack_from(payload, pos)
+    pos += BATCH.size
+    t_ns = np.frombuffer(payload, np.int64, n, pos)
+    pos += 8 * n
+    flags = np.frombuffer(payload, np.uint16, n, pos)
+    pos += 2 * n
+    values = np.frombuffer(payload, np.float32, n * ch, pos).reshape(n, ch)
+    return device, t_ns, flags, values, decimation
+
+
+# === SUBSCRIBER ===
+class _Subscriber:
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.peer = writer.get_extra_info("peername")
+        self.devices = None             # None = every device
+        self.frames = deque()
+        self.events = deque()
+        self.queue_size = queue_size
+        self.decimation = 1
+        self.wakeup = asyncio.Event()
+        self.sent_bytes = 0
+        self.dropped_batches = 0
+        self.dropped_events = 0
+
+    def wants(self, device):
+        return self.devices is None or device in self.devices
+
+    def offer_frames(self, batch):
+        """Queue a batch; returns how much the queue grew (0 when the oldest was dropped)"""
+        grew = 1
+        if len(self.frames) >= self.queue_size:
+            # Backpressure: drop the oldest batch and thin out what follows
+            self.frames.popleft()
+            self.dropped_batches += 1
+            self.decimation = min(self.decimation * 2, MAX_DECIMATION)
+            grew = 0
+        self.frames.append(batch)
+        self.wakeup.set()
+        return grew
+
+    def offer_event(self, data):
+        if len(self.events) >= self.queue_size:
+            self.events.popleft()
+            self.dropped_events += 1
+        self.events.append(data)
+        self.wakeup.set()
+
+
+# === STREAM SERVER ===
+class StreamServer:
+    """Asyncio pub/sub server on its own thread; publish_* are safe from any thread"""
+
+    def __init__(self, host="127.0.0.1", port=8765, queue_size=64, channels=FRAME_CHANNELS,
+                 write_timeout=10.0):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.channels = list(channels)
+        self.write_timeout = write_timeout
+        self.subscribers = set()
+        self.devices = set()
+        self.loop = None
+        self._server = None
+        self._handlers = {}             # connection task -> its writer, ended on stop()
+        self._thread = None
+        self._ready = threading.Event()
+
+        self.published_batches = 0
+        self.published_events = 0
+        self.queued_batches = 0         # across all subscribers; only changed on the loop
+        self.last_error = None
+        INSTRUMENTS.register(self, "stream_subscribers", lambda: len(self.subscribers))
+        INSTRUMENTS.register_attrs(self, [
+            ("stream_queued_batches", "queued_batches", "gauge"),
+            ("stream_published_batches_total", "published_batches", "counter"),
+            ("stream_published_events_total", "published_events", "counter"),
+        ])
+
+    # --- lifecycle ---
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stream-server", daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+        if self.last_error:
+            raise OSError(self.last_error)
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self._server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self.last_error = str(e)
+            self._ready.set()
+            return
+        self._ready.set()
+        self.loop.run_forever()
+        self._server.close()
+        self.loop.run_until_complete(self._server.wait_closed())
+        self.loop.close()
+
+    def stop(self):
+        INSTRUMENTS.unregister(self)
+        if self.loop is not None and self.loop.is_running():
+            closing = asyncio.run_coroutine_threadsafe(self._close(), self.loop)
+            try:
+                closing.result(2.0)
+            except Exception as e:
+                self.last_error = str(e)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread is not None:
+            self._thread.join(2.0)
+
+    async def _close(self):
+        """Stop accepting, then end every connection, cancelling handlers that linger"""
+        self._server.close()
+        # Closed writers end the handlers cleanly: a cancelled one is logged as
+        # an error by asyncio's stream protocol on Python 3.11
+        for writer in self._handlers.values():
+            writer.close()
+        for sub in self.subscribers:
+            sub.wakeup.set()
+        if self._handlers:
+            _, pending = await asyncio.wait(list(self._handlers), timeout=1.0)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self._server.wait_closed()
+
+    # --- publishing (ingest side) ---
+    def publish_frames(self, device, t_ns, values, flags=None):
+        """Queue a batch for every subscriber of device; never blocks"""
+        if not self._active(device):
+            return
+        values = np.asarray(values, dtype=np.float32)
+        t_ns = np.asarray(t_ns, dtype=np.int64) + WALL_OFFSET_NS
+        if flags is None:
+            flags = np.full(len(values), (1 << values.shape[1]) - 1, dtype=np.uint16)
+        batch = FrameBatch(device, t_ns, np.asarray(flags, dtype=np.uint16), values)
+        self.published_batches += 1
+        self.loop.call_soon_threadsafe(self._fan_out_frames, batch)
+
+    def publish_event(self, device, kind, data):
+        if not self._active(device):
+            return
+        message = pack(b"E", json.dumps(
+            {"device": device, "type": kind, "t": time.time(), "data": data}, default=_json_default
+        ).encode())
+        self.published_events += 1
+        self.loop.call_soon_threadsafe(self._fan_out_event, device, message)
+
+    def _active(self, device):
+        """Whether anyone could want data from device (skips packing when idle)"""
+        if self.loop is None:
+            return False
+        if device not in self.devices:
+            self.loop.call_soon_threadsafe(self.devices.add, device)
+        return bool(self.subscribers)
+
+    def _fan_out_frames(self, batch):
+        for sub in self.subscribers:
+            if sub.wants(batch.device):
+                self.queued_batches += sub.offer_frames(batch)
+
+    def _fan_out_event(self, device, message):
+        for sub in self.subscribers:
+            if sub.wants(device):
+                sub.offer_event(message)
+
+    # --- connections ---
+    async def _handle(self, reader, writer):
+        sub = _Subscriber(writer, self.queue_size)
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        try:
+            try:
+                line = await asyncio.wait_for(reader.readline(), 5.0)
+                request = json.loads(line or b"{}")
+                devices = request.get("devices", "*")
+                if devices != "*":
+                    # One device may be given as a bare name
+                    sub.devices = {devices} if isinstance(devices, str) else set(devices)
+            except (asyncio.TimeoutError, ValueError, AttributeError, TypeError):
+                pass
+            if not self._server.is_serving():
+                return          # stopping
+            writer.write(pack(b"H", json.dumps(
+                {"channels": self.channels, "devices": sorted(self.devices)}
+            ).encode()))
+            self.subscribers.add(sub)
+            await self._send_loop(sub)
+        except (ConnectionError, asyncio.TimeoutError, OSError):
+            pass
+        finally:
+            self.subscribers.discard(sub)
+            self.queued_batches -= len(sub.frames)
+            self._handlers.pop(task, None)
+            writer.close()
+
+    async def _send_loop(self, sub):
+        writer = sub.writer
+        while not writer.is_closing():
+            if not sub.frames and not sub.events:
+                sub.wakeup.clear()
+                await sub.wakeup.wait()
+            chunks = list(sub.events)
+            sub.events.clear()
+            decimation = sub.decimation
+            chunks.extend(batch.packed(decimation) for batch in sub.frames)
+            self.queued_batches -= len(sub.frames)
+            sub.frames.clear()
+            data = b"".join(chunks)
+            writer.write(data)
+            sub.sent_bytes += len(data)
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+            if not sub.frames and sub.decimation > 1:
+                # Kept up with the last burst: ease the decimation back
+                sub.decimation //= 2
+
+    def metrics(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published_batches": self.published_batches,
+            "published_events": self.published_events,
+            "clients": [{
+                "peer": str(sub.peer),
+                "sent_bytes": sub.sent_bytes,
+                "decimation": sub.decimation,
+                "dropped_batches": sub.dropped_batches,
+                "dropped_events": sub.dropped_events,
+            } for sub in list(self.subscribers)],
+        }
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"not JSON serialisable: {type(value).__name__}")
+
+
+# === CLIENT ===
+class StreamClient:
+    """Blocking subscriber, for tools and tests; yields (kind, decoded payload)"""
+
+    def __init__(self, host="127.0.0.1", port=8765, devices="*", timeout=10.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.sendall(json.dumps({"devices": devices}).encode() + b"\n")
+        self._buf = b""
+
+    def _recv_exact(self, n):
+        while len(self._buf) < n:
+            chunk = self.sock.recv(max(65536, n - len(self._buf)))
+            if not chunk:
+                raise ConnectionError("server closed the connection")
+            self._buf += chunk
+        data, self._buf = self._buf[:n], self._buf[n:]
+        return data
+
+    def __iter__(self):
+        while True:
+            kind, length = HEADER.unpack(self._recv_exact(HEADER.size))
+            payload = self._recv_exact(length)
+            if kind == b"F":
+                yield "frames", unpack_batch(payload)
+            else:
+                yield "hello" if kind == b"H" else "event", json.loads(payload)
+
+    def close(self):
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live stream tools")
+    parser.add_argument("command", choices=["watch"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--devices", nargs="*", help="only these devices (default: all)")
+    args = parser.parse_args(argv)
+
+    client = StreamClient(args.host, args.port, args.devices or "*")
+    frames = 0
+    last = time.monotonic()
+    try:
+        for kind, msg in client:
+            if kind == "frames":
+                frames += len(msg[1])
+            elif kind == "hello":
+                print(f"✅ Connected: channels {msg['channels']}, devices {msg['devices']}")
+            elif msg["type"] != "analysis":
+                print(f"⚠ {msg['device']}: {msg['type']} {msg['data']}")
+            now = time.monotonic()
+            if now - last >= 1.0:
+                print(f"{frames / (now - last):.0f} frames/s")
+                frames, last = 0, now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+import os, sys
+
+# The firmware modules are flat files next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,128 @@
+"""AlertDispatcher against a stub HTTP server on a local ephemeral port."""
+import json, time, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from alerts import AlertDispatcher
+
+
+class Stub(ThreadingHTTPServer):
+    """Records posted JSON; answers the first ``failures`` posts with 500 and sleeps ``delay`` first"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.received = []
+        self.attempts = 0
+        self.failures = 0
+        self.delay = 0.0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/alert"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        time.sleep(server.delay)
+        server.attempts += 1
+        if server.failures > 0:
+            server.failures -= 1
+            self.send_response(500)
+        else:
+            server.received.append(body)
+            self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = Stub()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def spooled(path):
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_delivers_in_the_background(stub, tmp_path):
+    d = AlertDispatcher(stub.url, spool_path=str(tmp_path / "spool.jsonl"))
+    assert d.submit("fall", {"bed": 1})
+    assert until(lambda: d.sent == 1)
+    assert stub.received == [{"bed": 1}]
+    d.close()
+    assert spooled(tmp_path / "spool.jsonl") == []
+
+
+def test_retries_with_backoff_after_server_errors(stub, tmp_path):
+    stub.failures = 2
+    d = AlertDispatcher(stub.url, backoff_base=0.1, spool_path=str(tmp_path / "spool.jsonl"))
+    start = time.monotonic()
+    d.submit("fall", {"bed": 1})
+    assert until(lambda: d.sent == 1)
+    # Two failures, then backoffs of 0.05-0.1 s and 0.1-0.2 s (jittered)
+    assert time.monotonic() - start >= 0.15
+    assert (stub.attempts, d.failed_attempts) == (3, 2)
+    assert stub.received == [{"bed": 1}]
+    d.close()
+
+
+def test_duplicates_within_the_window_are_dropped(stub, tmp_path):
+    d = AlertDispatcher(stub.url, dedup_window=60, spool_path=str(tmp_path / "spool.jsonl"))
+    assert d.submit("fall", {"n": 1})
+    assert not d.submit("fall", {"n": 2})
+    assert d.submit("spo2", {"n": 3})
+    assert until(lambda: d.sent == 2)
+    assert d.deduplicated == 1
+    assert sorted(b["n"] for b in stub.received) == [1, 3]
+    d.close()
+
+
+def test_close_spools_what_was_not_delivered_and_the_next_start_sends_it(stub, tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    stub.failures = 100
+    d = AlertDispatcher(stub.url, backoff_base=10, spool_path=str(spool))
+    d.submit("fall", {"bed": 1})
+    assert until(lambda: d.failed_attempts == 1)
+    d.close()
+    assert [a["payload"] for a in spooled(spool)] == [{"bed": 1}]
+
+    stub.failures = 0
+    d = AlertDispatcher(stub.url, spool_path=str(spool))
+    assert until(lambda: d.sent == 1)
+    assert stub.received == [{"bed": 1}]
+    d.close()
+    assert spooled(spool) == []
+
+
+def test_close_does_not_wait_out_a_slow_post(stub, tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    stub.delay = 1.0
+    d = AlertDispatcher(stub.url, timeout=(3.05, 5.0), spool_path=str(spool))
+    d.submit("fall", {"bed": 1})
+    assert until(lambda: d._inflight is not None)
+    start = time.monotonic()
+    d.close(timeout=0.2)
+    assert time.monotonic() - start < 0.5
+    # Still being posted, so it is spooled here, and not a second time when the worker gives up
+    assert [a["payload"] for a in spooled(spool)] == [{"bed": 1}]
+    d._thread.join(3)
+    assert not d._thread.is_alive()
+    assert len(spooled(spool)) == 1
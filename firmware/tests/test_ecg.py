@@ -0,0 +1,69 @@
+"""QRSDetector on a synthetic ECG with known, varying RR intervals."""
+import numpy as np
+import pytest
+
+from ecg import QRSDetector
+
+
+def synthetic_ecg(fs, seconds, seed=0):
+    """(mV samples, R times): P-QRS-T beats with RR swinging around 0.8 s, noise and baseline wander"""
+    rng = np.random.default_rng(seed)
+    k = np.arange(int(seconds / 0.6))
+    rr = 0.8 + 0.06 * np.sin(2 * np.pi * k / 12) + rng.normal(0, 0.02, len(k))
+    r = 0.5 + np.cumsum(rr)
+    r = r[r < seconds - 1]
+    t = np.arange(int(seconds * fs)) / fs
+    x = 0.1 * np.sin(2 * np.pi * 0.25 * t) + rng.normal(0, 0.02, len(t))
+    for c in r:
+        near = np.abs(t - c) < 0.6
+        d = t[near] - c
+        x[near] += (0.12 * np.exp(-((d + 0.16) / 0.03) ** 2) - 0.10 * np.exp(-((d + 0.012) / 0.008) ** 2)
+                    + 1.10 * np.exp(-(d / 0.010) ** 2) - 0.20 * np.exp(-((d - 0.012) / 0.008) ** 2)
+                    + 0.30 * np.exp(-((d - 0.25) / 0.05) ** 2))
+    return x, r
+
+
+def detect(x, fs, block=25):
+    detector = QRSDetector(fs=fs)
+    beats = []
+    for i in range(0, len(x), block):
+        beats.extend(detector.process(x[i:i + block]))
+    return detector, np.array(beats)
+
+
+@pytest.mark.parametrize("fs", [100, 250, 500])
+def test_beats_heart_rate_and_sdnn(fs):
+    x, r = synthetic_ecg(fs, 120)
+    detector, beats = detect(x, fs)
+    # The first beat falls in the 2 s the thresholds are learnt over
+    assert abs(len(beats) - len(r)) <= 1
+    assert np.abs(beats - r[-len(beats):]).max() < 0.01
+    rr = np.diff(r)[-len(detector.rr):]
+    m = detector.metrics()
+    assert m["hr"] == pytest.approx(60 * 8 / rr[-8:].sum(), abs=1)
+    assert 60 / np.mean(detector.rr) == pytest.approx(60 / rr.mean(), abs=0.5)
+    assert m["sdnn"] == pytest.approx(np.std(rr, ddof=1) * 1000, rel=0.1)
+
+
+def test_adc_offset_and_block_size_do_not_move_the_beats():
+    # AD8232 output as 12-bit counts around mid-scale, fed one sample or 1000 at a time
+    fs = 250
+    x, r = synthetic_ecg(fs, 30)
+    counts = np.round(2048 + x * 124)
+    _, beats = detect(x, fs)
+    for block in (1, 1000):
+        _, shifted = detect(counts, fs, block)
+        np.testing.assert_allclose(shifted, beats, atol=1.5 / fs)
+
+
+def test_steady_rhythm_has_no_variability():
+    fs = 250
+    t = np.arange(60 * fs) / fs
+    # An R wave every 0.75 s (80 bpm), the first at 0.3 s
+    d = (t - 0.3 + 0.375) % 0.75 - 0.375
+    x = 1.1 * np.exp(-(d / 0.01) ** 2) + np.random.default_rng(1).normal(0, 0.02, len(t))
+    detector, beats = detect(x, fs)
+    assert len(beats) == 77     # 80, less the three in the 2 s the thresholds are learnt over
+    assert detector.heart_rate == pytest.approx(80, abs=0.5)
+    # R is placed between samples, so a fixed RR is not rounded to a jittering 4 ms grid
+    assert detector.hrv()["sdnn"] < 1.0
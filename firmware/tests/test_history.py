@@ -0,0 +1,74 @@
+"""TieredHistory: compaction into tiers, spilling to disk and the memory budget."""
+import os
+import numpy as np
+
+from history import TieredHistory, rebucket
+
+RATE = 10
+T0 = 1_700_000_000.0
+
+
+def feed(history, seconds, batch_s=0.7):
+    """Feed a ramp (a = t - T0, b = -a) with every 7th b sample invalid; returns the times"""
+    t = T0 + np.arange(int(seconds * RATE)) / RATE
+    values = np.column_stack((t - T0, T0 - t))
+    valid = np.ones(values.shape, dtype=bool)
+    valid[::7, 1] = False
+    step = int(batch_s * RATE)
+    for i in range(0, len(t), step):
+        history.extend(t[i:i + step], values[i:i + step], valid[i:i + step])
+    return t
+
+
+def test_tiers_hold_count_sum_min_max_of_each_period():
+    history = TieredHistory(["a", "b"], 1 << 20, (1, 10))
+    t = feed(history, 100)
+    ones = history.tiers[0].buckets(T0, T0 + 100)
+    assert len(ones) == 100
+    np.testing.assert_array_equal(ones["t"], T0 + np.arange(100))
+    assert (ones["count"][:, 0] == RATE).all()
+    # Every 7th sample of b is invalid, so only the valid ones are counted
+    assert ones["count"][:, 1].sum() == len(t) - len(t[::7])
+    a = (t - T0).reshape(100, RATE)
+    np.testing.assert_allclose(ones["sum"][:, 0], a.sum(1))
+    np.testing.assert_allclose(ones["min"][:, 0], a.min(1))
+    np.testing.assert_allclose(ones["max"][:, 0], a.max(1), rtol=1e-6)
+    tens = history.tiers[1].buckets(T0, T0 + 100)
+    assert len(tens) == 10
+    # The filling 1 s bucket reaches the 10 s tier once it closes
+    expected = rebucket(ones[:-1], 10)
+    for field in ("t", "count", "sum", "min", "max"):
+        np.testing.assert_allclose(tens[field], expected[field])
+
+
+def test_buckets_past_the_budget_spill_and_are_still_read(tmp_path):
+    history = TieredHistory(["a", "b"], 64 << 10, (1, 10, 60), str(tmp_path))
+    feed(history, 3600)
+    fine = history.tiers[0]
+    assert fine.spilled > 0 and fine.count == fine.capacity
+    assert os.path.getsize(fine.spill_path) == fine.spilled * fine.dtype.itemsize
+    buckets = fine.buckets(T0, T0 + 3600)
+    np.testing.assert_array_equal(buckets["t"], T0 + np.arange(3600))
+    assert history.start == T0
+    # An hour at 2000 points reads the 1 s tier, spilled part included
+    t, y, lo, hi = history.series("a", T0, T0 + 3600, 2000)
+    assert t[0] < T0 + 2 and t[-1] > T0 + 3597
+    np.testing.assert_allclose(y, t - T0 - 0.05, atol=0.01)
+    spill_dir = history.spill_dir
+    history.close()
+    assert not os.path.exists(spill_dir)
+
+
+def test_memory_stays_within_the_budget(tmp_path):
+    budget = 64 << 10
+    history = TieredHistory(["a", "b"], budget, (1, 10, 60), str(tmp_path))
+    before = history.nbytes
+    arrays = [history.hot.data, history.hot_t.data] + [tier.ring for tier in history.tiers]
+    assert before <= budget
+    feed(history, 7200)
+    assert history.nbytes == before
+    # Filled in place: nothing was reallocated as the session grew
+    assert all(a is b for a, b in zip(arrays, [history.hot.data, history.hot_t.data]
+                                       + [tier.ring for tier in history.tiers]))
+    assert history.hot.count == history.hot.capacity < 7200 * RATE
+    history.close()
@@ -0,0 +1,69 @@
+"""IngestPipeline: retuning the frame-counted analytics to the measured frame rate."""
+import numpy as np
+import pytest
+
+from config import FRAME_RATE, RATE_WINDOW_S
+from pipeline import IngestPipeline
+from serial_reader import FrameBlock
+from sources import SyntheticSource
+
+
+def feed(pipeline, rate, seconds, jitter=0.0, seed=0, fall_every_s=None, start_s=0.0):
+    """Synthetic frames at rate, read in chunks whose frames share an arrival stamp"""
+    rng = np.random.default_rng(seed)
+    source = SyntheticSource(rate=rate, seed=seed, fall_every_s=fall_every_s)
+    t = frames = 0.0
+    i = 0
+    while t < seconds:
+        dt = rng.uniform(0.05, 0.5)
+        t += dt
+        frames += dt * rate * (1 + rng.uniform(-jitter, jitter))
+        n = int(frames) - i
+        if n > 0:
+            pipeline.process(FrameBlock(np.full(n, int(1e12 + (start_s + t) * 1e9), np.int64), source._rows(i, i + n)))
+            i += n
+
+
+@pytest.fixture
+def pipeline():
+    p = IngestPipeline(verbose=False, spectral_worker=False)
+    yield p
+    p.close()
+
+
+def test_steady_rate_retunes_once_and_keeps_the_beats(pipeline):
+    feed(pipeline, 2 * FRAME_RATE, 60, fall_every_s=10)
+    ecg, fall = pipeline.ecg, pipeline.fall
+    assert pipeline.rate == pytest.approx(2 * FRAME_RATE, rel=0.02)
+    # Beats and falls from before the retune were carried over, and counting went on at the new rate
+    assert ecg.beat_count > 60 * 72 / 60 * 0.9
+    assert ecg.heart_rate == pytest.approx(72, abs=8)
+    # Falls at 7, 17, ... 57 s; the retune lands between the first two
+    assert 7 < fall.t0 < 17 and fall.events == 6
+    feed(pipeline, 2 * FRAME_RATE, 30, seed=1, start_s=60)
+    assert pipeline.ecg is ecg and pipeline.fall is fall
+
+
+def test_jitter_within_tolerance_never_retunes(pipeline):
+    ecg = pipeline.ecg
+    feed(pipeline, FRAME_RATE, 4 * RATE_WINDOW_S, jitter=0.5)
+    assert pipeline.rate == FRAME_RATE
+    assert pipeline.ecg is ecg
+
+
+def test_given_rate_is_never_estimated():
+    p = IngestPipeline(verbose=False, spectral_worker=False, rate=100.0)
+    try:
+        feed(p, FRAME_RATE, 30)
+        assert p.rate == 100.0 and p.measured_rate is None
+    finally:
+        p.close()
+
+
+def test_batch_runs_keep_no_history():
+    p = IngestPipeline(verbose=False, spectral_worker=False, history_mb=0)
+    try:
+        feed(p, FRAME_RATE, 5)
+        assert p.history is None and p.frames_processed > 4 * FRAME_RATE
+    finally:
+        p.close()
@@ -0,0 +1,62 @@
+"""RingBuffer wrap-around, reads across the seam and oversized batches."""
+import numpy as np
+import pytest
+
+from ringbuffer import RingBuffer
+
+
+def rows(start, stop):
+    """(n, 2) rows whose channels are i and -i, so every sample is recognisable"""
+    i = np.arange(start, stop, dtype=float)
+    return np.column_stack((i, -i))
+
+
+def test_wraps_around_and_keeps_the_newest_in_order():
+    rb = RingBuffer(["a", "b"], 5)
+    rb.extend(rows(0, 3))
+    for i in range(3, 8):
+        rb.append([i, -i])
+    assert rb.count == 5 and rb.total == 8 and rb.head == 3
+    np.testing.assert_array_equal(rb.view("a"), [3, 4, 5, 6, 7])
+    np.testing.assert_array_equal(rb["b"], [-3, -4, -5, -6, -7])
+    assert rb.latest("a") == 7
+
+
+def test_last_across_the_seam_is_contiguous():
+    rb = RingBuffer(["a", "b"], 8)
+    rb.extend(rows(0, 6))
+    rb.extend(rows(6, 11))      # the write wraps at index 8
+    assert rb.head == 3
+    last = rb.last(5)
+    assert last.shape == (2, 5)
+    np.testing.assert_array_equal(last[0], [6, 7, 8, 9, 10])
+    # A view of the storage, not a copy
+    assert np.shares_memory(last, rb.data)
+    np.testing.assert_array_equal(rb.last(4, "b"), [-7, -8, -9, -10])
+    np.testing.assert_array_equal(rb.last(100, "a"), np.arange(3, 11))
+
+
+def test_extend_with_more_than_capacity_keeps_the_tail():
+    rb = RingBuffer(["a", "b"], 4)
+    rb.extend(rows(0, 2))
+    rb.extend(rows(2, 13))
+    assert rb.count == 4 and rb.total == 13 and rb.head == 1
+    np.testing.assert_array_equal(rb.view("a"), [9, 10, 11, 12])
+    # Matches appending the rows one at a time
+    one = RingBuffer(["a", "b"], 4)
+    for row in rows(0, 13):
+        one.append(row)
+    np.testing.assert_array_equal(one.view(), rb.view())
+    assert one.head == rb.head
+
+
+def test_empty_and_cleared():
+    rb = RingBuffer(["a"], 3)
+    assert rb.view("a").shape == (0,)
+    with pytest.raises(IndexError):
+        rb.latest("a")
+    rb.extend(np.zeros((0, 1)))
+    assert rb.total == 0
+    rb.extend([[1.0], [2.0]])
+    rb.clear()
+    assert rb.count == 0 and rb.view().shape == (1, 0)
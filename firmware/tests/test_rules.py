@@ -0,0 +1,62 @@
+"""The bundled rules (rules.json) on known samples."""
+import numpy as np
+import pytest
+
+from config import CHANNELS, FRAME_RATE, RULES_FILE
+from rules import load_rules, RuleEngine
+
+AT_REST = {"HR": 60, "SpO2": 98, "Temp": 36.6, "Pressure": 1013, "Altitude": 0,
+           "AccX": 0, "AccY": 0, "AccZ": 9.81, "MQ": 300, "ECG": 2048}
+
+
+def run(seconds=15, rate=FRAME_RATE, **overrides):
+    """Engine after feeding seconds of constant readings, with the moving channels optionally replaced.
+
+    A callable column is given the sample times in seconds.
+    """
+    engine = RuleEngine(load_rules(RULES_FILE, CHANNELS, rate))
+    t = np.arange(int(seconds * rate)) / rate
+    values = np.tile([float(AT_REST[ch]) for ch in CHANNELS], (len(t), 1))
+    for ch, column in overrides.items():
+        values[:, CHANNELS.index(ch)] = column(t) if callable(column) else column
+    engine.process(t, values)
+    return engine
+
+
+@pytest.mark.parametrize("axis", ["AccX", "AccZ"])
+def test_at_rest_is_relaxed_whatever_the_orientation(axis):
+    # Gravity alone (9.81 m/s² on any axis) is no movement
+    gravity = {"AccX": 0.0, "AccY": 0.0, "AccZ": 0.0, axis: 9.81}
+    engine = run(**gravity)
+    assert engine.mood() == ("Relaxed", "normal")
+    assert engine.risk() == 0
+    assert engine.alerts() == []
+
+
+def test_fast_heart_rate_at_rest_is_not_active_or_stressed():
+    rng = np.random.default_rng(0)
+    engine = run(HR=lambda t: 110 + rng.normal(0, 10, len(t)))
+    assert engine.mood()[0] not in ("Active", "Stressed")
+
+
+def test_moving_with_raised_heart_rate_is_active():
+    # Brisk movement: 6 m/s² swings on top of gravity, about 3.8 m/s² on average
+    engine = run(HR=95, AccZ=lambda t: 9.81 + 6 * np.sin(2 * np.pi * 2 * t))
+    assert engine.mood()[0] == "Active"
+
+
+@pytest.mark.parametrize("rate", [50, 250])
+def test_windows_are_seconds_whatever_the_frame_rate(rate):
+    # HR swinging ±15 bpm every 10 s: its std over a 10 s window is about
+    # 10.6 bpm, over 10 samples it would be next to nothing
+    engine = run(seconds=30, rate=rate, HR=lambda t: 105 + 15 * np.sin(2 * np.pi * t / 10),
+                 AccZ=lambda t: 9.81 + 6 * np.sin(2 * np.pi * 2 * t))
+    assert engine.mood()[0] == "Stressed"
+
+
+def test_retuned_engine_keeps_its_state():
+    engine = run(HR=130, rate=50)
+    assert [a["rule"] for a in engine.alerts()] == ["high_heart_rate"]
+    engine.set_ruleset(load_rules(RULES_FILE, CHANNELS, 250))
+    assert engine.ruleset.rate == 250
+    assert [a["rule"] for a in engine.alerts()] == ["high_heart_rate"]
@@ -0,0 +1,74 @@
+"""parse_block on good, malformed and partial frame lines; the frame-rate estimator."""
+import warnings
+import numpy as np
+
+import serial_reader
+from serial_reader import parse_block, FRAME_FIELDS, FrameRateEstimator
+
+GOOD = b"PYTHON-> 75,98,36.6,1013,12,0.1,0.2,9.8,300,2048\n"
+
+
+def test_good_frames_and_remainder():
+    block, malformed, remainder = parse_block(GOOD * 3 + b"PYTHON-> 75,9", 123)
+    assert block.count == 3 and malformed == 0
+    assert block.values.shape == (3, FRAME_FIELDS)
+    assert block.values[0, -1] == 2048 and (block.t_ns == 123).all()
+    assert remainder == b"PYTHON-> 75,9"
+
+
+def test_bad_field_becomes_nan_and_keeps_the_other_frames():
+    block, malformed, _ = parse_block(GOOD + b"PYTHON-> 75,98,x,1013,12,0.1,0.2,9.8,300,2048\n" + GOOD, 0)
+    assert block.count == 3 and malformed == 0
+    assert np.isnan(block.values[1, 2])
+    assert np.isfinite(np.delete(block.values, 2, axis=1)).all()
+    np.testing.assert_array_equal(block.values[0], block.values[2])
+
+
+def test_wrong_field_count_is_malformed():
+    block, malformed, _ = parse_block(GOOD + b"PYTHON-> 75,98,36.6\n", 0)
+    assert block.count == 1 and malformed == 1
+
+
+def test_truncating_fromstring_falls_back_instead_of_raising(monkeypatch):
+    # Older numpy returns what it parsed before a bad field, with a DeprecationWarning
+    real = np.fromstring
+
+    def truncating(data, sep):
+        try:
+            return real(data, sep=sep)
+        except ValueError:
+            pass
+        warnings.warn("string or file could not be read to its end", DeprecationWarning)
+        return real(data.split(b"x")[0].rstrip(b","), sep=sep)
+
+    monkeypatch.setattr(serial_reader.np, "fromstring", truncating)
+    block, _, _ = parse_block(GOOD + b"PYTHON-> 75,98,x,1013,12,0.1,0.2,9.8,300,2048\n", 0)
+    assert block.values.shape == (2, FRAME_FIELDS)
+    assert np.isnan(block.values[1, 2])
+
+
+def chunked_stamps(rate, seconds, rng):
+    """Arrival stamps of frames read in irregular chunks, every frame of a chunk sharing its stamp"""
+    t, frames, out = 0.0, 0, []
+    while t < seconds:
+        t += rng.uniform(0.01, 0.8)     # reads land anywhere from a GUI tick to a blocking sensor read
+        n = int(t * rate) - frames
+        frames += n
+        out.append(np.full(n, int(t * 1e9), np.int64))
+    return out
+
+
+def test_rate_from_chunked_arrivals():
+    estimator = FrameRateEstimator(window_s=10, min_span_s=5)
+    rates = [estimator.update(t_ns) for t_ns in chunked_stamps(120, 30, np.random.default_rng(0))]
+    assert rates[0] is None
+    assert abs(rates[-1] - 120) < 0.02 * 120
+
+
+def test_rate_restarts_after_a_pause():
+    estimator = FrameRateEstimator(window_s=10, min_span_s=5, gap_s=2)
+    for t_ns in chunked_stamps(250, 20, np.random.default_rng(1)):
+        estimator.update(t_ns)
+    assert estimator.rate is not None
+    # The port comes back 5 s later; until 5 s of new arrivals are in, there is no estimate
+    assert estimator.update(np.full(10, int(25e9), np.int64)) is None
@@ -0,0 +1,45 @@
+"""Reading CSV logs back: rows cut short and unparsable raw fields."""
+import numpy as np
+
+from config import CHANNELS, LOG_HEADER
+from csv_logger import CsvLogger
+from session_format import read_csv_records
+
+HEALTH_ROW = "2026-10-18 03:57:01,75,98,36.6,1013.2,10,0,0,9.8,300,2048,75,98,36.6,1013.2,10,0,0,9.8,300,2048"
+
+
+def test_short_trl8_rows_are_skipped(tmp_path, capsys):
+    path = tmp_path / "bmp.csv"
+    path.write_text("Timestamp (ms),Test Stage,Pressure (Pa),Altitude (m)\n"
+                    "0,climb,100823.0,41.88\n"
+                    "1000,climb,100820.68\n"        # logger stopped mid-line
+                    "2000\n"
+                    "3000,climb,100818.0,42.2\n")
+    t_ns, values, _ = read_csv_records(str(path), CHANNELS)
+    np.testing.assert_array_equal(t_ns, [0, 3_000_000_000])
+    np.testing.assert_allclose(values[:, CHANNELS.index("Pressure")], [1008.23, 1008.18], rtol=1e-6)
+    assert "skipped 2 short rows" in capsys.readouterr().out
+
+
+def test_short_health_log_rows_are_skipped(tmp_path, capsys):
+    path = tmp_path / "health_log.csv"
+    path.write_text(",".join(LOG_HEADER) + "\n" + HEALTH_ROW + "\n" + HEALTH_ROW[:40] + "\n" + HEALTH_ROW + "\n")
+    t_ns, values, flags = read_csv_records(str(path), CHANNELS)
+    assert len(t_ns) == 2 and (values[:, CHANNELS.index("ECG")] == 2048).all()
+    assert "skipped 1 short row" in capsys.readouterr().out
+
+
+def test_unparsable_raw_fields_log_blank_and_read_back_untrusted(tmp_path):
+    path = str(tmp_path / "health_log.csv")
+    raw = [float(v) for v in HEALTH_ROW.split(",")[1:1 + len(CHANNELS)]]
+    validated = list(raw)
+    raw[CHANNELS.index("HR")] = float("nan")       # the line held "--" for HR
+    logger = CsvLogger(path, LOG_HEADER)
+    logger.log([1_790_000_000.0] + raw + validated)
+    logger.close()
+    fields = open(path).read().splitlines()[1].split(",")
+    assert fields[1 + CHANNELS.index("HR")] == "" and "nan" not in fields
+    _, values, flags = read_csv_records(path, CHANNELS)
+    assert values[0, CHANNELS.index("HR")] == 75
+    assert not flags[0] & (1 << CHANNELS.index("HR"))
+    assert flags[0] & (1 << CHANNELS.index("SpO2"))
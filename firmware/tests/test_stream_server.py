@@ -0,0 +1,84 @@
+"""StreamClient against a running StreamServer on a free port."""
+import time
+import threading
+import numpy as np
+import pytest
+
+from serial_reader import WALL_OFFSET_NS
+from stream_server import StreamServer, StreamClient
+
+CHANNELS = ["a", "b", "c"]
+
+
+@pytest.fixture
+def server():
+    s = StreamServer(port=0, channels=CHANNELS).start()
+    yield s
+    s.stop()
+
+
+def connect(server, devices):
+    """A client past its hello, once the server has it as a subscriber"""
+    client = StreamClient(port=server.port, devices=devices, timeout=5.0)
+    messages = iter(client)
+    kind, hello = next(messages)
+    assert kind == "hello" and hello["channels"] == CHANNELS
+    deadline = time.monotonic() + 5
+    while not server.subscribers and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return client, messages
+
+
+def test_frames_and_events_round_trip(server):
+    client, messages = connect(server, ["bed1"])
+    try:
+        t_ns = np.arange(4, dtype=np.int64) * 4_000_000
+        values = np.arange(12, dtype=float).reshape(4, 3) + 0.5
+        server.publish_frames("bed2", t_ns, values + 100)     # not subscribed to
+        server.publish_frames("bed1", t_ns, values, flags=np.array([7, 7, 3, 7]))
+        server.publish_event("bed1", "fall", {"peak_g": np.float64(2.5)})
+        received = [next(messages) for _ in range(2)]
+        kinds = dict(received)
+        device, t, flags, got, decimation = kinds["frames"]
+        assert device == "bed1" and decimation == 1
+        np.testing.assert_array_equal(t, t_ns + WALL_OFFSET_NS)
+        np.testing.assert_array_equal(flags, [7, 7, 3, 7])
+        np.testing.assert_array_equal(got, values.astype(np.float32))
+        event = kinds["event"]
+        assert event["device"] == "bed1" and event["type"] == "fall" and event["data"] == {"peak_g": 2.5}
+        assert server.queued_batches == 0
+    finally:
+        client.close()
+
+
+def test_a_bare_device_name_is_one_device(server):
+    client, messages = connect(server, "bed1")
+    try:
+        assert next(iter(server.subscribers)).devices == {"bed1"}
+        server.publish_frames("bed1", [0], [[1.0, 2.0, 3.0]])
+        kind, (device, *_) = next(messages)
+        assert kind == "frames" and device == "bed1"
+    finally:
+        client.close()
+
+
+def test_stop_ends_connections_and_returns_promptly():
+    server = StreamServer(port=0, channels=CHANNELS).start()
+    client, messages = connect(server, "*")
+    closed = []
+
+    def read_until_closed():
+        try:
+            for _ in messages:
+                pass
+        except ConnectionError:
+            closed.append(True)
+
+    reader = threading.Thread(target=read_until_closed)
+    reader.start()
+    start = time.monotonic()
+    server.stop()
+    assert time.monotonic() - start < 1.0
+    reader.join(5.0)
+    client.close()
+    assert closed and not server._handlers and not server.subscribers
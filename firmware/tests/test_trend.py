@@ -0,0 +1,120 @@
+"""StreamingTrend against np.polyfit over the tail of the logged CSVs, and its forecasts."""
+import os
+import numpy as np
+import pytest
+
+from config import (
+    CHANNELS, FRAME_RATE, FORECAST_WINDOW_S, FORECAST_HORIZON_S, FORECAST_MAX_EXTRAPOLATION
+)
+from session_format import iter_records
+from trend import StreamingTrend
+
+LOGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "test_logs", "Csv")
+SERIES = [
+    ("bmp280_trl8_detailed_log.csv", "Pressure"),
+    ("bmp280_trl8_detailed_log.csv", "Altitude"),
+    ("dsb_temp_trl8_detailed_log.csv", "Temp"),
+    ("mq135_air_quality_trl8_detailed_log.csv", "MQ"),
+    ("ecg_log.csv", "ECG"),
+]
+
+
+def logged(name, channel):
+    values = np.concatenate([v for _, v, _ in iter_records(os.path.join(LOGS, name), CHANNELS, 65536)])
+    y = values[:, CHANNELS.index(channel)]
+    return y[np.isfinite(y)]
+
+
+@pytest.mark.parametrize("name,channel", SERIES)
+@pytest.mark.parametrize("window", [20, 50, 500])
+def test_matches_polyfit_over_window(name, channel, window):
+    y = logged(name, channel)
+    trend = StreamingTrend(window=window)
+    scale = max(np.abs(y).max(), 1.0)
+    for start in range(0, len(y), 7):
+        chunk = y[start:start + 7]
+        trend.extend(chunk)
+        end = start + len(chunk)
+        tail = y[max(end - window, 0):end]
+        if len(tail) < trend.min_samples:
+            continue
+        slope, current = trend.coefficients()
+        if np.std(tail) == 0:
+            assert slope == 0 and current == tail[-1]
+            continue
+        ref_slope, ref_intercept = np.polyfit(np.arange(len(tail)), tail, 1)
+        assert slope == pytest.approx(ref_slope, rel=1e-6, abs=1e-9 * scale)
+        assert current == pytest.approx(ref_intercept + ref_slope * (len(tail) - 1), rel=1e-9, abs=1e-9 * scale)
+
+
+def polyfit_forecast(y, future=10):
+    """The dashboard's original per-tick forecast: a least-squares line over the buffer, extended"""
+    if len(y) < 5:
+        return np.zeros(future)
+    if np.std(y) == 0:
+        return np.full(future, y[-1])
+    slope, intercept = np.polyfit(np.arange(len(y)), y, 1)
+    return slope * np.arange(len(y), len(y) + future) + intercept
+
+
+@pytest.mark.parametrize("name,channel", SERIES)
+def test_forecast_matches_polyfit_forecast(name, channel):
+    y = logged(name, channel)
+    window = 50
+    trend = StreamingTrend(window=window)
+    for i, value in enumerate(y):
+        trend.update(value)
+        if i % 11 == 0:
+            expected = polyfit_forecast(y[max(i + 1 - window, 0):i + 1])
+            np.testing.assert_allclose(trend.forecast(10), expected, rtol=1e-7, atol=1e-7)
+
+
+def test_window_roll_over_forgets_old_samples():
+    # A step far outside the window must not bend the fit once it has slid out
+    y = np.concatenate((np.full(100, 1000.0), np.arange(40, dtype=float)))
+    trend = StreamingTrend(window=30)
+    trend.extend(y)
+    slope, current = trend.coefficients()
+    assert slope == pytest.approx(1.0)
+    assert current == pytest.approx(39.0)
+
+
+def configured(rate=FRAME_RATE):
+    """A trend set up like the pipeline's forecasts"""
+    return StreamingTrend(window=int(FORECAST_WINDOW_S * rate), sample_period=1 / rate,
+                          max_extrapolation=FORECAST_MAX_EXTRAPOLATION)
+
+
+@pytest.mark.parametrize("seconds", [2, 60, 2 * FORECAST_WINDOW_S])
+def test_flat_series_forecasts_flat(seconds):
+    # Sensor noise on a constant reading, however little of the window is filled yet
+    rng = np.random.default_rng(0)
+    n = int(seconds * FRAME_RATE)
+    for value, noise in ((36.7, 0.05), (300.0, 5.0)):
+        trend = configured()
+        trend.extend(value + rng.normal(0, noise, n))
+        assert trend.forecast_seconds(FORECAST_HORIZON_S) == pytest.approx(value, abs=3 * noise)
+
+
+def test_linear_series_forecasts_along_the_line():
+    rate, per_s = 10.0, 0.001       # a slow 0.06 °C-per-minute drift
+    t = np.arange(int(2 * FORECAST_WINDOW_S * rate)) / rate
+    trend = configured(rate)
+    trend.extend(36.0 + per_s * t)
+    assert trend.slope_per_second() == pytest.approx(per_s)
+    assert trend.forecast_seconds(FORECAST_HORIZON_S) == pytest.approx(36.0 + per_s * (t[-1] + FORECAST_HORIZON_S))
+
+
+def test_short_fit_is_not_extrapolated_over_the_whole_horizon():
+    trend = configured(rate=1.0)
+    trend.extend(np.arange(10.0))
+    assert trend.forecast_seconds(FORECAST_HORIZON_S) == pytest.approx(9 + FORECAST_MAX_EXTRAPOLATION * 10)
+
+
+def test_retime_keeps_the_newest_samples():
+    trend = configured(rate=10.0)
+    trend.extend(np.arange(100.0))
+    trend.retime(1 / 2.0, window=20)
+    slope, current = trend.coefficients()
+    assert (slope, current) == pytest.approx((1.0, 99.0))
+    assert trend.slope_per_second() == pytest.approx(2.0)
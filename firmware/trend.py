@@ -0,0 +1,203 @@
+import math
+import numpy as np
+
+
+# === STREAMING LINEAR TREND ===
+class StreamingTrend:
+    """Least-squares line maintained from running sums, O(1) per sample.
+
+    With ``window`` set the fit covers the newest ``window`` samples, exactly
+    like ``np.polyfit`` over the tail of a buffer. With ``forgetting`` (0 < λ < 1)
+    older samples are down-weighted by λ per step instead. Samples are
+    indexed 0, 1, 2, ... so ``forecast(n)`` is the fitted line ``n`` steps
+    on; ``forecast_seconds`` converts a real-time horizon using the sample
+    period (given, or estimated from timestamps). With ``max_extrapolation``
+    set, forecasts reach at most that many times the span of the fitted
+    samples ahead, so a short fit is never stretched over a long horizon.
+    """
+
+    def __init__(self, window=None, forgetting=None, sample_period=None, min_samples=5,
+                 max_extrapolation=None):
+        if window is None and forgetting is None:
+            raise ValueError("set window, forgetting, or both")
+        self.window = window
+        self.forgetting = forgetting
+        self.min_samples = min_samples
+        self.max_extrapolation = max_extrapolation
+        self.sample_period = sample_period
+        self._estimate_period = sample_period is None
+        self._values = np.empty(window) if window else None   # ring of the samples in the fit
+        self._rebase_every = window if window else 4096
+        self.reset()
+
+    def reset(self):
+        self.count = 0                      # samples seen (unweighted)
+        self._w = self._sx = self._sy = 0.0
+        self._sxx = self._sxy = self._syy = 0.0
+        self._x = 0                         # index of the next sample, relative to origin
+        self._since_rebase = 0
+        self._last = None
+        self._t_last = None
+        self._since_t = 0
+        self._n = 0                         # samples held in the ring
+        self._head = 0                      # ring slot of the oldest one
+
+    # --- updates ---
+    def update(self, y, t=None):
+        """Add one sample; non-finite values are ignored like in forecast()"""
+        if t is not None and self._estimate_period:
+            self._observe_time(t, 1)
+        y = float(y)
+        if not math.isfinite(y):
+            return
+        lam = self.forgetting
+        if lam is not None:
+            self._w *= lam
+            self._sx *= lam
+            self._sy *= lam
+            self._sxx *= lam
+            self._sxy *= lam
+            self._syy *= lam
+        if self._values is not None and self._n == self.window:
+            # Slide: remove the sample leaving the window (its weight is λ^window)
+            old = self._values[self._head]
+            xo = self._x - self.window
+            wo = lam ** self.window if lam is not None else 1.0
+            self._w -= wo
+            self._sx -= wo * xo
+            self._sy -= wo * old
+            self._sxx -= wo * xo * xo
+            self._sxy -= wo * xo * old
+            self._syy -= wo * old * old
+        x = self._x
+        self._w += 1.0
+        self._sx += x
+        self._sy += y
+        self._sxx += x * x
+        self._sxy += x * y
+        self._syy += y * y
+        if self._values is not None:
+            if self._n == self.window:
+                self._values[self._head] = y
+                self._head = (self._head + 1) % self.window
+            else:
+                self._values[(self._head + self._n) % self.window] = y
+                self._n += 1
+        self._last = y
+        self._x += 1
+        self.count += 1
+        self._since_rebase += 1
+        if self._since_rebase >= self._rebase_every:
+            self._rebase()
+
+    def extend(self, ys, t=None):
+        """Add a batch of samples; t is the arrival time of the last one"""
+        for y in np.asarray(ys, dtype=float).tolist():
+            self.update(y)
+        if t is not None and self._estimate_period:
+            self._observe_time(t, len(ys))
+
+    def _observe_time(self, t, n):
+        """Estimate the sample period; frames read in one chunk share a timestamp"""
+        self._since_t += n
+        if self._t_last is None:
+            self._t_last, self._since_t = t, 0
+        elif t > self._t_last:
+            dt = (t - self._t_last) / self._since_t
+            if self.sample_period is None:
+                self.sample_period = dt
+            else:
+                self.sample_period += 0.05 * (dt - self.sample_period)
+            self._t_last, self._since_t = t, 0
+
+    def _held(self):
+        """Samples in the window, oldest first"""
+        return np.roll(self._values, -self._head)[:self._n]
+
+    def _refit(self):
+        """Recompute the sums exactly from the window, with x counted from its oldest sample"""
+        y = self._held()
+        x = np.arange(len(y), dtype=float)
+        w = np.ones(len(y)) if self.forgetting is None else self.forgetting ** x[::-1]
+        self._w = float(w.sum())
+        self._sx, self._sy = (w * x).sum(), (w * y).sum()
+        self._sxx, self._sxy, self._syy = (w * x * x).sum(), (w * x * y).sum(), (w * y * y).sum()
+        self._x = len(y)
+
+    def _rebase(self):
+        """Move the x origin forward so the sums stay small and drift-free"""
+        self._since_rebase = 0
+        if self._values is not None and self.forgetting is None:
+            # Recompute exactly from the window: amortised O(1), removes rounding drift
+            self._refit()
+            return
+        d = self._x - (self._n if self._values is not None else 0)
+        self._sxx -= 2 * d * self._sx - d * d * self._w
+        self._sxy -= d * self._sy
+        self._sx -= d * self._w
+        self._x -= d
+
+    def retime(self, sample_period, window=None):
+        """Switch to a new sample period (and window, in samples), keeping the newest samples"""
+        self.sample_period = sample_period
+        self._estimate_period = False
+        if window is None or self._values is None or window == self.window:
+            return
+        y = self._held()[-window:]
+        self.window = window
+        self._rebase_every = window
+        self._values = np.empty(window)
+        self._values[:len(y)] = y
+        self._n, self._head = len(y), 0
+        if self._last is not None:
+            self._refit()
+
+    # --- queries ---
+    @property
+    def ready(self):
+        return self.span >= self.min_samples
+
+    @property
+    def span(self):
+        """Samples the fit effectively covers"""
+        n = self._n if self._values is not None else self.count
+        if self.forgetting is not None:
+            n = min(n, 1 / (1 - self.forgetting))
+        return n
+
+    def coefficients(self):
+        """(slope per sample, value fitted at the newest sample)"""
+        if self._last is None:
+            return 0.0, 0.0
+        w, sx, sy = self._w, self._sx, self._sy
+        denom = w * self._sxx - sx * sx
+        var_y = self._syy / w - (sy / w) ** 2
+        if denom <= 1e-12 * max(w * self._sxx, 1.0) or var_y <= 1e-12 * max(abs(sy / w), 1.0) ** 2:
+            return 0.0, self._last
+        slope = (w * self._sxy - sx * sy) / denom
+        intercept = (sy - slope * sx) / w
+        return slope, intercept + slope * (self._x - 1)
+
+    def predict(self, steps_ahead):
+        slope, current = self.coefficients()
+        return current + slope * steps_ahead
+
+    def forecast(self, future=10):
+        """Next ``future`` fitted values; zeros until there are min_samples"""
+        if not self.ready:
+            return np.zeros(future)
+        slope, current = self.coefficients()
+        return current + slope * np.arange(1, future + 1)
+
+    def forecast_seconds(self, horizon_s):
+        """Fitted value ``horizon_s`` seconds after the newest sample"""
+        if not self.ready:
+            return 0.0
+        steps = horizon_s / self.sample_period if self.sample_period else 0.0
+        if self.max_extrapolation is not None:
+            steps = min(steps, self.max_extrapolation * self.span)
+        return self.predict(steps)
+
+    def slope_per_second(self):
+        slope, _ = self.coefficients()
+        return slope / self.sample_period if self.sample_period else 0.0
@@ -0,0 +1,134 @@
+import time
+from PyQt5.QtWidgets import QMainWindow, QWidget, QLabel, QGridLayout, QFrame, QVBoxLayout, QStatusBar
+from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtGui import QFont
+
+from config import THEME_COLORS, ALERT_URL, ALERT_SPOOL, ALERT_DEDUP_S
+from alerts import AlertDispatcher
+
+
+# === PATIENT TILE ===
+class PatientTile(QFrame):
+    """Key vitals of one device in the ward grid"""
+
+    def __init__(self, device, parent=None):
+        super().__init__(parent)
+        self.device = device
+        layout = QVBoxLayout(self)
+        self.title = QLabel(f"<b>{device.name}</b>")
+        self.title.setFont(QFont("Segoe UI", 12))
+        self.vitals = QLabel("Waiting for data...")
+        self.vitals.setFont(QFont("Segoe UI", 10))
+        self.footer = QLabel("")
+        self.footer.setFont(QFont("Segoe UI", 8))
+        self.footer.setStyleSheet("color: #a0a0a0;")
+        for w in (self.title, self.vitals, self.footer):
+            w.setAlignment(Qt.AlignCenter)
+            layout.addWidget(w)
+        self._border = None
+        self.set_border(THEME_COLORS['accent'])
+
+    def set_border(self, color):
+        if color == self._border:
+            return
+        self._border = color
+        self.setStyleSheet(f"""
+            PatientTile {{
+                background: {THEME_COLORS['light_bg']};
+                border: 2px solid {color};
+                border-radius: 8px;
+            }}
+            QLabel {{ color: {THEME_COLORS['text']}; }}
+        """)
+
+    def refresh(self):
+        device = self.device
+        result = device.result
+        self.footer.setText(
+            f"{device.source.name} | {device.reader.frames_per_sec:.0f} fps | CPU {device.cpu_percent:.1f}%"
+            + (f"<br>⚠ {device.error}" if device.error else "")
+        )
+        if result is None:
+            return
+        v = result["values"]
+        ecg = result.get("ecg")
+        ecg_hr = f"{ecg['hr']:.0f}" if ecg and ecg["rr_count"] else "--"
+        self.vitals.setText(
+            f"<font size='5'>{v['HR']:.0f}</font> bpm &nbsp; "
+            f"<font size='5'>{v['SpO2']:.0f}</font> % SpO2<br>"
+            f"{v['Temp']:.1f}°C &nbsp; ECG HR {ecg_hr} &nbsp; Risk {result['risk']:.0f}<br>"
+            f"<font color='{result['mood_color']}'>{result['mood']}</font>"
+            + ("<br><b><font color='#ff5555'>🚨 FALL</font></b>" if result["fall"] else "")
+        )
+        if result["fall"] or result["risk"] > 60:
+            self.set_border(THEME_COLORS['critical'])
+        elif result["risk"] > 30 or result["alerts"]:
+            self.set_border(THEME_COLORS['warning'])
+        else:
+            self.set_border(THEME_COLORS['normal'])
+
+
+# === WARD OVERVIEW ===
+class WardOverview(QMainWindow):
+    """Grid of every device the DeviceManager is monitoring"""
+
+    def __init__(self, manager, columns=4):
+        super().__init__()
+        self.manager = manager
+        self.setWindowTitle("Senso Health Analytics - Ward Overview")
+        self.setGeometry(100, 100, 1400, 800)
+        self.setStyleSheet(f"""
+            QMainWindow {{
+                background-color: {THEME_COLORS['dark_bg']};
+                color: {THEME_COLORS['text']};
+                font-family: 'Segoe UI', Arial;
+            }}
+        """)
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        grid = QGridLayout(central_widget)
+        grid.setSpacing(15)
+        grid.setContentsMargins(15, 15, 15, 15)
+        self.tiles = []
+        for i, device in enumerate(manager.devices):
+            tile = PatientTile(device)
+            grid.addWidget(tile, i // columns, i % columns)
+            self.tiles.append(tile)
+
+        self.status_bar = QStatusBar()
+        self.status_bar.setFont(QFont("Segoe UI", 9))
+        self.setStatusBar(self.status_bar)
+
+        self.alerts = AlertDispatcher(ALERT_URL, spool_path=ALERT_SPOOL,
+                                      dedup_window=ALERT_DEDUP_S)
+        self._fallen = set()
+
+        self.update_timer = QTimer()
+        self.update_timer.timeout.connect(self.update_overview)
+        self.update_timer.start(500)
+
+    def update_overview(self):
+        for tile in self.tiles:
+            tile.refresh()
+            result = tile.device.result
+            name = tile.device.name
+            if result and result["fall"] and name not in self._fallen:
+                self._fallen.add(name)
+                # Per-device kind so one patient's fall never suppresses another's
+                self.alerts.submit(f"fall:{name}", {"message": f"Fall detected: {name}",
+                                                    "device": name, "priority": "critical"})
+            elif result and not result["fall"]:
+                self._fallen.discard(name)
+        cpu = sum(d.cpu_percent for d in self.manager.devices)
+        self.status_bar.showMessage(
+            f"Last update: {time.strftime('%H:%M:%S')} | Devices: {len(self.tiles)} | "
+            f"CPU: {cpu:.1f}% | Tick load: {self.manager.load:.0%} | "
+            f"Alerts sent: {self.alerts.sent}, pending: {self.alerts.pending}"
+        )
+
+    def closeEvent(self, event):
+        self.update_timer.stop()
+        self.alerts.close()
+        self.manager.stop()
+        super().closeEvent(event)